@@ -0,0 +1,197 @@
+import argparse
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pyarrow as pa
+
+import data_pipeline
+import dataset_refresher
+
+API_HOST = os.environ.get('GREENAI_API_HOST', '0.0.0.0')
+API_PORT = int(os.environ.get('GREENAI_API_PORT', 8502))
+
+# Réponses sérialisées gardées en mémoire (toutes versions confondues)
+API_CACHE_ENTRIES = int(os.environ.get('GREENAI_API_CACHE_ENTRIES', 512))
+
+JSON_TYPE = 'application/json; charset=utf-8'
+ARROW_TYPE = 'application/vnd.apache.arrow.stream'
+
+# Tables servies : mêmes calculs que les onglets du tableau de bord
+ENDPOINTS = {
+    '/api/ranking': lambda backend, filters: backend.model_ranking(filters),
+    '/api/models': lambda backend, filters: backend.summary_table(filters, 'model'),
+    '/api/categories': lambda backend, filters: backend.summary_table(filters, 'categorie_model'),
+    '/api/question-types': lambda backend, filters: backend.question_comparison(filters),
+    '/api/question-detail': lambda backend, filters: backend.question_detail(filters),
+}
+
+
+def parse_filters(query):
+    """Filtres de la barre latérale depuis la chaîne de requête (paramètres répétables)
+
+    `?model=a&model=b&min_score=3` ; une dimension absente n'est pas filtrée. Les valeurs
+    sont triées : deux requêtes équivalentes partagent la même entrée de cache et le même ETag.
+    """
+    params = parse_qs(query, keep_blank_values=True)
+    filters = {}
+    for col in data_pipeline.FILTER_COLUMNS:
+        if col in params:
+            filters[col] = sorted({v for value in params[col] for v in value.split(',') if v})
+    if 'min_score' in params:
+        try:
+            filters['min_score'] = float(params['min_score'][-1])
+        except ValueError:
+            raise ValueError(f"min_score invalide : {params['min_score'][-1]}")
+    unknown = set(params) - set(data_pipeline.FILTER_COLUMNS) - {'min_score', 'format'}
+    if unknown:
+        raise ValueError(f"Paramètres inconnus : {', '.join(sorted(unknown))}")
+    return filters
+
+
+def response_format(query, accept):
+    """'arrow' si demandé par ?format=arrow ou l'en-tête Accept, 'json' sinon"""
+    requested = parse_qs(query).get('format', [None])[-1]
+    if requested is None:
+        return 'arrow' if ARROW_TYPE in (accept or '') else 'json'
+    if requested not in ('json', 'arrow'):
+        raise ValueError(f"Format inconnu : {requested}")
+    return requested
+
+
+def etag(version, path, filters, fmt):
+    """ETag fort : même version des données et même requête normalisée, mêmes octets"""
+    request = json.dumps([path, filters, fmt], sort_keys=True, ensure_ascii=False)
+    digest = hashlib.sha1(request.encode('utf-8')).hexdigest()[:16]
+    return f'"{version}-{digest}"'
+
+
+def serialize(table, version, fmt):
+    """Table pandas en JSON (enregistrements) ou en flux Arrow IPC"""
+    table = table.reset_index()
+    if fmt == 'arrow':
+        arrow = pa.Table.from_pandas(table, preserve_index=False)
+        arrow = arrow.replace_schema_metadata({'version': version})
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, arrow.schema) as writer:
+            writer.write_table(arrow)
+        return sink.getvalue().to_pybytes()
+    rows = table.to_json(orient='records', force_ascii=False)
+    return f'{{"version": "{version}", "rows": {rows}}}'.encode('utf-8')
+
+
+class ResponseCache:
+    """Réponses sérialisées par (version, requête) ; une nouvelle version invalide tout naturellement"""
+
+    def __init__(self, refresher, max_entries=API_CACHE_ENTRIES):
+        self.refresher = refresher
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path, filters, fmt):
+        """(version, ETag, octets) ; calcul hors verrou, les requêtes en cache ne s'attendent pas"""
+        # Version figée pour toute la requête, même si une mise à jour est publiée entre-temps
+        backend, _ = self.refresher.current
+        version = backend.catalog.version
+        tag = etag(version, path, filters, fmt)
+        with self._lock:
+            body = self._entries.get(tag)
+            if body is not None:
+                self._entries.move_to_end(tag)
+                return version, tag, body
+        body = serialize(ENDPOINTS[path](backend, filters), version, fmt)
+        with self._lock:
+            self._entries[tag] = body
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return version, tag, body
+
+    def current_etag(self, path, filters, fmt):
+        return etag(self.refresher.version, path, filters, fmt)
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    """API HTTP en lecture seule : GET /api/<table>?filtres, /api/version et /healthz"""
+
+    protocol_version = 'HTTP/1.1'
+    # En-têtes et corps écrits séparément : sans TCP_NODELAY, chaque réponse attend l'ACK retardé
+    disable_nagle_algorithm = True
+    server_version = 'GreenAI-API'
+    cache = None
+
+    def log_message(self, format, *args):
+        # Pas de journal par requête (plusieurs centaines par seconde)
+        pass
+
+    def _send(self, status, body=b'', content_type=JSON_TYPE, headers=()):
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        if status != 304:
+            # 304 : ni corps ni longueur (celle de la réponse en cache du client reste valable)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def _error(self, status, message):
+        self._send(status, json.dumps({'error': message}, ensure_ascii=False).encode('utf-8'))
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == '/healthz':
+            return self._send(200, b'{"status": "ok"}')
+        if url.path == '/api/version':
+            body = json.dumps({'version': self.cache.refresher.version,
+                               'endpoints': sorted(ENDPOINTS)}).encode('utf-8')
+            return self._send(200, body, headers=[('Cache-Control', 'no-cache')])
+        if url.path not in ENDPOINTS:
+            return self._error(404, f"Table inconnue : {url.path}")
+        try:
+            filters = parse_filters(url.query)
+            fmt = response_format(url.query, self.headers.get('Accept'))
+        except ValueError as e:
+            return self._error(400, str(e))
+
+        # Revalidation : l'ETag se calcule sans toucher aux données
+        tag = self.cache.current_etag(url.path, filters, fmt)
+        headers = [('ETag', tag), ('Cache-Control', 'no-cache'), ('Vary', 'Accept')]
+        if tag in [t.strip() for t in self.headers.get('If-None-Match', '').split(',')]:
+            return self._send(304, headers=headers)
+        try:
+            version, tag, body = self.cache.get(url.path, filters, fmt)
+        except Exception as e:
+            return self._error(500, f"Erreur de calcul : {e}")
+        headers = [('ETag', tag), ('Cache-Control', 'no-cache'), ('Vary', 'Accept'),
+                   ('X-Dataset-Version', version)]
+        self._send(200, body, ARROW_TYPE if fmt == 'arrow' else JSON_TYPE, headers)
+
+    do_HEAD = do_GET
+
+
+def serve(host=API_HOST, port=API_PORT, refresher=None):
+    """Démarre l'API (bloquant) ; suit les mises à jour du catalogue comme le tableau de bord"""
+    refresher = refresher or dataset_refresher.DatasetRefresher().start()
+    handler = type('Handler', (ApiHandler,), {'cache': ResponseCache(refresher)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    print(f"API Green AI sur http://{host}:{port} (données {refresher.version})")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        refresher.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="API HTTP en lecture seule des agrégats du tableau de bord")
+    parser.add_argument('--host', default=API_HOST)
+    parser.add_argument('--port', type=int, default=API_PORT)
+    args = parser.parse_args()
+    serve(args.host, args.port)
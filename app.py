@@ -4,6 +4,23 @@ import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import numpy as np
+import time
+
+import data_pipeline
+import data_quality
+import dataset_refresher
+import emissions
+import facet_index
+import figure_payload
+import projection
+import quantile_sketch
+import query_backend
+import question_index
+import routing
+import self_footprint
+import stream_ingest
+import token_regression
+import topk_index
 
 # Configuration de la page
 st.set_page_config(
@@ -37,94 +54,189 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-@st.cache_data
+@st.cache_resource
 def load_data():
-    """Charge et nettoie les données du fichier CSV"""
+    """Ouvre le catalogue des données nettoyées et démarre sa mise à jour en arrière-plan"""
     try:
-        # Chargement du fichier CSV
-        df = pd.read_csv('green Ai - Unpivoted (1).csv')
-        
-        # Transformation du format comparaison vers format standard
-        # Créer deux DataFrames séparés pour les modèles A et B
-        df_a = df[['question_id', 'question_categorie', 'categorie_model', 'model A', 'token A', 
-                   'time A (sec)', 'score A', 'cost A (€)', 'electricity A (wh)', 'co2 A (g)']].copy()
-        df_b = df[['question_id', 'question_categorie', 'categorie_model', 'model B', 'token B', 
-                   'time B (sec)', 'score B', 'cost B (€)', 'electricity B (wh)', 'co2 B (g)']].copy()
-        
-        # Renommer les colonnes pour avoir un format uniforme
-        df_a.columns = ['question_id', 'question_categorie', 'categorie_model', 'model', 'tokens', 
-                        'time (sec)', 'score', 'cost (€)', 'electricity (wh)', 'co2 (g)']
-        df_b.columns = ['question_id', 'question_categorie', 'categorie_model', 'model', 'tokens', 
-                        'time (sec)', 'score', 'cost (€)', 'electricity (wh)', 'co2 (g)']
-        
-        # Ajouter une colonne pour identifier le modèle (A ou B)
-        df_a['model_position'] = 'A'
-        df_b['model_position'] = 'B'
-        
-        # Combiner les deux DataFrames
-        df_combined = pd.concat([df_a, df_b], ignore_index=True)
-        
-        # Nettoyage des données
-        numeric_columns = ['tokens', 'time (sec)', 'score', 'electricity (wh)', 'co2 (g)']
-        
-        for col in numeric_columns:
-            if col in df_combined.columns:
-                # Remplacer les virgules par des points et convertir en numérique
-                df_combined[col] = df_combined[col].astype(str).str.replace(',', '.').replace('', np.nan)
-                df_combined[col] = pd.to_numeric(df_combined[col], errors='coerce')
-        
-        # Supprimer les lignes avec des valeurs manquantes critiques
-        df_combined = df_combined.dropna(subset=['model', 'categorie_model'])
-        
-        # Pour les tokens, remplacer les NaN par la médiane de chaque modèle
-        df_combined['tokens'] = df_combined.groupby('model')['tokens'].transform(lambda x: x.fillna(x.median()))
-        
-        # Si encore des NaN dans tokens, utiliser la médiane globale
-        if df_combined['tokens'].isna().any():
-            df_combined['tokens'] = df_combined['tokens'].fillna(df_combined['tokens'].median())
-        
-        # S'assurer qu'il n'y a pas de valeurs négatives ou nulles pour size
-        df_combined['tokens'] = df_combined['tokens'].clip(lower=1)
-        
-        return df_combined
+        return dataset_refresher.DatasetRefresher().start()
     except Exception as e:
         st.error(f"Erreur lors du chargement des données: {e}")
         return None
 
+@st.cache_resource
+def load_intensity():
+    """Charge la table d'intensité carbone du réseau par région et par heure"""
+    try:
+        return emissions.load_intensity()
+    except (OSError, KeyError, ValueError):
+        return None
+
+@st.cache_resource
+def load_stream():
+    """Démarre le suivi du journal des requêtes LLM (partagé par toutes les sessions)"""
+    return stream_ingest.StreamIngestor().start()
+
+@st.cache_resource(max_entries=2)
+def load_facet_index(version, _backend):
+    """Cube de comptes des filtres de la barre latérale pour la version servie"""
+    return facet_index.FacetIndex(_backend)
+
+@st.cache_resource(max_entries=2)
+def load_projection(version, _backend):
+    """Moteur de projection de la version servie (son cache de scénarios vit avec lui)"""
+    return projection.ProjectionEngine(_backend)
+
+@st.cache_resource(max_entries=2)
+def load_question_index(version, _backend):
+    """Index question_id -> plage de lignes de la version servie"""
+    return question_index.QuestionIndex(_backend)
+
+@st.cache_resource(max_entries=2)
+def load_token_regression(version, _backend):
+    """Régressions énergie/CO₂/temps selon les tokens, ajustées une fois par version des données"""
+    return token_regression.TokenRegression(_backend)
+
+@st.fragment(run_every=stream_ingest.LIVE_REFRESH_SECONDS)
+def live_section():
+    """Agrégats glissants du journal des requêtes, rafraîchis sans réexécuter toute la page"""
+    ingestor = load_stream()
+    aggregates = ingestor.aggregates
+    
+    # Chaque session ne récupère que les lignes modifiées depuis son dernier passage
+    state = st.session_state.setdefault('live', {'seq': 0, 'ts': None, 'tables': {}})
+    seq = aggregates.seq
+    now = time.time()
+    for dimension in ['model', 'categorie_model']:
+        delta = aggregates.changes(dimension, since_seq=state['seq'], since_ts=state['ts'], now=now)
+        table = state['tables'].get(dimension)
+        if table is None or table.empty:
+            table = delta
+        elif not delta.empty:
+            table = pd.concat([table.drop(delta.index, errors='ignore'), delta]).sort_index()
+        state['tables'][dimension] = table
+    state['seq'] = seq
+    state['ts'] = now
+    
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        st.metric("Requêtes ingérées", ingestor.ingested)
+    with col2:
+        st.metric("Lignes rejetées", ingestor.rejected)
+    with col3:
+        last_event = "—" if ingestor.last_event_ts is None else time.strftime('%H:%M:%S', time.localtime(ingestor.last_event_ts))
+        st.metric("Dernière requête", last_event)
+    
+    model_live = state['tables']['model']
+    if model_live.empty:
+        st.info(f"Aucune requête reçue pour l'instant dans `{ingestor.path}`.")
+        return
+    
+    window_minutes = aggregates.n_buckets * aggregates.bucket_seconds / 60
+    st.caption(f"Fenêtre glissante : {window_minutes:.0f} min - demi-vie des moyennes exponentielles : {aggregates.half_life:.0f} s")
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        fig_live_co2 = px.bar(
+            x=model_live.index,
+            y=model_live['co2 (g) (somme fenêtre)'],
+            title="Émissions CO₂ sur la Fenêtre Glissante",
+            labels={'x': 'Modèle', 'y': 'CO₂ (g)'},
+            color=model_live['co2 (g) (somme fenêtre)'],
+            color_continuous_scale='Reds'
+        )
+        fig_live_co2.update_layout(height=400)
+        figure_payload.plotly_chart(fig_live_co2, use_container_width=True)
+    
+    with col2:
+        fig_live_time = px.bar(
+            x=model_live.index,
+            y=model_live['time (sec) (ewm)'],
+            title="Temps de Réponse (Moyenne Exponentielle)",
+            labels={'x': 'Modèle', 'y': 'Temps (sec)'},
+            color=model_live['time (sec) (ewm)'],
+            color_continuous_scale='Blues'
+        )
+        fig_live_time.update_layout(height=400)
+        figure_payload.plotly_chart(fig_live_time, use_container_width=True)
+    
+    st.subheader("📊 Agrégats Glissants par Modèle")
+    st.dataframe(model_live.round(3), use_container_width=True)
+    
+    category_live = state['tables']['categorie_model']
+    if not category_live.empty:
+        st.subheader("📊 Agrégats Glissants par Catégorie")
+        st.dataframe(category_live.round(3), use_container_width=True)
+
+def sample_caption(shown, total):
+    """Signale un nuage de points limité à un échantillon des réponses filtrées"""
+    if shown < total:
+        st.caption(f"Échantillon de {shown:,} réponses sur {int(total):,}.")
+
 def main():
+    figure_payload.start_rerun()
+    meter = self_footprint.start()
+    
     # Titre principal
     st.markdown('<h1 class="main-header">🌱 Green AI Data Story</h1>', unsafe_allow_html=True)
     st.markdown("### Analyse comparative des modèles d'IA : Performance vs Impact Environnemental")
     
     # Chargement des données
-    df = load_data()
+    refresher = load_data()
     
-    if df is None:
+    if refresher is None:
         st.error("Impossible de charger les données. Vérifiez que le fichier CSV est présent.")
         return
     
+    # Version figée pour toute la réexécution, même si une mise à jour est publiée entre-temps
+    backend, loaded_at = refresher.current
+    
     # Sidebar pour les filtres
     st.sidebar.header("🔧 Filtres")
     
+    # Filtres en cascade : options restantes et comptes lus dans le cube des facettes
+    facets = load_facet_index(backend.catalog.version, backend)
+    all_question_categories = facets.options['question_categorie']
+    all_categories = facets.options['categorie_model']
+    all_models = facets.options['model']
+    
+    previous = st.session_state.get('facet_options')
+    options, selections = facets.cascade(
+        {col: st.session_state.get(f"filter_{col}") for col in facet_index.FACETS},
+        previous if previous is not None and previous['version'] == backend.catalog.version else None
+    )
+    # Sélections écrites avant la création des widgets (pas de valeur par défaut à passer)
+    for col, selected in selections.items():
+        st.session_state[f"filter_{col}"] = selected
+    st.session_state['facet_options'] = dict(options, version=backend.catalog.version)
+    counts, selected_rows = facets.counts(selections, st.session_state.get('filter_min_score', 0))
+    
+    def with_count(col):
+        return lambda value: f"{value} ({counts[col][value]:,})"
+    
     # Filtre par catégorie de question
     question_categories = st.sidebar.multiselect(
         "Catégories de questions:",
-        options=df['question_categorie'].unique(),
-        default=df['question_categorie'].unique()
+        options=options['question_categorie'],
+        format_func=with_count('question_categorie'),
+        key='filter_question_categorie'
     )
     
     # Filtre par catégorie de modèle
     categories = st.sidebar.multiselect(
         "Catégories de modèles:",
-        options=df['categorie_model'].unique(),
-        default=df['categorie_model'].unique()
+        options=options['categorie_model'],
+        format_func=with_count('categorie_model'),
+        key='filter_categorie_model'
     )
     
-    # Filtre par modèle
+    # Filtre par modèle (seulement ceux des catégories retenues)
     models = st.sidebar.multiselect(
         "Modèles spécifiques:",
-        options=df['model'].unique(),
-        default=df['model'].unique()
+        options=options['model'],
+        format_func=with_count('model'),
+        key='filter_model'
     )
     
     # Filtre par score minimum
@@ -133,87 +245,119 @@ def main():
         min_value=0,
         max_value=5,
         value=0,
-        step=1
+        step=1,
+        key='filter_min_score'
     )
+    st.sidebar.caption(f"Réponses retenues : {selected_rows:,} / {facets.total:,}")
+    
+    st.sidebar.caption(f"Moteur de requêtes : {backend.name}")
+    st.sidebar.caption(
+        f"Version des données : {backend.catalog.version} "
+        f"(chargée le {loaded_at:%d/%m/%Y à %H:%M:%S})"
+    )
+    if refresher.refreshing:
+        st.sidebar.info("🔄 Nouvelle version des données en préparation...")
+    if refresher.last_error is not None:
+        st.sidebar.warning(f"Mise à jour des données impossible : {refresher.last_error}")
     
     # Application des filtres
-    filtered_df = df[
-        (df['question_categorie'].isin(question_categories)) &
-        (df['categorie_model'].isin(categories)) &
-        (df['model'].isin(models)) &
-        (df['score'] >= min_score)
-    ]
-    
-    # Métriques globales
+    filters = {
+        'question_categorie': question_categories,
+        'categorie_model': categories,
+        'model': models,
+        'min_score': min_score
+    }
+    read_partitions = len(backend.catalog.prune(filters))
+    st.sidebar.caption(f"Partitions lues : {read_partitions}/{len(backend.catalog.partitions)}")
+
+    if selected_rows == 0:
+        st.warning("Aucune réponse ne correspond aux filtres : élargissez la sélection dans la barre latérale.")
+        self_footprint.render_sidebar(meter)
+        return
+    
+    # Vue par défaut (aucun filtre actif) : on réutilise les agrégats précalculés
+    aggregates = backend.aggregates
+    unfiltered = (
+        min_score == 0 and
+        set(question_categories) == set(all_question_categories) and
+        set(categories) == set(all_categories) and
+        set(models) == set(all_models)
+    )
+    
+    # Métriques globales (agrégats calculés par le moteur de requêtes, sans rapatrier les lignes)
     st.header("📊 Vue d'ensemble")
+    overview = backend.group_stats(filters).iloc[0]
     
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
         st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-        total_models = filtered_df['model'].nunique()
+        total_models = int(overview['modèles'])
         st.metric("Nombre de modèles", total_models)
         st.markdown('</div>', unsafe_allow_html=True)
     
     with col2:
         st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-        avg_score = filtered_df['score'].mean()
+        avg_score = overview['score']
         st.metric("Score moyen", f"{avg_score:.2f}")
         st.markdown('</div>', unsafe_allow_html=True)
     
     with col3:
         st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-        total_electricity = filtered_df['electricity (wh)'].sum()
+        total_electricity = overview['electricity total (wh)']
         st.metric("Consommation totale", f"{total_electricity:.1f} Wh")
         st.markdown('</div>', unsafe_allow_html=True)
     
     with col4:
         st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-        total_co2 = filtered_df['co2 (g)'].sum()
+        total_co2 = overview['co2 total (g)']
         st.metric("Émissions CO₂", f"{total_co2:.1f} g")
         st.markdown('</div>', unsafe_allow_html=True)
     
     # Navigation par onglets
-    tab1, tab2, tab3, tab4 = st.tabs([
+    tab1, tab2, tab3, tab4, tab5, tab6, tab7 = st.tabs([
         "🔍 Analyse par Catégorie de Modèle", 
         "⚖️ Comparaison entre Catégories", 
         "🏆 Comparaison Générale des Modèles",
-        "❓ Analyse par Type de Question"
+        "❓ Analyse par Type de Question",
+        "📡 Suivi en Direct",
+        "🌍 Scénarios Réseau Électrique",
+        "🔮 Projection Flotte"
     ])
     
     # ===== SECTION 1: ANALYSE PAR CATÉGORIE DE MODÈLE =====
+    meter.mark("Onglet 1 - Catégorie de modèle")
     with tab1:
         st.header("🔍 Analyse Détaillée par Catégorie de Modèle")
         
         # Sélection de la catégorie à analyser
         selected_category = st.selectbox(
             "Choisissez une catégorie de modèle à analyser:",
-            options=filtered_df['categorie_model'].unique()
+            options=[c for c in categories if counts['categorie_model'][c] > 0]
         )
         
-        category_data = filtered_df[filtered_df['categorie_model'] == selected_category]
-        
-        if not category_data.empty:
+        if selected_category is not None:
+            category_filters = {**filters, 'categorie_model': [selected_category]}
+            category_stats = backend.group_stats(category_filters).iloc[0]
+            category_models = backend.group_stats(category_filters, 'model')
+            
             # Métriques pour la catégorie sélectionnée
             col1, col2, col3, col4 = st.columns(4)
             
             with col1:
-                st.metric("Modèles dans cette catégorie", category_data['model'].nunique())
+                st.metric("Modèles dans cette catégorie", int(category_stats['modèles']))
             with col2:
-                st.metric("Score moyen", f"{category_data['score'].mean():.2f}")
+                st.metric("Score moyen", f"{category_stats['score']:.2f}")
             with col3:
-                st.metric("CO₂ moyen", f"{category_data['co2 (g)'].mean():.2f}g")
+                st.metric("CO₂ moyen", f"{category_stats['co2 (g)']:.2f}g")
             with col4:
-                st.metric("Temps moyen", f"{category_data['time (sec)'].mean():.2f}s")
+                st.metric("Temps moyen", f"{category_stats['time (sec)']:.2f}s")
             
             col1, col2 = st.columns(2)
             
             with col1:
                 # Performance par modèle dans cette catégorie
-                model_perf = category_data.groupby('model').agg({
-                    'score': 'mean',
-                    'time (sec)': 'mean'
-                }).round(2)
+                model_perf = category_models[['score', 'time (sec)']].round(2)
                 
                 fig_model_score = px.bar(
                     x=model_perf.index,
@@ -224,13 +368,10 @@ def main():
                     color_continuous_scale='Viridis'
                 )
                 fig_model_score.update_layout(height=400)
-                st.plotly_chart(fig_model_score, use_container_width=True)
+                figure_payload.plotly_chart(fig_model_score, use_container_width=True)
                 
                 # Impact environnemental par modèle
-                model_env = category_data.groupby('model').agg({
-                    'co2 (g)': 'mean',
-                    'electricity (wh)': 'mean'
-                }).round(2)
+                model_env = category_models[['co2 (g)', 'electricity (wh)']].round(2)
                 
                 fig_model_co2 = px.bar(
                     x=model_env.index,
@@ -241,22 +382,24 @@ def main():
                     color_continuous_scale='Reds'
                 )
                 fig_model_co2.update_layout(height=400)
-                st.plotly_chart(fig_model_co2, use_container_width=True)
+                figure_payload.plotly_chart(fig_model_co2, use_container_width=True)
             
             with col2:
-                # Distribution des scores dans cette catégorie
-                fig_dist_score = px.histogram(
-                    category_data,
+                # Distribution des scores dans cette catégorie (effectifs par score)
+                fig_dist_score = px.bar(
+                    backend.score_counts(category_filters, 'model'),
                     x='score',
+                    y='réponses',
                     color='model',
-                    title=f"Distribution des Scores - Catégorie {selected_category}",
-                    nbins=10
+                    title=f"Distribution des Scores - Catégorie {selected_category}"
                 )
                 fig_dist_score.update_layout(height=400)
-                st.plotly_chart(fig_dist_score, use_container_width=True)
+                figure_payload.plotly_chart(fig_dist_score, use_container_width=True)
                 
                 # Corrélation temps vs performance pour cette catégorie
-                plot_data_cat = category_data.dropna(subset=['time (sec)', 'score', 'tokens'])
+                plot_data_cat = backend.sample(
+                    category_filters, ['model', 'time (sec)', 'score', 'tokens']
+                ).dropna(subset=['time (sec)', 'score', 'tokens'])
                 
                 fig_time_score_cat = px.scatter(
                     plot_data_cat,
@@ -268,44 +411,35 @@ def main():
                     labels={'time (sec)': 'Temps (sec)', 'score': 'Score'}
                 )
                 fig_time_score_cat.update_layout(height=400)
-                st.plotly_chart(fig_time_score_cat, use_container_width=True)
+                figure_payload.plotly_chart(fig_time_score_cat, use_container_width=True)
+                sample_caption(len(plot_data_cat), category_stats['réponses'])
             
             # Tableau détaillé des modèles de cette catégorie
             st.subheader(f"📊 Tableau Détaillé - Catégorie {selected_category}")
             
-            category_summary = category_data.groupby('model').agg({
-                'score': ['mean', 'std'],
-                'co2 (g)': ['mean', 'sum'],
-                'electricity (wh)': ['mean', 'sum'],
-                'time (sec)': ['mean', 'std'],
-                'tokens': 'mean'
-            }).round(2)
-            
-            # Aplatir les colonnes multi-niveau
-            category_summary.columns = ['Score Moyen', 'Score Std', 'CO₂ Moyen', 'CO₂ Total', 
-                                      'Élec. Moyenne', 'Élec. Totale', 'Temps Moyen', 'Temps Std', 'Tokens Moyen']
+            category_summary = backend.summary_table({**filters, 'categorie_model': [selected_category]}, 'model')
             
             st.dataframe(category_summary, use_container_width=True)
     
     # ===== SECTION 2: COMPARAISON ENTRE CATÉGORIES =====
+    meter.mark("Onglet 2 - Comparaison des catégories")
     with tab2:
         st.header("⚖️ Comparaison entre Catégories de Modèles")
         
         # Analyse comparative des catégories
-        category_comparison = filtered_df.groupby('categorie_model').agg({
-            'score': ['mean', 'std'],
-            'co2 (g)': ['mean', 'sum'],
-            'electricity (wh)': ['mean', 'sum'],
-            'time (sec)': ['mean', 'std'],
-            'tokens': 'mean'
-        }).round(2)
+        if unfiltered:
+            category_comparison = aggregates['category_comparison']
+        else:
+            category_comparison = backend.summary_table(filters, 'categorie_model')
+        
+        categories_stats = backend.group_stats(filters, 'categorie_model')
         
         # Graphiques de comparaison
         col1, col2 = st.columns(2)
         
         with col1:
             # Comparaison des scores moyens
-            score_means = filtered_df.groupby('categorie_model')['score'].mean()
+            score_means = categories_stats['score']
             
             fig_cat_score = px.bar(
                 x=score_means.index,
@@ -316,10 +450,10 @@ def main():
                 color_continuous_scale='Viridis'
             )
             fig_cat_score.update_layout(height=400)
-            st.plotly_chart(fig_cat_score, use_container_width=True)
+            figure_payload.plotly_chart(fig_cat_score, use_container_width=True)
             
             # Comparaison des émissions totales
-            co2_totals = filtered_df.groupby('categorie_model')['co2 (g)'].sum()
+            co2_totals = categories_stats['co2 total (g)']
             
             fig_cat_co2 = px.bar(
                 x=co2_totals.index,
@@ -330,21 +464,37 @@ def main():
                 color_continuous_scale='Reds'
             )
             fig_cat_co2.update_layout(height=400)
-            st.plotly_chart(fig_cat_co2, use_container_width=True)
+            figure_payload.plotly_chart(fig_cat_co2, use_container_width=True)
         
         with col2:
-            # Boxplot des scores par catégorie
-            fig_box_score = px.box(
-                filtered_df,
-                x='categorie_model',
-                y='score',
-                title="Distribution des Scores par Catégorie"
-            )
-            fig_box_score.update_layout(height=400)
-            st.plotly_chart(fig_box_score, use_container_width=True)
+            # Boxplot des scores par catégorie, reconstruit depuis les quartiles et les moustaches
+            # de Tukey ; les points aberrants sont ajoutés un par (catégorie, score)
+            score_box = backend.score_box(filters, 'categorie_model')
+            score_outliers = backend.score_outliers(filters, 'categorie_model')
+            fig_box_score = go.Figure(go.Box(
+                x=score_box.index,
+                q1=score_box['q1'],
+                median=score_box['médiane'],
+                q3=score_box['q3'],
+                lowerfence=score_box['moustache basse'],
+                upperfence=score_box['moustache haute'],
+                marker_color='#636efa',
+                showlegend=False
+            ))
+            fig_box_score.add_trace(go.Scatter(
+                x=score_outliers['categorie_model'],
+                y=score_outliers['score'],
+                mode='markers',
+                marker_color='#636efa',
+                customdata=score_outliers['réponses'],
+                hovertemplate='%{x} : score %{y} (%{customdata} réponse(s))<extra></extra>',
+                showlegend=False
+            ))
+            fig_box_score.update_layout(height=400, title="Distribution des Scores par Catégorie")
+            figure_payload.plotly_chart(fig_box_score, use_container_width=True)
             
             # Comparaison temps de réponse
-            time_means = filtered_df.groupby('categorie_model')['time (sec)'].mean()
+            time_means = categories_stats['time (sec)']
             
             fig_cat_time = px.bar(
                 x=time_means.index,
@@ -355,25 +505,17 @@ def main():
                 color_continuous_scale='Blues'
             )
             fig_cat_time.update_layout(height=400)
-            st.plotly_chart(fig_cat_time, use_container_width=True)
+            figure_payload.plotly_chart(fig_cat_time, use_container_width=True)
         
         # Radar chart pour comparaison multi-critères
         st.subheader("🎯 Comparaison Multi-Critères")
         
         # Normalisation des métriques pour le radar chart
-        cat_metrics = filtered_df.groupby('categorie_model').agg({
-            'score': 'mean',
-            'co2 (g)': 'mean',
-            'electricity (wh)': 'mean',
-            'time (sec)': 'mean'
-        })
-        
-        # Normaliser (inverser pour CO2, electricity et time car plus bas = mieux)
-        cat_metrics_norm = cat_metrics.copy()
-        cat_metrics_norm['score'] = cat_metrics_norm['score'] / cat_metrics_norm['score'].max()
-        cat_metrics_norm['co2_inv'] = 1 - (cat_metrics_norm['co2 (g)'] / cat_metrics_norm['co2 (g)'].max())
-        cat_metrics_norm['elec_inv'] = 1 - (cat_metrics_norm['electricity (wh)'] / cat_metrics_norm['electricity (wh)'].max())
-        cat_metrics_norm['time_inv'] = 1 - (cat_metrics_norm['time (sec)'] / cat_metrics_norm['time (sec)'].max())
+        # (inverser pour CO2, electricity et time car plus bas = mieux)
+        if unfiltered:
+            cat_metrics_norm = data_pipeline.normalize_radar(aggregates['category_metrics'])
+        else:
+            cat_metrics_norm = backend.radar(filters)
         
         fig_radar = go.Figure()
         
@@ -398,93 +540,301 @@ def main():
             title="Comparaison Radar des Catégories"
         )
         
-        st.plotly_chart(fig_radar, use_container_width=True)
+        figure_payload.plotly_chart(fig_radar, use_container_width=True)
         
         # Tableau de comparaison
         st.subheader("📊 Tableau Comparatif des Catégories")
         
-        category_comparison.columns = ['Score Moyen', 'Score Std', 'CO₂ Moyen', 'CO₂ Total',
-                                     'Élec. Moyenne', 'Élec. Totale', 'Temps Moyen', 'Temps Std', 'Tokens Moyen']
-        
         st.dataframe(category_comparison, use_container_width=True)
     
     # ===== SECTION 3: COMPARAISON GÉNÉRALE DES MODÈLES =====
+    meter.mark("Onglet 3 - Comparaison générale")
     with tab3:
         st.header("🏆 Comparaison Générale des Modèles")
         
-        # Calcul de l'efficacité
-        filtered_df_copy = filtered_df.copy()
-        filtered_df_copy['efficacite_co2'] = filtered_df_copy['score'] / (filtered_df_copy['co2 (g)'] + 0.01)
-        filtered_df_copy['efficacite_elec'] = filtered_df_copy['score'] / (filtered_df_copy['electricity (wh)'] + 0.01)
+        # Taille des classements (les moyennes par modèle viennent de l'index top-k)
+        top_k = st.slider(
+            "Nombre de modèles par classement:",
+            min_value=1,
+            max_value=max(len(all_models), 1),
+            value=min(10, max(len(all_models), 1))
+        )
         
         col1, col2 = st.columns(2)
         
         with col1:
             # Top modèles par score
-            top_score = filtered_df_copy.groupby('model')['score'].mean().sort_values(ascending=False).head(10)
+            top_score = backend.topk.top_k(filters, 'score', top_k)
             
             fig_top_score = px.bar(
                 x=top_score.values,
                 y=top_score.index,
                 orientation='h',
-                title="Top 10 - Meilleurs Scores",
+                title=f"Top {top_k} - Meilleurs Scores",
                 labels={'x': 'Score moyen', 'y': 'Modèle'},
                 color=top_score.values,
                 color_continuous_scale='Viridis'
             )
             fig_top_score.update_layout(height=500)
-            st.plotly_chart(fig_top_score, use_container_width=True)
+            figure_payload.plotly_chart(fig_top_score, use_container_width=True)
             
             # Modèles les plus rapides
-            fastest_models = filtered_df_copy.groupby('model')['time (sec)'].mean().sort_values(ascending=True).head(10)
+            fastest_models = backend.topk.top_k(filters, 'time (sec)', top_k)
             
             fig_fastest = px.bar(
                 x=fastest_models.values,
                 y=fastest_models.index,
                 orientation='h',
-                title="Top 10 - Modèles les Plus Rapides",
+                title=f"Top {top_k} - Modèles les Plus Rapides",
                 labels={'x': 'Temps moyen (sec)', 'y': 'Modèle'},
                 color=fastest_models.values,
                 color_continuous_scale='Blues_r'
             )
             fig_fastest.update_layout(height=500)
-            st.plotly_chart(fig_fastest, use_container_width=True)
+            figure_payload.plotly_chart(fig_fastest, use_container_width=True)
         
         with col2:
             # Modèles les plus efficaces (CO2)
-            top_efficiency_co2 = filtered_df_copy.groupby('model')['efficacite_co2'].mean().sort_values(ascending=False).head(10)
+            top_efficiency_co2 = backend.topk.top_k(filters, 'efficacite_co2', top_k)
             
             fig_eff_co2 = px.bar(
                 x=top_efficiency_co2.values,
                 y=top_efficiency_co2.index,
                 orientation='h',
-                title="Top 10 - Efficacité CO₂ (Score/g)",
+                title=f"Top {top_k} - Efficacité CO₂ (Score/g)",
                 labels={'x': 'Efficacité CO₂', 'y': 'Modèle'},
                 color=top_efficiency_co2.values,
                 color_continuous_scale='Greens'
             )
             fig_eff_co2.update_layout(height=500)
-            st.plotly_chart(fig_eff_co2, use_container_width=True)
+            figure_payload.plotly_chart(fig_eff_co2, use_container_width=True)
             
             # Modèles avec plus faible empreinte carbone
-            lowest_co2 = filtered_df_copy.groupby('model')['co2 (g)'].mean().sort_values(ascending=True).head(10)
+            lowest_co2 = backend.topk.top_k(filters, 'co2 (g)', top_k)
             
             fig_low_co2 = px.bar(
                 x=lowest_co2.values,
                 y=lowest_co2.index,
                 orientation='h',
-                title="Top 10 - Plus Faible Empreinte Carbone",
+                title=f"Top {top_k} - Plus Faible Empreinte Carbone",
                 labels={'x': 'CO₂ moyen (g)', 'y': 'Modèle'},
                 color=lowest_co2.values,
                 color_continuous_scale='Greens'
             )
             fig_low_co2.update_layout(height=500)
-            st.plotly_chart(fig_low_co2, use_container_width=True)
+            figure_payload.plotly_chart(fig_low_co2, use_container_width=True)
+        
+        # Efficacité de service, indépendante de la longueur des réponses
+        st.subheader("⚡ Efficacité par Token")
+        
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            lowest_energy_token = backend.topk.top_k(filters, 'electricity (mwh/token)', top_k)
+            
+            fig_energy_token = px.bar(
+                x=lowest_energy_token.values,
+                y=lowest_energy_token.index,
+                orientation='h',
+                title=f"Top {top_k} - Plus Faible Énergie par Token",
+                labels={'x': 'Électricité par token (mWh)', 'y': 'Modèle'},
+                color=lowest_energy_token.values,
+                color_continuous_scale='Greens_r'
+            )
+            fig_energy_token.update_layout(height=500)
+            figure_payload.plotly_chart(fig_energy_token, use_container_width=True)
+        
+        with col2:
+            top_throughput = backend.topk.top_k(filters, 'tokens/sec', top_k)
+            
+            fig_throughput = px.bar(
+                x=top_throughput.values,
+                y=top_throughput.index,
+                orientation='h',
+                title=f"Top {top_k} - Meilleur Débit (tokens/s)",
+                labels={'x': 'Débit (tokens/s)', 'y': 'Modèle'},
+                color=top_throughput.values,
+                color_continuous_scale='Blues'
+            )
+            fig_throughput.update_layout(height=500)
+            figure_payload.plotly_chart(fig_throughput, use_container_width=True)
+        
+        # Évolution de l'énergie et de la latence avec la longueur des réponses
+        st.subheader("📈 Coût selon la Longueur des Réponses")
+        
+        regression = load_token_regression(backend.catalog.version, backend)
+        
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            regression_target = st.radio(
+                "Grandeur modélisée:",
+                options=list(token_regression.TARGETS),
+                format_func=lambda t: token_regression.TARGETS[t],
+                horizontal=True
+            )
+        with col2:
+            regression_form = st.radio(
+                "Forme du modèle:",
+                options=list(token_regression.FORMS),
+                format_func=lambda f: token_regression.FORMS[f],
+                horizontal=True
+            )
+        
+        regression_models = sorted(m for m in models if counts['model'][m] > 0)
+        regression_points = backend.sample(filters, ['model', 'tokens', regression_target])
+        curves = regression.curves(regression_form, regression_target, regression_models)
+        palette = px.colors.qualitative.Plotly
+        
+        fig_regression = go.Figure()
+        for i, model in enumerate(regression_models):
+            color = palette[i % len(palette)]
+            points = regression_points[regression_points['model'] == model]
+            fig_regression.add_trace(go.Scatter(
+                x=points['tokens'], y=points[regression_target], mode='markers', name=model,
+                legendgroup=model, marker=dict(color=color, opacity=0.5)
+            ))
+            curve = curves[curves['model'] == model]
+            if curve.empty:
+                continue
+            # Bande de confiance : contour fermé (borne haute puis borne basse à rebours)
+            fig_regression.add_trace(go.Scatter(
+                x=np.concatenate([curve['tokens'], curve['tokens'][::-1]]),
+                y=np.concatenate([curve['borne haute'], curve['borne basse'][::-1]]),
+                fill='toself', fillcolor=color, opacity=0.2, line=dict(width=0),
+                legendgroup=model, showlegend=False, hoverinfo='skip'
+            ))
+            fig_regression.add_trace(go.Scatter(
+                x=curve['tokens'], y=curve['ajusté'], mode='lines', line=dict(color=color),
+                legendgroup=model, showlegend=False, name=f"{model} (ajusté)"
+            ))
+        fig_regression.update_layout(
+            height=500,
+            title=f"{token_regression.TARGETS[regression_target]} selon les Tokens "
+                  f"(bandes de confiance {token_regression.CONFIDENCE:.0%})",
+            xaxis_title="Tokens",
+            yaxis_title=token_regression.TARGETS[regression_target]
+        )
+        if regression_form == 'power':
+            fig_regression.update_xaxes(type='log')
+            fig_regression.update_yaxes(type='log')
+        figure_payload.plotly_chart(fig_regression, use_container_width=True)
+        sample_caption(len(regression_points), selected_rows)
+        
+        col1, col2 = st.columns([3, 2])
+        
+        with col1:
+            coefficients = regression.coefficients(regression_form, regression_target)
+            st.dataframe(coefficients[coefficients.index.isin(regression_models)].round(4), use_container_width=True)
+        
+        with col2:
+            # Prédiction pour une longueur de réponse non observée
+            predict_model = st.selectbox("Modèle:", options=list(regression.groups.sort_values()))
+            predict_tokens = st.number_input("Tokens de la réponse:", min_value=1, value=2000, step=100)
+            
+            predict_cols = st.columns(len(token_regression.TARGETS))
+            for predict_col, (target, label) in zip(predict_cols, token_regression.TARGETS.items()):
+                prediction = regression.predict(
+                    regression_form, target, [predict_model], [predict_tokens], interval='prediction'
+                ).iloc[0]
+                with predict_col:
+                    st.metric(label, f"{prediction['ajusté']:.2f}")
+                    st.caption(f"{token_regression.CONFIDENCE:.0%} : {prediction['borne basse']:.2f} - {prediction['borne haute']:.2f}")
+            
+            observed = coefficients.loc[predict_model]
+            if not observed['tokens min'] <= predict_tokens <= observed['tokens max']:
+                st.warning(
+                    f"Extrapolation : {predict_model} a été mesuré entre {observed['tokens min']:.0f} "
+                    f"et {observed['tokens max']:.0f} tokens."
+                )
+            st.caption("Intervalle de prédiction d'une réponse isolée, sur toutes les mesures du modèle.")
+        
+        # Classement personnalisé sur une métrique au choix
+        st.subheader("🔢 Classement Personnalisé")
+        
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            custom_metric = st.selectbox(
+                "Métrique de classement:",
+                options=list(topk_index.METRICS),
+                format_func=lambda m: topk_index.METRICS[m][0]
+            )
+        with col2:
+            lower_is_better = topk_index.METRICS[custom_metric][1]
+            custom_order = st.radio(
+                "Ordre:",
+                options=['Meilleurs', 'Moins bons'],
+                horizontal=True
+            )
+        
+        custom_top = backend.topk.top_k(
+            filters, custom_metric, top_k,
+            ascending=lower_is_better if custom_order == 'Meilleurs' else not lower_is_better
+        )
+        
+        fig_custom_top = px.bar(
+            x=custom_top.values,
+            y=custom_top.index,
+            orientation='h',
+            title=f"Top {top_k} - {topk_index.METRICS[custom_metric][0]} ({custom_order.lower()})",
+            labels={'x': topk_index.METRICS[custom_metric][0], 'y': 'Modèle'},
+            color=custom_top.values,
+            color_continuous_scale='Viridis'
+        )
+        fig_custom_top.update_layout(height=500)
+        figure_payload.plotly_chart(fig_custom_top, use_container_width=True)
+        
+        # Percentiles de queue issus des sketches fusionnés (sans relire les lignes)
+        st.subheader("⏱️ Percentiles de Queue")
+        
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            tail_metric = st.selectbox(
+                "Métrique:",
+                options=quantile_sketch.SKETCH_METRICS,
+                format_func=lambda m: {'time (sec)': 'Temps (sec)', 'co2 (g)': 'CO₂ (g)',
+                                       'electricity (wh)': 'Électricité (Wh)'}[m]
+            )
+        with col2:
+            tail_by = st.radio(
+                "Regrouper par:",
+                options=['model', 'categorie_model', 'question_categorie'],
+                format_func=lambda c: {'model': 'Modèle', 'categorie_model': 'Catégorie',
+                                       'question_categorie': 'Type de question'}[c],
+                horizontal=True
+            )
+        
+        tail = backend.quantiles.quantiles(filters, tail_metric, qs=(0.01, 0.25, 0.5, 0.75, 0.95, 0.99), by=tail_by)
+        
+        if not tail.empty:
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                # Boîtes à moustaches reconstruites depuis les percentiles (moustaches p1 - p99)
+                fig_tail = go.Figure(go.Box(
+                    x=tail.index,
+                    q1=tail['p25'],
+                    median=tail['p50'],
+                    q3=tail['p75'],
+                    lowerfence=tail['p1'],
+                    upperfence=tail['p99'],
+                    marker_color='indianred'
+                ))
+                fig_tail.update_layout(height=450, title=f"Distribution - {tail_metric} (moustaches p1 - p99)")
+                figure_payload.plotly_chart(fig_tail, use_container_width=True)
+            
+            with col2:
+                st.dataframe(tail[['n', 'p50', 'p95', 'p99']].round(3), use_container_width=True)
+                st.caption(f"Percentiles approchés (erreur relative ≤ {quantile_sketch.RELATIVE_ACCURACY:.0%}).")
         
         # Trade-off global performance vs impact
         st.subheader("🎯 Trade-off Performance vs Impact Environnemental")
         
-        plot_data_all = filtered_df_copy.dropna(subset=['score', 'co2 (g)', 'tokens'])
+        plot_data_all = backend.sample(
+            filters, ['co2 (g)', 'score', 'categorie_model', 'tokens', 'model']
+        ).dropna(subset=['score', 'co2 (g)', 'tokens'])
         
         fig_tradeoff_all = px.scatter(
             plot_data_all,
@@ -497,29 +847,16 @@ def main():
             labels={'co2 (g)': 'Émissions CO₂ (g)', 'score': 'Score de performance'}
         )
         fig_tradeoff_all.update_layout(height=500)
-        st.plotly_chart(fig_tradeoff_all, use_container_width=True)
+        figure_payload.plotly_chart(fig_tradeoff_all, use_container_width=True)
+        sample_caption(len(plot_data_all), selected_rows)
         
         # Tableau de classement général
         st.subheader("📊 Classement Général des Modèles")
         
-        model_ranking = filtered_df_copy.groupby('model').agg({
-            'score': 'mean',
-            'co2 (g)': 'mean',
-            'electricity (wh)': 'mean',
-            'time (sec)': 'mean',
-            'efficacite_co2': 'mean',
-            'tokens': 'mean'
-        }).round(2)
-        
-        # Score global
-        model_ranking['score_global'] = (
-            (model_ranking['score'] / model_ranking['score'].max()) * 0.4 +
-            (model_ranking['efficacite_co2'] / model_ranking['efficacite_co2'].max()) * 0.4 +
-            (1 - model_ranking['time (sec)'] / model_ranking['time (sec)'].max()) * 0.2
-        ).round(3)
-        
-        model_ranking = model_ranking.sort_values('score_global', ascending=False)
-        model_ranking.columns = ['Score', 'CO₂ (g)', 'Électricité (Wh)', 'Temps (sec)', 'Efficacité CO₂', 'Tokens', 'Score Global']
+        if unfiltered:
+            model_ranking = aggregates['model_ranking']
+        else:
+            model_ranking = backend.model_ranking(filters)
         
         # Highlighting top 5
         def highlight_top5(row):
@@ -531,35 +868,38 @@ def main():
         st.dataframe(styled_ranking, use_container_width=True)
     
     # ===== SECTION 4: ANALYSE PAR TYPE DE QUESTION =====
+    meter.mark("Onglet 4 - Type de question")
     with tab4:
         st.header("❓ Analyse par Type de Question")
         
         # Sélection du type de question
         selected_question_type = st.selectbox(
             "Choisissez un type de question à analyser:",
-            options=filtered_df['question_categorie'].unique()
+            options=[q for q in question_categories if counts['question_categorie'][q] > 0]
         )
         
-        question_data = filtered_df[filtered_df['question_categorie'] == selected_question_type]
-        
-        if not question_data.empty:
+        if selected_question_type is not None:
+            question_filters = {**filters, 'question_categorie': [selected_question_type]}
+            question_stats = backend.group_stats(question_filters).iloc[0]
+            question_categories_stats = backend.group_stats(question_filters, 'categorie_model')
+            
             # Métriques pour ce type de question
             col1, col2, col3, col4 = st.columns(4)
             
             with col1:
-                st.metric("Nombre de modèles testés", question_data['model'].nunique())
+                st.metric("Nombre de modèles testés", int(question_stats['modèles']))
             with col2:
-                st.metric("Score moyen", f"{question_data['score'].mean():.2f}")
+                st.metric("Score moyen", f"{question_stats['score']:.2f}")
             with col3:
-                st.metric("Questions de ce type", question_data['question_id'].nunique())
+                st.metric("Questions de ce type", int(question_stats['questions']))
             with col4:
-                st.metric("Temps moyen", f"{question_data['time (sec)'].mean():.2f}s")
+                st.metric("Temps moyen", f"{question_stats['time (sec)']:.2f}s")
             
             col1, col2 = st.columns(2)
             
             with col1:
                 # Performance par modèle pour ce type de question
-                model_perf_q = question_data.groupby('model')['score'].mean().sort_values(ascending=False).head(10)
+                model_perf_q = backend.group_stats(question_filters, 'model')['score'].sort_values(ascending=False).head(10)
                 
                 fig_model_q_score = px.bar(
                     x=model_perf_q.values,
@@ -571,25 +911,22 @@ def main():
                     color_continuous_scale='Viridis'
                 )
                 fig_model_q_score.update_layout(height=400)
-                st.plotly_chart(fig_model_q_score, use_container_width=True)
+                figure_payload.plotly_chart(fig_model_q_score, use_container_width=True)
                 
                 # Distribution des scores pour ce type de question
-                fig_dist_q = px.histogram(
-                    question_data,
+                fig_dist_q = px.bar(
+                    backend.score_counts(question_filters, 'categorie_model'),
                     x='score',
+                    y='réponses',
                     color='categorie_model',
-                    title=f"Distribution Scores - Questions '{selected_question_type}'",
-                    nbins=10
+                    title=f"Distribution Scores - Questions '{selected_question_type}'"
                 )
                 fig_dist_q.update_layout(height=400)
-                st.plotly_chart(fig_dist_q, use_container_width=True)
+                figure_payload.plotly_chart(fig_dist_q, use_container_width=True)
             
             with col2:
                 # Impact environnemental par catégorie pour ce type de question
-                env_by_cat_q = question_data.groupby('categorie_model').agg({
-                    'co2 (g)': 'mean',
-                    'electricity (wh)': 'mean'
-                })
+                env_by_cat_q = question_categories_stats[['co2 (g)', 'electricity (wh)']]
                 
                 fig_env_q = make_subplots(
                     rows=1, cols=2,
@@ -610,10 +947,10 @@ def main():
                 
                 fig_env_q.update_layout(height=400, showlegend=False, 
                                       title_text=f"Impact Environnemental - Questions '{selected_question_type}'")
-                st.plotly_chart(fig_env_q, use_container_width=True)
+                figure_payload.plotly_chart(fig_env_q, use_container_width=True)
                 
                 # Temps de réponse par catégorie pour ce type de question
-                time_by_cat_q = question_data.groupby('categorie_model')['time (sec)'].mean()
+                time_by_cat_q = question_categories_stats['time (sec)']
                 
                 fig_time_q = px.bar(
                     x=time_by_cat_q.index,
@@ -624,18 +961,15 @@ def main():
                     color_continuous_scale='Blues'
                 )
                 fig_time_q.update_layout(height=400)
-                st.plotly_chart(fig_time_q, use_container_width=True)
+                figure_payload.plotly_chart(fig_time_q, use_container_width=True)
             
             # Comparaison des types de questions
             st.subheader("🔄 Comparaison entre Types de Questions")
             
-            question_comparison = filtered_df.groupby('question_categorie').agg({
-                'score': 'mean',
-                'co2 (g)': 'mean',
-                'electricity (wh)': 'mean',
-                'time (sec)': 'mean',
-                'tokens': 'mean'
-            }).round(2)
+            if unfiltered:
+                question_comparison = aggregates['question_comparison']
+            else:
+                question_comparison = backend.question_comparison(filters)
             
             # Graphique comparatif des types de questions
             col1, col2 = st.columns(2)
@@ -650,7 +984,7 @@ def main():
                     color_continuous_scale='Viridis'
                 )
                 fig_q_comp_score.update_layout(height=400)
-                st.plotly_chart(fig_q_comp_score, use_container_width=True)
+                figure_payload.plotly_chart(fig_q_comp_score, use_container_width=True)
             
             with col2:
                 fig_q_comp_time = px.bar(
@@ -662,36 +996,402 @@ def main():
                     color_continuous_scale='Reds'
                 )
                 fig_q_comp_time.update_layout(height=400)
-                st.plotly_chart(fig_q_comp_time, use_container_width=True)
+                figure_payload.plotly_chart(fig_q_comp_time, use_container_width=True)
             
             # Tableau détaillé pour ce type de question
             st.subheader(f"📊 Tableau Détaillé - Questions '{selected_question_type}'")
             
-            question_detail = question_data.groupby(['model', 'categorie_model']).agg({
-                'score': ['mean', 'count'],
-                'co2 (g)': 'mean',
-                'electricity (wh)': 'mean',
-                'time (sec)': 'mean'
-            }).round(2)
-            
-            question_detail.columns = ['Score Moyen', 'Nb Questions', 'CO₂ Moyen', 'Élec. Moyenne', 'Temps Moyen']
+            question_detail = backend.question_detail({**filters, 'question_categorie': [selected_question_type]})
             
             st.dataframe(question_detail, use_container_width=True)
+        
+        # Exploration d'une question : réponses de chaque modèle et duels A/B
+        st.subheader("🔎 Exploration par Question")
+        
+        questions = load_question_index(backend.catalog.version, backend)
+        
+        col1, col2 = st.columns([1, 2])
+        
+        with col1:
+            question_rank = st.selectbox(
+                "Classer les questions par:",
+                options=list(question_index.RANK_METRICS),
+                format_func=lambda m: question_index.RANK_METRICS[m]
+            )
+            ranked_questions = questions.ranked_ids(question_rank, question_categories)
+        
+        if not ranked_questions:
+            st.info("Aucune question pour les types de questions sélectionnés.")
+        else:
+            with col2:
+                # Ordre du classement : la question la plus coûteuse est proposée par défaut
+                selected_question = st.selectbox(
+                    "Question:",
+                    options=ranked_questions,
+                    format_func=lambda q: (
+                        f"#{q} - {questions.questions.at[q, 'question_categorie'].strip()} - "
+                        f"{question_index.RANK_METRICS[question_rank]} : {questions.questions.at[q, question_rank]:.2f}"
+                    )
+                )
+            
+            col1, col2 = st.columns([1, 2])
+            
+            with col1:
+                st.markdown(f"**Top 10 - {question_index.RANK_METRICS[question_rank]}**")
+                st.dataframe(
+                    questions.top(question_rank, 10, question_categories).round(2),
+                    use_container_width=True
+                )
+            
+            with col2:
+                answers = questions.answers(selected_question, filters)
+                if answers.empty:
+                    st.info("Aucune réponse à cette question pour les modèles sélectionnés.")
+                else:
+                    fig_question = px.bar(
+                        answers,
+                        x='model',
+                        y=question_rank,
+                        color='categorie_model',
+                        hover_data=['score', 'model_position'],
+                        title=f"Question #{selected_question} - {question_index.RANK_METRICS[question_rank]}",
+                        labels={'model': 'Modèle', question_rank: question_index.RANK_METRICS[question_rank]}
+                    )
+                    fig_question.update_layout(height=350)
+                    figure_payload.plotly_chart(fig_question, use_container_width=True)
+            
+            if not answers.empty:
+                st.markdown("**Réponses des modèles**")
+                st.dataframe(answers.round(3), use_container_width=True, hide_index=True)
+                
+                pairs = questions.pairs(selected_question, filters)
+                if not pairs.empty:
+                    st.markdown("**Duels A/B (écarts B - A)**")
+                    st.dataframe(pairs.round(3), use_container_width=True)
+    
+        # Routage : un modèle par type de question, au moindre impact pour un score minimum
+        st.subheader("🧭 Routage Optimal par Type de Question")
+        
+        col1, col2, col3 = st.columns(3)
+        
+        with col1:
+            routing_objective = st.selectbox(
+                "Critère à minimiser:",
+                options=list(routing.OBJECTIVES),
+                format_func=lambda m: routing.OBJECTIVES[m]
+            )
+            routing_price = st.number_input(
+                "Prix (€) pour 1000 tokens (coût non mesuré):",
+                min_value=0.0,
+                value=0.002,
+                step=0.001,
+                format="%.4f"
+            )
+        with col2:
+            routing_min_score = st.slider(
+                "Score moyen minimum:",
+                min_value=0.0,
+                max_value=5.0,
+                value=4.0,
+                step=0.05
+            )
+            routing_per_category = st.checkbox("Appliquer le score minimum à chaque type de question")
+        with col3:
+            use_latency = st.checkbox("Limiter le temps moyen de réponse")
+            routing_latency = st.number_input(
+                "Temps moyen maximum (sec):",
+                min_value=0.0,
+                value=30.0,
+                step=1.0,
+                disabled=not use_latency
+            )
+        
+        # Modèles et types de question retenus par la barre latérale
+        routing_options = routing.candidates(aggregates['model_category'], filters, routing_price)
+        
+        if routing_options.empty:
+            st.warning("Aucune donnée pour les filtres sélectionnés.")
+        else:
+            routing_weights = routing.category_weights(routing_options)
+            route = routing.solve(
+                routing_options, routing_objective, routing_min_score, routing_weights,
+                max_latency=routing_latency if use_latency else None,
+                per_category=routing_per_category
+            )
+            baselines = routing.single_model_baselines(routing_options, routing_objective, routing_weights)
+            
+            if not route['feasible']:
+                if route['uncovered']:
+                    st.warning(f"Aucun modèle ne respecte les contraintes pour : {', '.join(route['uncovered'])}")
+                else:
+                    st.warning("Aucune affectation n'atteint le score moyen minimum.")
+            elif baselines.empty:
+                st.dataframe(route['assignment'].round(3), use_container_width=True)
+            else:
+                # Référence : le modèle unique au meilleur score répond à tout
+                baseline_model = st.selectbox(
+                    "Modèle unique de référence:",
+                    options=list(baselines.index)
+                )
+                baseline = baselines.loc[baseline_model]
+                label = routing.OBJECTIVES[routing_objective]
+                
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    st.metric(f"{label} par requête (routage)", f"{route['objective']:.3f}")
+                with col2:
+                    saving = baseline[routing_objective] - route['objective']
+                    st.metric(
+                        f"Économie vs {baseline_model}",
+                        f"{saving:.3f}",
+                        delta=f"{-saving / baseline[routing_objective]:+.1%}" if baseline[routing_objective] else None,
+                        delta_color='inverse'
+                    )
+                with col3:
+                    st.metric("Score moyen (routage)", f"{route['score']:.2f}",
+                              delta=f"{route['score'] - baseline['score']:+.2f}")
+                
+                col1, col2 = st.columns(2)
+                with col1:
+                    st.dataframe(route['assignment'].round(3), use_container_width=True)
+                with col2:
+                    st.dataframe(baselines.round(3), use_container_width=True)
+    
+    # ===== SECTION 5: SUIVI EN DIRECT =====
+    meter.mark("Onglet 5 - Suivi en direct")
+    with tab5:
+        st.header("📡 Suivi en Direct des Requêtes")
+        live_section()
+    
+    # ===== SECTION 6: SCÉNARIOS RÉSEAU ÉLECTRIQUE =====
+    meter.mark("Onglet 6 - Réseau électrique")
+    with tab6:
+        st.header("🌍 CO₂ Recalculé selon le Réseau Électrique")
+        
+        intensity = load_intensity()
+        
+        if intensity is None:
+            st.warning(f"Table d'intensité carbone introuvable ou invalide : `{emissions.CARBON_INTENSITY_FILE}`.")
+        else:
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                default_regions = [r for r in ['FR', 'COAL'] if r in intensity.regions]
+                scenario_regions = st.multiselect(
+                    "Réseaux à comparer:",
+                    options=list(intensity.regions),
+                    default=default_regions,
+                    format_func=lambda r: intensity.labels[r]
+                )
+            with col2:
+                scenario_hour = st.selectbox(
+                    "Heure des requêtes:",
+                    options=[None] + list(range(emissions.HOURS)),
+                    format_func=lambda h: "Moyenne journalière" if h is None else f"{h}h"
+                )
+            
+            # CO₂ recalculé linéaire en l'électricité : les totaux par modèle suffisent
+            model_totals = backend.group_stats(filters, 'model')[['co2 total (g)', 'electricity total (wh)']]
+            model_totals.columns = ['co2 (g)', 'electricity (wh)']
+            model_totals = model_totals.reset_index()
+            scenarios = emissions.compare_scenarios(model_totals, intensity, scenario_regions, hour=scenario_hour)
+            
+            # Totaux par scénario
+            totals = scenarios.sum()
+            metric_cols = st.columns(len(totals))
+            for col, (name, total) in zip(metric_cols, totals.items()):
+                with col:
+                    delta = None if name == 'Mesuré' else f"{total - totals['Mesuré']:+.1f} g"
+                    st.metric(f"CO₂ - {name}", f"{total:.1f} g", delta=delta, delta_color='inverse')
+            
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                scenario_long = scenarios.reset_index().melt(id_vars='model', var_name='Scénario', value_name='CO₂ (g)')
+                fig_scenarios = px.bar(
+                    scenario_long,
+                    x='model',
+                    y='CO₂ (g)',
+                    color='Scénario',
+                    barmode='group',
+                    title="CO₂ Total par Modèle selon le Réseau",
+                    labels={'model': 'Modèle'}
+                )
+                fig_scenarios.update_layout(height=450)
+                figure_payload.plotly_chart(fig_scenarios, use_container_width=True)
+            
+            with col2:
+                if scenario_regions:
+                    profile = pd.DataFrame(
+                        intensity.values[intensity.codes(scenario_regions)].T,
+                        columns=[intensity.labels[r] for r in scenario_regions]
+                    )
+                    profile.index.name = 'Heure'
+                    fig_profile = px.line(
+                        profile,
+                        title="Profil Journalier de l'Intensité Carbone",
+                        labels={'value': 'gCO₂eq/kWh', 'variable': 'Réseau'},
+                        markers=True
+                    )
+                    fig_profile.update_layout(height=450)
+                    figure_payload.plotly_chart(fig_profile, use_container_width=True)
+            
+            # Cohérence des mesures : intensité implicite CO₂ mesuré / électricité mesurée
+            st.subheader("🔎 Intensité Carbone Implicite des Mesures")
+            implied = backend.implied_intensity(filters).round(0)
+            implied.columns = ['Mesures', 'Min (g/kWh)', 'Médiane (g/kWh)', 'Max (g/kWh)']
+            st.dataframe(implied, use_container_width=True)
+    
+    # ===== SECTION 7: PROJECTION À L'ÉCHELLE D'UNE FLOTTE =====
+    meter.mark("Onglet 7 - Projection flotte")
+    with tab7:
+        st.header("🔮 Projection de l'Empreinte Annuelle d'une Flotte")
+        
+        engine = load_projection(backend.catalog.version, backend)
+        
+        col1, col2, col3 = st.columns(3)
+        
+        with col1:
+            projected_model = st.selectbox(
+                "Modèle déployé:",
+                options=engine.models
+            )
+            requests_per_day = st.number_input(
+                "Requêtes par jour:",
+                min_value=1_000,
+                value=1_000_000,
+                step=100_000
+            )
+        with col2:
+            days = st.number_input("Jours projetés:", min_value=1, value=365)
+            price_per_1k_tokens = st.number_input(
+                "Prix (€) pour 1000 tokens:",
+                min_value=0.0,
+                value=0.002,
+                step=0.001,
+                format="%.4f",
+                help="Utilisé quand le coût mesuré est absent"
+            )
+        with col3:
+            n_simulations = st.select_slider(
+                "Nombre de simulations:",
+                options=[1_000, 2_000, 5_000, 10_000, 50_000],
+                value=2_000
+            )
+            seed = st.number_input("Graine aléatoire:", min_value=0, value=0)
+        
+        # Mix de questions : poids relatifs, par défaut celui du benchmark
+        st.subheader("Mix de questions")
+        default_mix = dict(engine.default_mix(projected_model))
+        mix_cols = st.columns(max(1, len(default_mix)))
+        mix = []
+        for col, (category, weight) in zip(mix_cols, default_mix.items()):
+            with col:
+                mix.append((category, float(st.number_input(
+                    category.strip(),
+                    min_value=0.0,
+                    value=weight,
+                    key=f"mix_{projected_model}_{category}"
+                ))))
+        
+        scenario = projection.Scenario(
+            projected_model, int(requests_per_day), tuple(mix), int(days),
+            float(price_per_1k_tokens), int(n_simulations), int(seed)
+        )
+        
+        try:
+            result = engine.project(scenario)
+        except ValueError as e:
+            st.warning(str(e))
+        else:
+            if result['missing']:
+                st.info(f"Catégories sans mesure pour ce modèle, ignorées : {', '.join(result['missing'])}")
+            
+            bands = result['bands']
+            metric_cols = st.columns(len(bands))
+            for col, (name, row) in zip(metric_cols, bands.iterrows()):
+                with col:
+                    st.metric(name, f"{row['p50']:,.1f}", help=f"p5 : {row['p5']:,.1f} — p95 : {row['p95']:,.1f}")
+            
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                fig_co2_projection = px.histogram(
+                    result['samples'],
+                    x='CO₂ (t/an)',
+                    nbins=50,
+                    title="Distribution Simulée du CO₂ Annuel"
+                )
+                for p in projection.PERCENTILES:
+                    fig_co2_projection.add_vline(x=bands.loc['CO₂ (t/an)', f"p{p}"], line_dash='dash',
+                                                 annotation_text=f"p{p}")
+                fig_co2_projection.update_layout(height=400)
+                figure_payload.plotly_chart(fig_co2_projection, use_container_width=True)
+            
+            with col2:
+                st.dataframe(bands.round(2), use_container_width=True)
+                st.caption(
+                    "Bandes issues du rééchantillonnage des mesures du benchmark : "
+                    "elles traduisent l'incertitude liée au nombre limité de questions par catégorie."
+                )
+    
+    # Section qualité des données (contrôles faits au chargement)
+    meter.mark("Qualité des données")
+    st.header("🧪 Qualité des Données")
+    
+    issues = aggregates['quality_issues']
+    quarantined = aggregates['quarantine']
+    quality_summary = data_quality.summary(issues)
+    
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        st.metric("Lignes en quarantaine", len(quarantined))
+    with col2:
+        errors = quality_summary[quality_summary['gravité'] == data_quality.ERROR]
+        st.metric("Erreurs", int(errors['lignes concernées'].sum()))
+    with col3:
+        warnings = quality_summary[quality_summary['gravité'] == data_quality.WARNING]
+        st.metric("Avertissements", int(warnings['lignes concernées'].sum()))
+    
+    st.dataframe(quality_summary, use_container_width=True, hide_index=True)
+    
+    if not quarantined.empty:
+        with st.expander(f"Lignes en quarantaine ({len(quarantined)}), exclues des analyses"):
+            st.dataframe(quarantined, use_container_width=True)
+    
+    if st.checkbox("Afficher le détail des anomalies par ligne"):
+        st.dataframe(issues[issues['ligne'] >= 0], use_container_width=True, hide_index=True)
     
     # Section données brutes (toujours visible)
+    meter.mark("Données brutes")
     st.header("📋 Données Brutes")
     
     if st.checkbox("Afficher les données filtrées"):
-        st.dataframe(filtered_df)
+        st.dataframe(backend.rows(filters, limit=query_backend.RAW_ROWS))
+        if selected_rows > query_backend.RAW_ROWS:
+            st.caption(f"{query_backend.RAW_ROWS:,} premières réponses sur {selected_rows:,}.")
         
-        # Téléchargement des données filtrées
-        csv = filtered_df.to_csv(index=False)
+        # Téléchargement des données filtrées (toutes les lignes, à la demande)
+        csv = backend.rows(filters).to_csv(index=False)
         st.download_button(
             label="📥 Télécharger les données filtrées",
             data=csv,
             file_name="green_ai_filtered_data.csv",
             mime="text/csv"
         )
+    
+    # Octets des graphiques envoyés au navigateur pendant cette réexécution (GREENAI_FIGURE_STATS=1)
+    payload = figure_payload.totals()
+    if payload is not None:
+        before, after, n_charts = payload
+        st.sidebar.caption(
+            f"Graphiques : {after / 1024:,.0f} ko envoyés pour {n_charts} graphiques "
+            f"({before / 1024:,.0f} ko sans compaction)"
+        )
+    
+    # Coût de cette réexécution pour le serveur, et cumul de la session et du serveur
+    self_footprint.render_sidebar(meter)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,332 @@
+import pandas as pd
+import numpy as np
+
+import data_quality
+import quantile_sketch
+
+# Fichier de données par défaut
+DATA_FILE = 'green Ai - Unpivoted (1).csv'
+
+# À incrémenter dès que le nettoyage ou les agrégats changent (invalide le cache disque)
+PROCESSING_VERSION = 8
+
+# Colonnes du format long (une ligne par réponse de modèle)
+COLUMNS = ['question_id', 'question_categorie', 'categorie_model', 'model', 'tokens',
+           'time (sec)', 'score', 'cost (€)', 'electricity (wh)', 'co2 (g)']
+
+NUMERIC_COLUMNS = ['tokens', 'time (sec)', 'score', 'electricity (wh)', 'co2 (g)']
+
+# Métriques normalisées par token, calculées une fois au chargement
+TOKEN_METRICS = ['electricity (mwh/token)', 'co2 (mg/token)', 'tokens/sec', 'time (ms/token)']
+
+# Dimensions filtrables depuis la barre latérale
+FILTER_COLUMNS = ['question_categorie', 'categorie_model', 'model']
+
+# Libellés des tableaux récapitulatifs (onglets 1 et 2)
+SUMMARY_LABELS = ['Score Moyen', 'Score Std', 'CO₂ Moyen', 'CO₂ Total',
+                  'Élec. Moyenne', 'Élec. Totale', 'Temps Moyen', 'Temps Std', 'Tokens Moyen',
+                  'mWh/Token Moyen', 'mgCO₂/Token Moyen', 'Tokens/s Moyen', 'ms/Token Moyen']
+
+# Métriques moyennes par modèle servies par l'index top-k
+TOPK_METRICS = ['score', 'efficacite_co2', 'efficacite_elec', 'time (sec)', 'co2 (g)'] + TOKEN_METRICS
+
+# Libellés du tableau détaillé par type de question (onglet 4)
+DETAIL_LABELS = ['Score Moyen', 'Nb Questions', 'CO₂ Moyen', 'Élec. Moyenne', 'Temps Moyen',
+                 'mWh/Token Moyen', 'mgCO₂/Token Moyen', 'Tokens/s Moyen', 'ms/Token Moyen']
+
+RANKING_LABELS = ['Score', 'CO₂ (g)', 'Électricité (Wh)', 'Temps (sec)', 'Efficacité CO₂', 'Tokens',
+                  'mWh/Token', 'mgCO₂/Token', 'Tokens/s', 'ms/Token', 'Score Global']
+
+
+def unpivot(df):
+    """Transforme le format comparaison (A/B) vers le format long"""
+    # Créer deux DataFrames séparés pour les modèles A et B
+    df_a = df[['question_id', 'question_categorie', 'categorie_model', 'model A', 'token A',
+               'time A (sec)', 'score A', 'cost A (€)', 'electricity A (wh)', 'co2 A (g)']].copy()
+    df_b = df[['question_id', 'question_categorie', 'categorie_model', 'model B', 'token B',
+               'time B (sec)', 'score B', 'cost B (€)', 'electricity B (wh)', 'co2 B (g)']].copy()
+
+    # Renommer les colonnes pour avoir un format uniforme
+    df_a.columns = COLUMNS
+    df_b.columns = COLUMNS
+
+    # Ajouter une colonne pour identifier le modèle (A ou B)
+    df_a['model_position'] = 'A'
+    df_b['model_position'] = 'B'
+
+    # Combiner les deux DataFrames
+    return pd.concat([df_a, df_b], ignore_index=True)
+
+
+def clean(df_combined):
+    """Nettoie les colonnes numériques et complète les tokens manquants"""
+    for col in NUMERIC_COLUMNS:
+        if col in df_combined.columns:
+            # Remplacer les virgules par des points et convertir en numérique. Toujours en float64 :
+            # un fichier sans valeur manquante ni décimale aurait sinon un schéma entier différent
+            df_combined[col] = df_combined[col].astype(str).str.replace(',', '.').replace('', np.nan)
+            df_combined[col] = pd.to_numeric(df_combined[col], errors='coerce').astype('float64')
+
+    # Supprimer les lignes avec des valeurs manquantes critiques
+    df_combined = df_combined.dropna(subset=['model', 'categorie_model'])
+
+    # Pour les tokens, remplacer les NaN par la médiane de chaque modèle
+    df_combined['tokens'] = df_combined.groupby('model')['tokens'].transform(lambda x: x.fillna(x.median()))
+
+    # Si encore des NaN dans tokens, utiliser la médiane globale
+    if df_combined['tokens'].isna().any():
+        df_combined['tokens'] = df_combined['tokens'].fillna(df_combined['tokens'].median())
+
+    # S'assurer qu'il n'y a pas de valeurs négatives ou nulles pour size
+    df_combined['tokens'] = df_combined['tokens'].clip(lower=1)
+
+    return add_token_metrics(df_combined)
+
+
+def add_token_metrics(df):
+    """Ajoute les métriques par token (énergie, CO2, débit, latence) en colonnes vectorisées"""
+    tokens = df['tokens']
+    # Temps nul ou manquant : débit et latence par token inconnus
+    time = df['time (sec)'].where(df['time (sec)'] > 0)
+    df['electricity (mwh/token)'] = df['electricity (wh)'] * 1000 / tokens
+    df['co2 (mg/token)'] = df['co2 (g)'] * 1000 / tokens
+    df['tokens/sec'] = tokens / time
+    df['time (ms/token)'] = time * 1000 / tokens
+    return df
+
+
+def process_file(path=DATA_FILE):
+    """Charge un fichier CSV au format comparaison et retourne le format long nettoyé"""
+    return process_checked(path)[0]
+
+
+def process_checked(path=DATA_FILE):
+    """Comme process_file, avec les tables de qualité {'quality_issues', 'quarantine'}
+
+    Les lignes en quarantaine (au moins une erreur) sont retirées des données nettoyées.
+    """
+    raw = unpivot(pd.read_csv(path))
+    df = clean(raw.copy())
+    issues = data_quality.validate(raw, df)
+    quarantined = data_quality.quarantine(df, issues)
+    return df.drop(quarantined.index), {'quality_issues': issues, 'quarantine': quarantined}
+
+
+def apply_filters(df, filters):
+    """Applique les filtres de la barre latérale ({colonne: valeurs, 'min_score': n})"""
+    mask = df['score'] >= filters.get('min_score', 0)
+    for col in FILTER_COLUMNS:
+        if col in filters:
+            mask &= df[col].isin(filters[col])
+    return df[mask]
+
+
+# ===== AGRÉGATS PARTAGÉS PAR LES ONGLETS =====
+
+def summary_table(df, key):
+    """Tableau récapitulatif (moyennes, écarts-types, totaux) groupé par `key`"""
+    summary = df.groupby(key).agg({
+        'score': ['mean', 'std'],
+        'co2 (g)': ['mean', 'sum'],
+        'electricity (wh)': ['mean', 'sum'],
+        'time (sec)': ['mean', 'std'],
+        'tokens': 'mean',
+        **{col: 'mean' for col in TOKEN_METRICS}
+    }).round(2)
+
+    # Aplatir les colonnes multi-niveau
+    summary.columns = SUMMARY_LABELS
+    return summary
+
+
+def category_metrics(df):
+    """Moyennes par catégorie de modèle utilisées par le radar chart"""
+    return df.groupby('categorie_model').agg({
+        'score': 'mean',
+        'co2 (g)': 'mean',
+        'electricity (wh)': 'mean',
+        'time (sec)': 'mean'
+    })
+
+
+def normalize_radar(cat_metrics):
+    """Normalise les métriques entre 0 et 1 (inversées pour CO2, électricité et temps car plus bas = mieux)"""
+    cat_metrics_norm = cat_metrics.copy()
+    cat_metrics_norm['score'] = cat_metrics_norm['score'] / cat_metrics_norm['score'].max()
+    cat_metrics_norm['co2_inv'] = 1 - (cat_metrics_norm['co2 (g)'] / cat_metrics_norm['co2 (g)'].max())
+    cat_metrics_norm['elec_inv'] = 1 - (cat_metrics_norm['electricity (wh)'] / cat_metrics_norm['electricity (wh)'].max())
+    cat_metrics_norm['time_inv'] = 1 - (cat_metrics_norm['time (sec)'] / cat_metrics_norm['time (sec)'].max())
+    return cat_metrics_norm
+
+
+def add_efficiency(df):
+    """Ajoute les colonnes d'efficacité (score par gramme de CO2 et par Wh)"""
+    df = df.copy()
+    df['efficacite_co2'] = df['score'] / (df['co2 (g)'] + 0.01)
+    df['efficacite_elec'] = df['score'] / (df['electricity (wh)'] + 0.01)
+    return df
+
+
+def model_ranking(df):
+    """Classement général des modèles (attend les colonnes d'efficacité)"""
+    ranking = df.groupby('model').agg({
+        'score': 'mean',
+        'co2 (g)': 'mean',
+        'electricity (wh)': 'mean',
+        'time (sec)': 'mean',
+        'efficacite_co2': 'mean',
+        'tokens': 'mean',
+        **{col: 'mean' for col in TOKEN_METRICS}
+    }).round(2)
+
+    # Score global
+    ranking['score_global'] = (
+        (ranking['score'] / ranking['score'].max()) * 0.4 +
+        (ranking['efficacite_co2'] / ranking['efficacite_co2'].max()) * 0.4 +
+        (1 - ranking['time (sec)'] / ranking['time (sec)'].max()) * 0.2
+    ).round(3)
+
+    ranking = ranking.sort_values('score_global', ascending=False)
+    ranking.columns = RANKING_LABELS
+    return ranking
+
+
+def question_comparison(df):
+    """Moyennes par type de question"""
+    return df.groupby('question_categorie').agg({
+        'score': 'mean',
+        'co2 (g)': 'mean',
+        'electricity (wh)': 'mean',
+        'time (sec)': 'mean',
+        'tokens': 'mean',
+        **{col: 'mean' for col in TOKEN_METRICS}
+    }).round(2)
+
+
+def question_detail(df):
+    """Détail par modèle pour un sous-ensemble de questions"""
+    detail = df.groupby(['model', 'categorie_model']).agg({
+        'score': ['mean', 'count'],
+        'co2 (g)': 'mean',
+        'electricity (wh)': 'mean',
+        'time (sec)': 'mean',
+        **{col: 'mean' for col in TOKEN_METRICS}
+    }).round(2)
+
+    detail.columns = DETAIL_LABELS
+    return detail
+
+
+def group_stats(df, by=None):
+    """Effectifs, moyennes et totaux des graphiques des onglets, par `by` (une ligne 'Total' sinon)"""
+    return df.groupby(df[by] if by else np.repeat('Total', len(df))).agg(**{
+        'réponses': ('model', 'size'),
+        'modèles': ('model', 'nunique'),
+        'questions': ('question_id', 'nunique'),
+        'score': ('score', 'mean'),
+        'co2 (g)': ('co2 (g)', 'mean'),
+        'electricity (wh)': ('electricity (wh)', 'mean'),
+        'time (sec)': ('time (sec)', 'mean'),
+        'co2 total (g)': ('co2 (g)', 'sum'),
+        'electricity total (wh)': ('electricity (wh)', 'sum'),
+    })
+
+
+def score_counts(df, by):
+    """Nombre de réponses par (`by`, score) : histogrammes des scores"""
+    return df.groupby([by, 'score']).size().rename('réponses').reset_index()
+
+
+def score_level_counts(df, by, levels):
+    """Nombre de réponses par groupes `by` et niveau de score (plancher, plafonné à `levels` - 1)"""
+    level = np.floor(df['score'].clip(upper=levels - 1)).rename('score_level')
+    counts = df.groupby(list(by) + [level]).size().rename('réponses').reset_index()
+    return counts.astype({'score_level': int})
+
+
+def _tukey_inside(df, by):
+    """Scores de `df` avec les quartiles de leur groupe, et masque des scores entre les clôtures de Tukey"""
+    scores = df[[by, 'score']].dropna()
+    grouped = scores.groupby(by)['score']
+    box = pd.DataFrame({
+        'q1': grouped.quantile(0.25),
+        'médiane': grouped.median(),
+        'q3': grouped.quantile(0.75),
+    })
+    iqr = box['q3'] - box['q1']
+    bounds = pd.DataFrame({'low': box['q1'] - 1.5 * iqr, 'high': box['q3'] + 1.5 * iqr}).reindex(scores[by])
+    inside = scores['score'].between(bounds['low'].to_numpy(), bounds['high'].to_numpy())
+    return box, scores, inside
+
+
+def score_box(df, by):
+    """Quartiles et moustaches des scores par `by` : boîtes à moustaches
+
+    Comme px.box, les moustaches s'arrêtent aux scores extrêmes situés à moins de 1,5 écart
+    interquartile des quartiles ; les scores au-delà sont les points aberrants (`score_outliers`).
+    """
+    box, scores, inside = _tukey_inside(df, by)
+    kept = scores[inside].groupby(by)['score']
+    box.insert(0, 'moustache basse', kept.min())
+    box['moustache haute'] = kept.max()
+    return box
+
+
+def score_outliers(df, by):
+    """Scores hors des moustaches de `score_box`, comptés par (`by`, score)"""
+    _, scores, inside = _tukey_inside(df, by)
+    return scores[~inside].groupby([by, 'score']).size().rename('réponses').reset_index()
+
+
+def metric_cube(df):
+    """Sommes et effectifs des métriques top-k par (type de question, catégorie, modèle, score)
+
+    Le cube est bien plus petit que les données et suffit à recalculer les moyennes par
+    modèle sous n'importe quelle combinaison de filtres.
+    """
+    df = add_efficiency(df).assign(score_bucket=df['score'])
+    grouped = df.groupby(['question_categorie', 'categorie_model', 'model', 'score_bucket'])[TOPK_METRICS]
+    sums = grouped.sum()
+    counts = grouped.count().add_suffix(' n')
+    return sums.join(counts).reset_index()
+
+
+def numeric_cost(df):
+    """Coût (€) en numérique (colonne non nettoyée, le plus souvent vide)"""
+    return pd.to_numeric(df['cost (€)'].astype(str).str.replace(',', '.'), errors='coerce')
+
+
+def model_category_table(df):
+    """Moyennes par (type de question, modèle) : table de base de l'optimisation du routage"""
+    table = df.assign(**{'cost (€)': numeric_cost(df)}).groupby(
+        ['question_categorie', 'categorie_model', 'model']).agg(**{
+            'score': ('score', 'mean'),
+            'co2 (g)': ('co2 (g)', 'mean'),
+            'electricity (wh)': ('electricity (wh)', 'mean'),
+            'time (sec)': ('time (sec)', 'mean'),
+            'cost (€)': ('cost (€)', 'mean'),
+            'tokens': ('tokens', 'mean'),
+            'n': ('score', 'count'),
+        })
+    return table.reset_index()
+
+
+def compute_aggregates(df, sketch=True):
+    """Agrégats de la vue par défaut (sans filtre), stockés avec les données traitées
+
+    `sketch=False` omet les sketches de quantiles, quand l'appelant les fusionne lui-même
+    depuis ceux de chaque fichier (`quantile_sketch.merge`).
+    """
+    # La vue par défaut applique le score minimum à 0 (exclut les scores manquants)
+    df = apply_filters(df, {'min_score': 0})
+    aggregates = {
+        'category_comparison': summary_table(df, 'categorie_model'),
+        'category_metrics': category_metrics(df),
+        'model_ranking': model_ranking(add_efficiency(df)),
+        'question_comparison': question_comparison(df),
+        'metric_cube': metric_cube(df),
+        'model_category': model_category_table(df),
+    }
+    if sketch:
+        aggregates['quantile_sketch'] = quantile_sketch.sketch_table(df)
+    return aggregates
@@ -0,0 +1,138 @@
+import numpy as np
+import pandas as pd
+
+# Bornes admises (None : pas de borne)
+RANGES = {
+    'score': (0, 5),
+    'tokens': (0, None),
+    'time (sec)': (0, None),
+    'electricity (wh)': (0, None),
+    'co2 (g)': (0, None),
+}
+
+# Écart toléré (facteur) entre l'intensité implicite CO₂/électricité d'une ligne et la médiane
+RATIO_TOLERANCE = 3.0
+
+# Gravités : seules les erreurs envoient la ligne en quarantaine
+ERROR = 'erreur'
+WARNING = 'avertissement'
+INFO = 'info'
+
+# Tables produites avec les données nettoyées (stockées avec les agrégats)
+QUALITY_TABLES = ['quality_issues', 'quarantine']
+
+ISSUE_COLUMNS = ['ligne', 'question_id', 'model', 'contrôle', 'colonne', 'valeur', 'gravité', 'lignes']
+
+
+def _row_issues(df, mask, check, column, values, severity, unit=''):
+    if not mask.any():
+        return None
+    rows = df.loc[mask, ['question_id', 'model']].copy()
+    rows.insert(0, 'ligne', rows.index.to_numpy())
+    rows['contrôle'] = check
+    rows['colonne'] = column
+    rows['valeur'] = pd.Series(values, index=df.index)[mask].astype(str) + unit
+    rows['gravité'] = severity
+    rows['lignes'] = 1
+    return rows
+
+
+def _column_issue(check, column, severity, count):
+    return pd.DataFrame([{'ligne': -1, 'question_id': None, 'model': None, 'contrôle': check,
+                          'colonne': column, 'valeur': None, 'gravité': severity, 'lignes': count}])
+
+
+def validate(raw, df):
+    """Contrôles vectorisés : `raw` avant nettoyage, `df` après (mêmes index de lignes)
+
+    Retourne une table d'anomalies : une ligne par anomalie de ligne (`lignes` = 1) ou par
+    constat sur une colonne entière (`ligne` = -1, `lignes` = nombre de lignes concernées).
+    """
+    raw = raw.loc[df.index]
+    issues = []
+
+    # Colonnes numériques : valeurs vides, illisibles et formats décimaux mélangés
+    for col in list(RANGES) + ['cost (€)']:
+        values = raw[col]
+        present = values.notna()
+        if not present.any():
+            issues.append(_column_issue('colonne vide', col, WARNING, len(raw)))
+            continue
+
+        if pd.api.types.is_numeric_dtype(values):
+            parsed = values
+        else:
+            text = (values if pd.api.types.is_string_dtype(values) else values.astype(str)).str.strip()
+            present &= text.ne('') & text.notna()
+            # Valeurs déjà converties par le nettoyage (sauf tokens complétés et coût non nettoyé)
+            if col in ('tokens', 'cost (€)'):
+                parsed = pd.to_numeric(text.str.replace(',', '.', regex=False), errors='coerce')
+            else:
+                parsed = df[col]
+            issues.append(_row_issues(df, present & parsed.isna(), 'valeur illisible', col, values, ERROR))
+
+            comma = text.str.contains(',', regex=False, na=False)
+            if comma.any() and (present & ~comma).any():
+                issues.append(_column_issue('format décimal mixte', col, INFO, int(comma.sum())))
+
+        if col == 'tokens':
+            # Tokens manquants complétés par la médiane du modèle au nettoyage
+            missing = int((~present).sum())
+            if missing:
+                issues.append(_column_issue('tokens complétés (médiane)', col, WARNING, missing))
+        elif col != 'cost (€)':
+            issues.append(_row_issues(df, ~present, 'valeur manquante', col, values, WARNING))
+
+        if col in RANGES:
+            low, high = RANGES[col]
+            out = pd.Series(False, index=df.index)
+            if low is not None:
+                out |= parsed < low
+            if high is not None:
+                out |= parsed > high
+            issues.append(_row_issues(df, out, 'hors plage', col, parsed, ERROR))
+
+    # Temps nul : débit et latence par token inconnus
+    issues.append(_row_issues(df, df['time (sec)'] == 0, 'temps nul', 'time (sec)', df['time (sec)'], WARNING))
+
+    # Cohérence des unités : intensité implicite très éloignée de la médiane
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ratio = df['co2 (g)'] / (df['electricity (wh)'] / 1000)
+    valid = np.isfinite(ratio) & (ratio > 0)
+    if valid.any():
+        median = ratio[valid].median()
+        outlier = valid & ((ratio > median * RATIO_TOLERANCE) | (ratio < median / RATIO_TOLERANCE))
+        issues.append(_row_issues(df, outlier, 'ratio CO₂/électricité', 'co2 (g)',
+                                  ratio.round(0), WARNING, unit=' g/kWh'))
+
+    # Doublons (question, modèle) : la première occurrence est conservée
+    duplicated = df.duplicated(['question_id', 'model'], keep='first')
+    issues.append(_row_issues(df, duplicated, 'doublon', 'question_id', df['question_id'], ERROR))
+
+    issues = [table for table in issues if table is not None]
+    if not issues:
+        return pd.DataFrame(columns=ISSUE_COLUMNS)
+    issues = pd.concat(issues, ignore_index=True)[ISSUE_COLUMNS]
+    issues['question_id'] = issues['question_id'].astype(object)
+    issues['valeur'] = issues['valeur'].astype(object)
+    return issues
+
+
+def quarantine(df, issues):
+    """Lignes écartées des analyses (au moins une erreur), avec leurs motifs"""
+    errors = issues[(issues['gravité'] == ERROR) & (issues['ligne'] >= 0)]
+    errors = errors.drop_duplicates(['ligne', 'contrôle'])
+    # Motifs d'une ligne codés en masque de bits, puis traduits une fois par combinaison
+    checks = sorted(errors['contrôle'].unique())
+    bits = pd.Series(np.left_shift(1, pd.Categorical(errors['contrôle'], categories=checks).codes),
+                     index=errors['ligne'].to_numpy())
+    masks = bits.groupby(level=0).sum()
+    labels = {m: ', '.join(c for i, c in enumerate(checks) if m >> i & 1) for m in masks.unique()}
+    quarantined = df.loc[masks.index].copy()
+    quarantined['motif'] = masks.map(labels).to_numpy()
+    return quarantined
+
+
+def summary(issues):
+    """Nombre de lignes concernées par contrôle, colonne et gravité"""
+    return issues.groupby(['gravité', 'contrôle', 'colonne'])['lignes'].sum().rename('lignes concernées').reset_index()
@@ -0,0 +1,219 @@
+import glob
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from urllib.parse import quote
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+import data_pipeline
+import data_quality
+import parallel_ingest
+import quantile_sketch
+import result_cache
+
+# Fichier JSON listant les sources : {"sources": ["campagnes/*.csv", ...]}
+# Sans ce fichier, le CSV fourni avec l'application est l'unique source du catalogue.
+CATALOG_FILE = os.environ.get('GREENAI_CATALOG', 'catalog.json')
+
+# Colonnes de partitionnement des données traitées
+PARTITION_COLUMNS = ['categorie_model', 'question_categorie']
+
+
+def list_sources(catalog_file=None):
+    """Chemins absolus des fichiers sources enregistrés dans le catalogue"""
+    catalog_file = catalog_file or CATALOG_FILE
+    if not os.path.isfile(catalog_file):
+        return [os.path.abspath(data_pipeline.DATA_FILE)]
+
+    with open(catalog_file, encoding='utf-8') as f:
+        config = json.load(f)
+
+    # Les motifs sont relatifs au répertoire du fichier catalogue
+    base = os.path.dirname(os.path.abspath(catalog_file))
+    sources = []
+    for pattern in config.get('sources', []):
+        for path in sorted(glob.glob(os.path.join(base, pattern))):
+            path = os.path.abspath(path)
+            if path not in sources:
+                sources.append(path)
+
+    if not sources:
+        raise ValueError(f"Aucun fichier source trouvé dans le catalogue {catalog_file}")
+    return sources
+
+
+def _partition_dir(categorie_model, question_categorie):
+    return os.path.join(f"categorie_model={quote(str(categorie_model), safe='')}",
+                        f"question_categorie={quote(str(question_categorie), safe='')}")
+
+
+class Catalog:
+    """Données traitées partitionnées par catégorie de modèle et catégorie de question"""
+
+    def __init__(self, root, key, index, aggregates):
+        self.root = root
+        self.key = key
+        self.sources = index['sources']
+        self.partitions = index['partitions']
+        self.aggregates = aggregates
+        self._frames = {}
+
+    @property
+    def version(self):
+        """Identifiant court de la version des données (dérivé du contenu des sources)"""
+        return self.key[len('catalog-'):][:12]
+
+    @property
+    def num_rows(self):
+        return sum(p['rows'] for p in self.partitions)
+
+    def distinct(self, column):
+        """Valeurs possibles d'une dimension, lues dans l'index (sans lire les données)"""
+        if column in PARTITION_COLUMNS:
+            values = [p[column] for p in self.partitions]
+        elif column == 'model':
+            values = [model for p in self.partitions for model in p['models']]
+        else:
+            raise KeyError(f"Dimension non indexée : {column}")
+        return pd.unique(pd.Series(values, dtype=object)).astype(object)
+
+    def prune(self, filters):
+        """Partitions compatibles avec les filtres ; les autres ne sont jamais lues"""
+        selected = []
+        for p in self.partitions:
+            if any(col in filters and p[col] not in filters[col] for col in PARTITION_COLUMNS):
+                continue
+            if 'model' in filters and not set(p['models']) & set(filters['model']):
+                continue
+            selected.append(p)
+        return selected
+
+    def files(self, filters):
+        return [os.path.join(self.root, f) for p in self.prune(filters) for f in p['files']]
+
+    def all_files(self):
+        return [os.path.join(self.root, f) for p in self.partitions for f in p['files']]
+
+    def _read_file(self, path):
+        # Chaque fichier de partition n'est lu qu'une fois par processus
+        frame = self._frames.get(path)
+        if frame is None:
+            frame = self._frames[path] = pd.read_parquet(path)
+        return frame
+
+    def read(self, filters):
+        """Lignes des partitions retenues (les filtres fins restent à appliquer)"""
+        frames = [self._read_file(path) for path in self.files(filters)]
+        if not frames:
+            # Schéma vide, lu dans les métadonnées d'un fichier quelconque
+            return pq.read_schema(self.all_files()[0]).empty_table().to_pandas()
+        if len(frames) == 1:
+            return frames[0]
+        return pd.concat(frames, ignore_index=True)
+
+
+def _write_catalog(root, identity, key, sources):
+    """Traite chaque source (cache par fichier) et écrit les partitions de façon atomique"""
+    cache_dir = os.path.dirname(root)
+    os.makedirs(cache_dir, exist_ok=True)
+    # Fichiers absents du cache : traités en parallèle avant la boucle (qui les relit du cache)
+    parallel_ingest.warm_cache(sources, cache_dir)
+
+    tmp_dir = tempfile.mkdtemp(prefix='.tmp-', dir=cache_dir)
+    try:
+        frames = []
+        sketches = []
+        quality = {name: [] for name in data_quality.QUALITY_TABLES}
+        partitions = {}
+        files = {}
+        for i, source in enumerate(sources):
+            df, source_aggregates = result_cache.load_or_build(source, cache_dir=cache_dir)
+            frames.append(df)
+            sketches.append(source_aggregates['quantile_sketch'])
+            for name, tables in quality.items():
+                tables.append(source_aggregates[name].assign(source=os.path.basename(source)))
+            for (cm, qc), part in df.groupby(PARTITION_COLUMNS, sort=True):
+                rel = os.path.join(_partition_dir(cm, qc), f"part-{i:05d}.parquet")
+                os.makedirs(os.path.join(tmp_dir, os.path.dirname(rel)), exist_ok=True)
+                part.to_parquet(os.path.join(tmp_dir, rel), index=False)
+                files[rel] = result_cache.file_sha256(os.path.join(tmp_dir, rel))
+
+                p = partitions.setdefault((cm, qc), {
+                    'categorie_model': str(cm),
+                    'question_categorie': str(qc),
+                    'files': [],
+                    'rows': 0,
+                    'models': [],
+                })
+                p['files'].append(rel)
+                p['rows'] += len(part)
+                p['models'] = sorted(set(p['models']) | {str(m) for m in part['model'].unique()})
+
+        aggregates = data_pipeline.compute_aggregates(pd.concat(frames, ignore_index=True), sketch=False)
+        # Sketches : ceux de chaque fichier (déjà en cache), fusionnés par somme des effectifs
+        aggregates['quantile_sketch'] = quantile_sketch.merge(sketches)
+        # Qualité : constats de chaque fichier, avec leur origine
+        aggregates.update({name: pd.concat(tables, ignore_index=True) for name, tables in quality.items()})
+        for name, table in aggregates.items():
+            filename = f"agg_{name}.parquet"
+            table.to_parquet(os.path.join(tmp_dir, filename))
+            files[filename] = result_cache.file_sha256(os.path.join(tmp_dir, filename))
+
+        index = {'sources': sources, 'partitions': [partitions[k] for k in sorted(partitions)]}
+        with open(os.path.join(tmp_dir, 'index.json'), 'w', encoding='utf-8') as f:
+            json.dump(index, f, indent=2, ensure_ascii=False)
+        files['index.json'] = result_cache.file_sha256(os.path.join(tmp_dir, 'index.json'))
+
+        manifest = {
+            'version': data_pipeline.PROCESSING_VERSION,
+            'source': identity,
+            'key': key,
+            'files': files,
+        }
+        with open(os.path.join(tmp_dir, result_cache.MANIFEST), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2, ensure_ascii=False)
+
+        shutil.rmtree(root, ignore_errors=True)
+        os.replace(tmp_dir, root)
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+
+def open_catalog(catalog_file=None, cache_dir=None, keep=()):
+    """Ouvre le catalogue, en (re)construisant les partitions si une source a changé
+
+    Les versions listées dans `keep` ne sont pas évincées (encore servies aux sessions).
+    """
+    catalog_file = catalog_file or CATALOG_FILE
+    cache_dir = cache_dir or result_cache.CACHE_DIR
+    sources = list_sources(catalog_file)
+
+    # Clé : contenu de chaque source + version du traitement
+    h = hashlib.sha256()
+    for source in sources:
+        h.update(source.encode())
+        h.update(result_cache.source_key(source).encode())
+    key = 'catalog-' + h.hexdigest()[:32]
+    identity = 'catalog:' + os.path.abspath(catalog_file)
+    root = os.path.join(cache_dir, key)
+
+    result_cache.evict(identity, keep_key=key, cache_dir=cache_dir, keep=keep)
+
+    manifest = result_cache.read_manifest(root)
+    if not result_cache.is_valid(root, manifest):
+        try:
+            _write_catalog(root, identity, key, sources)
+        except OSError:
+            # Cache en lecture seule : partitions dans un répertoire temporaire
+            root = os.path.join(tempfile.mkdtemp(prefix='greenai-'), key)
+            _write_catalog(root, identity, key, sources)
+        manifest = result_cache.read_manifest(root)
+
+    with open(os.path.join(root, 'index.json'), encoding='utf-8') as f:
+        index = json.load(f)
+    return Catalog(root, key, index, result_cache.read_aggregates(root, manifest))
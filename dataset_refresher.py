@@ -0,0 +1,128 @@
+import os
+import threading
+import time
+from datetime import datetime
+
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+
+import dataset_catalog
+import query_backend
+
+# Délai de regroupement des événements (un fichier copié déclenche plusieurs écritures)
+DEBOUNCE_SECONDS = float(os.environ.get('GREENAI_REFRESH_DEBOUNCE', 2.0))
+
+
+class _SourceEventHandler(FileSystemEventHandler):
+    """Relaie à l'actualiseur les événements touchant les sources ou le catalogue"""
+
+    def __init__(self, refresher):
+        self.refresher = refresher
+
+    def on_any_event(self, event):
+        if event.is_directory:
+            return
+        for path in (event.src_path, getattr(event, 'dest_path', '')):
+            if path and self.refresher.is_watched(path):
+                self.refresher.request_refresh()
+                return
+
+
+class DatasetRefresher:
+    """Sert la version courante du jeu de données et la reconstruit en arrière-plan"""
+
+    def __init__(self, catalog_file=None, mode=None):
+        self.catalog_file = os.path.abspath(catalog_file or dataset_catalog.CATALOG_FILE)
+        self.mode = mode
+        self.refreshing = False
+        self.last_error = None
+        self._wakeup = threading.Event()
+        self._observer = None
+        self._worker = None
+        self._dirs = set()
+        # (moteur de requêtes, date de chargement), remplacé d'un bloc lors d'une mise à jour
+        self._current = None
+        self._current = self._build()
+
+    def _build(self):
+        # La version servie n'est pas évincée du cache tant qu'elle n'est pas remplacée
+        keep = (self.backend.catalog.key,) if self._current is not None else ()
+        return query_backend.open_backend(self.catalog_file, self.mode, keep=keep), datetime.now()
+
+    @property
+    def current(self):
+        """(moteur de requêtes, date de chargement) de la version servie"""
+        return self._current
+
+    @property
+    def backend(self):
+        return self._current[0]
+
+    @property
+    def loaded_at(self):
+        return self._current[1]
+
+    @property
+    def version(self):
+        return self.backend.catalog.version
+
+    def is_watched(self, path):
+        path = os.path.abspath(path)
+        if path == self.catalog_file:
+            return True
+        return path.endswith('.csv') and os.path.dirname(path) in self._dirs
+
+    def _watch_sources(self):
+        """Surveille les répertoires des sources (y compris ceux ajoutés par une mise à jour)"""
+        dirs = {os.path.dirname(source) for source in self.backend.catalog.sources}
+        dirs.add(os.path.dirname(self.catalog_file))
+        for directory in sorted(dirs - self._dirs):
+            if os.path.isdir(directory):
+                self._observer.schedule(_SourceEventHandler(self), directory, recursive=False)
+                self._dirs.add(directory)
+
+    def start(self):
+        """Démarre la surveillance des fichiers et le thread de reconstruction"""
+        self._worker = threading.Thread(target=self._run, name='greenai-refresh', daemon=True)
+        self._worker.start()
+        self._observer = Observer()
+        self._observer.daemon = True
+        self._watch_sources()
+        self._observer.start()
+        return self
+
+    def stop(self):
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+
+    def request_refresh(self):
+        self._wakeup.set()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            # Regroupe les rafales d'événements avant de reconstruire
+            time.sleep(DEBOUNCE_SECONDS)
+            self._wakeup.clear()
+            self.refresh()
+
+    def refresh(self):
+        """Reconstruit le jeu de données puis bascule d'un bloc vers la nouvelle version"""
+        self.refreshing = True
+        try:
+            current = self._build()
+        except Exception as e:
+            # Source en cours d'écriture ou invalide : on continue de servir la version précédente
+            self.last_error = e
+            return False
+        finally:
+            self.refreshing = False
+
+        self.last_error = None
+        if current[0].catalog.key == self.backend.catalog.key:
+            return False
+        self._current = current
+        if self._observer is not None:
+            self._watch_sources()
+        return True
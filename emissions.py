@@ -0,0 +1,94 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# Table d'intensité carbone : region, label, hour (0-23), intensity_g_kwh
+CARBON_INTENSITY_FILE = os.environ.get('GREENAI_CARBON_INTENSITY', 'carbon_intensity.csv')
+
+HOURS = 24
+
+
+class IntensityTable:
+    """Intensité carbone (gCO2eq/kWh) par région et par heure, stockée en matrice [région, heure]"""
+
+    def __init__(self, table):
+        pivot = table.pivot_table(index='region', columns='hour', values='intensity_g_kwh', aggfunc='mean')
+        pivot = pivot.reindex(columns=range(HOURS))
+        # Heures manquantes : moyenne de la région
+        pivot = pivot.apply(lambda row: row.fillna(row.mean()), axis=1)
+
+        self.regions = pivot.index.to_numpy(dtype=object)
+        labels = dict(zip(table['region'], table['label'])) if 'label' in table.columns else {}
+        self.labels = {region: labels.get(region, region) for region in self.regions}
+        self.values = pivot.to_numpy(dtype=float)
+        self.daily_mean = self.values.mean(axis=1)
+
+    def codes(self, regions):
+        """Codes entiers des régions (-1 si inconnue)"""
+        return pd.Categorical(regions, categories=self.regions).codes.astype(np.int64)
+
+    def lookup(self, regions, hours=None):
+        """Intensité pour chaque (région, heure) ; moyenne journalière si `hours` est None"""
+        codes = self.codes(regions)
+        known = codes >= 0
+        out = np.full(len(codes), np.nan)
+        if hours is None:
+            out[known] = self.daily_mean[codes[known]]
+        else:
+            hours = np.asarray(hours, dtype=np.int64) % HOURS
+            out[known] = self.values.ravel()[codes[known] * HOURS + hours[known]]
+        return out
+
+
+def load_intensity(path=None):
+    """Charge la table d'intensité carbone (fichier local, lignes '#' ignorées)"""
+    return IntensityTable(pd.read_csv(path or CARBON_INTENSITY_FILE, comment='#'))
+
+
+def derive_co2(df, table, region=None, hour=None, region_col='region', timestamp_col='timestamp'):
+    """CO₂ (g) recalculé depuis l'électricité (Wh), en un seul calcul vectorisé
+
+    La région et l'heure viennent des colonnes `region_col` et `timestamp_col` si elles
+    existent, sinon de `region` (scénario) et `hour` (None : moyenne journalière).
+    """
+    n = len(df)
+    if region_col in df.columns:
+        regions = df[region_col].to_numpy()
+        if region is not None:
+            regions = np.where(pd.isna(regions), region, regions)
+    else:
+        regions = np.full(n, region, dtype=object)
+
+    if timestamp_col in df.columns:
+        hours = pd.to_datetime(df[timestamp_col], errors='coerce').dt.hour
+        if hour is not None:
+            hours = hours.fillna(hour)
+        intensity = table.lookup(regions, hours.fillna(0).to_numpy())
+        if hour is None:
+            # Horodatage manquant : moyenne journalière
+            missing = hours.isna().to_numpy()
+            intensity[missing] = table.lookup(regions[missing])
+    elif hour is not None:
+        intensity = table.lookup(regions, np.full(n, hour))
+    else:
+        intensity = table.lookup(regions)
+
+    return pd.Series(df['electricity (wh)'].to_numpy(dtype=float) / 1000 * intensity,
+                     index=df.index, name='co2 (g)')
+
+
+def implied_intensity(df):
+    """Intensité carbone implicite des mesures (gCO2eq/kWh) : CO₂ mesuré / électricité mesurée"""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return df['co2 (g)'] / (df['electricity (wh)'] / 1000)
+
+
+def compare_scenarios(df, table, regions, key='model', hour=None):
+    """CO₂ total par `key` pour chaque scénario de réseau, à côté du CO₂ mesuré"""
+    columns = {'Mesuré': df['co2 (g)']}
+    for region in regions:
+        columns[table.labels.get(region, region)] = derive_co2(df, table, region=region, hour=hour)
+    scenarios = pd.DataFrame(columns)
+    scenarios[key] = df[key].to_numpy()
+    return scenarios.groupby(key).sum(min_count=1)
@@ -0,0 +1,110 @@
+import numpy as np
+import pandas as pd
+
+import data_pipeline
+
+# Facettes de la barre latérale, dans l'ordre de la cascade
+FACETS = data_pipeline.FILTER_COLUMNS
+
+# Seuils du curseur de score minimum (entiers de 0 à 5)
+SCORE_LEVELS = 6
+
+_LETTERS = 'abcdefgh'
+
+
+class FacetIndex:
+    """Cube de comptes des réponses par (facettes x score), construit une fois par version
+
+    Le cube est cumulé sur l'axe du score : cube[..., s] compte les lignes de score >= s,
+    le filtre de score minimum est donc une simple tranche. Les comptes d'une facette sachant
+    les sélections des autres s'obtiennent en masquant les autres axes et en sommant
+    (un np.einsum sur quelques centaines de cases), sans relire les données. Le cube est
+    rempli par une requête GROUP BY (facettes, score plancher) : les lignes ne sont pas lues ici.
+    """
+
+    def __init__(self, backend):
+        # Score entier plancher : score >= s (s entier) équivaut à plancher >= s
+        table = backend.score_level_counts({}, FACETS, SCORE_LEVELS)
+        self.options = {}
+        self._positions = {}
+        codes = []
+        for col in FACETS:
+            c, labels = pd.factorize(table[col], sort=True)
+            self.options[col] = labels.tolist()
+            self._positions[col] = {value: i for i, value in enumerate(self.options[col])}
+            codes.append(c)
+
+        level = table['score_level'].to_numpy(dtype=int)
+        valid = level >= 0
+        for c in codes:
+            valid &= c >= 0
+
+        shape = tuple(len(self.options[col]) for col in FACETS) + (SCORE_LEVELS,)
+        flat = np.ravel_multi_index([c[valid] for c in codes] + [level[valid]], shape)
+        weights = table['réponses'].to_numpy(dtype=float)[valid]
+        counts = np.bincount(flat, weights=weights, minlength=int(np.prod(shape))).astype(np.int64).reshape(shape)
+        self.cube = counts[..., ::-1].cumsum(axis=-1)[..., ::-1]
+        self.total = int(self.cube[..., 0].sum())
+
+        # Réductions d'einsum de chaque facette (ex. 'abc,b,c->a')
+        axes = _LETTERS[:len(FACETS)]
+        self._reductions = [
+            f"{axes}," + ','.join(a for a in axes if a != axis) + f"->{axis}" for axis in axes
+        ]
+        self._all = {col: np.ones(len(self.options[col])) for col in FACETS}
+
+    def _mask(self, col, selected):
+        if selected is None:
+            return self._all[col]
+        mask = np.zeros(len(self.options[col]))
+        positions = self._positions[col]
+        mask[[positions[v] for v in selected if v in positions]] = 1
+        return mask
+
+    def _slice(self, min_score):
+        level = int(min_score)
+        if level >= SCORE_LEVELS:
+            return np.zeros(self.cube.shape[:-1], dtype=self.cube.dtype)
+        return self.cube[..., max(level, 0)]
+
+    def _facet_counts(self, cube, masks, i):
+        others = [masks[j] for j in range(len(FACETS)) if j != i]
+        return np.einsum(self._reductions[i], cube, *others)
+
+    def counts(self, selections, min_score=0):
+        """Lignes par option de chaque facette, sachant les sélections des autres facettes
+
+        `selections` : {facette: valeurs retenues}, une facette absente n'est pas filtrée.
+        Retourne ({facette: {option: lignes}}, lignes retenues par toutes les sélections).
+        """
+        cube = self._slice(min_score)
+        masks = [self._mask(col, selections.get(col)) for col in FACETS]
+        result = {}
+        for i, col in enumerate(FACETS):
+            result[col] = dict(zip(self.options[col], self._facet_counts(cube, masks, i).astype(int).tolist()))
+        first = FACETS[0]
+        selected = sum(result[first][v] for v in self.options[first] if masks[0][self._positions[first][v]])
+        return result, selected
+
+    def cascade(self, selections, previous=None):
+        """Options restantes de chaque facette selon les facettes précédentes, et sélections ajustées
+
+        Les valeurs devenues impossibles sont retirées de la sélection ; les options qui
+        apparaissent (absentes de `previous`) sont sélectionnées, comme la sélection par défaut.
+        Le score minimum ne retire aucune option : il n'agit que sur les comptes.
+        """
+        cube = self.cube[..., 0]
+        masks = [self._all[col] for col in FACETS]
+        options, adjusted = {}, {}
+        for i, col in enumerate(FACETS):
+            counts = self._facet_counts(cube, masks, i)
+            options[col] = [v for v, n in zip(self.options[col], counts) if n > 0]
+            selected = selections.get(col)
+            if selected is None:
+                adjusted[col] = list(options[col])
+            else:
+                before = set(previous[col]) if previous and col in previous else set(options[col])
+                keep = set(selected)
+                adjusted[col] = [v for v in options[col] if v in keep or v not in before]
+            masks[i] = self._mask(col, adjusted[col])
+        return options, adjusted
@@ -0,0 +1,197 @@
+import os
+import re
+
+import numpy as np
+import plotly.io as pio
+import streamlit as st
+
+# Compaction des graphiques avant envoi au navigateur (0 : figures envoyées telles quelles)
+COMPACT = os.environ.get('GREENAI_FIGURE_COMPACT', '1') != '0'
+
+# Chiffres significatifs conservés (précision d'affichage des survols)
+DIGITS = int(os.environ.get('GREENAI_FIGURE_DIGITS', 4))
+
+# Mesure des octets envoyés par réexécution (sérialise chaque figure deux fois de plus)
+MEASURE = os.environ.get('GREENAI_FIGURE_STATS', '0') == '1'
+
+# En dessous de cette taille, un tableau n'est pas retouché
+MIN_LENGTH = 16
+
+STATS_KEY = 'figure_payload'
+
+CUSTOMDATA_REF = re.compile(r'customdata\[(\d+)\]')
+BARE_REF = re.compile(r'%\{customdata\[(\d+)\]\}')
+
+INT_DTYPES = [np.int8, np.int16, np.int32]
+
+# Coordonnées affichées au survol avec le format de l'axe : float32 suffit
+AXIS_PROPS = {'x', 'y'}
+
+
+def round_significant(values, digits=DIGITS):
+    """Arrondit chaque valeur à `digits` chiffres significatifs (NaN conservés)"""
+    values = np.asarray(values, dtype=float)
+    magnitude = np.abs(values)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        exponent = np.where(magnitude > 0, np.floor(np.log10(magnitude)), 0)
+    # Facteur entier : 10 ** -k plutôt que 1 / 10 ** k, pour que 4.38 reste 4.38
+    decimals = np.clip(digits - 1 - exponent, -300, 300)
+    scale = 10.0 ** np.abs(decimals)
+    rounded = np.where(decimals >= 0, np.round(values * scale) / scale, np.round(values / scale) * scale)
+    return np.where(np.isfinite(values), rounded, values)
+
+
+def compact_array(values, digits=DIGITS, axis=False):
+    """Tableau numérique arrondi, dans l'encodage le plus court
+
+    Entiers : tableau typé binaire (int8/16/32, encodé en base64 par plotly).
+    Réels sur un axe : float32 binaire (moitié du float64, le survol suit le format de l'axe).
+    Autres réels (taille, couleur, customdata, affichés tels quels au survol) : liste JSON
+    des valeurs arrondies (~7 caractères par valeur contre ~11 en float64 base64).
+    """
+    if values.dtype.kind not in 'fiu' or values.size < MIN_LENGTH:
+        return values
+    if values.dtype.kind in 'iu':
+        low, high = values.min(), values.max()
+        for dtype in INT_DTYPES:
+            info = np.iinfo(dtype)
+            if info.min <= low and high <= info.max:
+                return values.astype(dtype)
+        return values
+    rounded = round_significant(values, digits)
+    finite = np.isfinite(rounded)
+    if finite.all() and np.array_equal(rounded, np.round(rounded)):
+        return compact_array(rounded.astype(np.int64), digits)
+    if axis:
+        return rounded.astype(np.float32)
+    # NaN et infinis en null (JSON strict)
+    return np.where(finite, rounded, None).tolist()
+
+
+def _templates(trace):
+    """Modèles de survol et de texte de la trace : {propriété: chaîne ou liste de chaînes}"""
+    templates = {}
+    for prop in ['hovertemplate', 'texttemplate']:
+        value = trace[prop] if prop in trace else None
+        if value is not None:
+            templates[prop] = value
+    return templates
+
+
+def _joined(templates):
+    return ' '.join(t for value in templates.values() for t in ([value] if isinstance(value, str) else value))
+
+
+def _rewrite(templates, substitute):
+    return {prop: substitute(value) if isinstance(value, str) else [substitute(t) for t in value]
+            for prop, value in templates.items()}
+
+
+def _prune_customdata(trace):
+    """Allège customdata : colonnes jamais affichées retirées, colonnes constantes écrites dans le modèle"""
+    customdata = trace['customdata'] if 'customdata' in trace else None
+    templates = _templates(trace)
+    if customdata is None or not templates:
+        # Sans modèle explicite, plotly.js peut afficher toute la ligne
+        return
+    customdata = np.asarray(customdata, dtype=object)
+    if customdata.ndim != 2 or not len(customdata):
+        return
+    text = _joined(templates)
+
+    # Colonne constante affichée sans format (par exemple la couleur de la trace) : valeur en dur
+    constants = {}
+    for i in {int(i) for i in CUSTOMDATA_REF.findall(text)}:
+        value = customdata[0, i]
+        bare = text.count(f"%{{customdata[{i}]}}")
+        if (bare == len(re.findall(rf"customdata\[{i}\]", text)) and isinstance(value, str)
+                and '{' not in value and (customdata[:, i] == value).all()):
+            constants[i] = value
+    if constants:
+        templates = _rewrite(templates, lambda t: BARE_REF.sub(
+            lambda m: constants.get(int(m.group(1)), m.group(0)), t))
+        text = _joined(templates)
+
+    used = sorted({int(i) for i in CUSTOMDATA_REF.findall(text)})
+    if len(used) == customdata.shape[1]:
+        return
+    remap = {old: new for new, old in enumerate(used)}
+    templates = _rewrite(templates, lambda t: CUSTOMDATA_REF.sub(
+        lambda m: f"customdata[{remap[int(m.group(1))]}]", t))
+    trace.update(templates, customdata=customdata[:, used] if used else None)
+
+
+def _compact_props(node, digits, top=True):
+    """Parcourt les propriétés d'une trace et remplace les tableaux numériques"""
+    updates = {}
+    for name, value in node.items():
+        if isinstance(value, dict):
+            nested = _compact_props(value, digits, top=False)
+            updates.update({f"{name}.{key}": v for key, v in nested.items()})
+        elif isinstance(value, (np.ndarray, list, tuple)) and len(value) >= MIN_LENGTH:
+            array = np.asarray(value)
+            if array.dtype.kind in 'fiu':
+                updates[name] = compact_array(array, digits, axis=top and name in AXIS_PROPS)
+    return updates
+
+
+def compact(fig, digits=DIGITS):
+    """Réduit la charge utile d'une figure plotly (modifiée sur place et retournée)"""
+    for trace in fig.data:
+        _prune_customdata(trace)
+        updates = _compact_props(trace.to_plotly_json(), digits)
+        if updates:
+            trace.update(updates)
+    return fig
+
+
+def payload_size(fig):
+    """Octets de la spécification JSON envoyée au navigateur (comme st.plotly_chart)"""
+    return len(pio.to_json(fig, validate=False).encode('utf-8'))
+
+
+def start_rerun():
+    """Remet à zéro les mesures de la session au début d'une réexécution complète"""
+    if MEASURE:
+        st.session_state[STATS_KEY] = {}
+
+
+def plotly_chart(fig, **kwargs):
+    """st.plotly_chart avec compaction, et mesure avant/après si GREENAI_FIGURE_STATS=1"""
+    before = payload_size(fig) if MEASURE else None
+    if COMPACT:
+        compact(fig)
+    if MEASURE:
+        # Indexé par titre : la réexécution d'un fragment remplace ses propres mesures
+        stats = st.session_state.setdefault(STATS_KEY, {})
+        title = fig.layout.title.text or f"graphique {len(stats) + 1}"
+        stats[title] = (before, payload_size(fig))
+    return st.plotly_chart(fig, **kwargs)
+
+
+def totals():
+    """(octets avant, octets après, nombre de graphiques) de la dernière réexécution ; None sans mesure"""
+    stats = st.session_state.get(STATS_KEY) if MEASURE else None
+    if not stats:
+        return None
+    before = sum(b for b, _ in stats.values())
+    after = sum(a for _, a in stats.values())
+    return before, after, len(stats)
+
+
+if __name__ == '__main__':
+    # python figure_payload.py : octets par graphique, sans puis avec compaction, sur une exécution sans navigateur
+    import pandas as pd
+
+    import figure_payload
+    import snapshot_export
+
+    # Module partagé avec l'application exécutée (pas ce __main__)
+    figure_payload.MEASURE = True
+    at = snapshot_export.run_app()
+    stats = dict(at.session_state[STATS_KEY])
+    report = pd.DataFrame.from_dict(stats, orient='index', columns=['avant', 'après'])
+    report.loc['Total'] = report.sum()
+    report['gain'] = 1 - report['après'] / report['avant']
+    pd.set_option('display.width', 200)
+    print(report.to_string(formatters={'gain': '{:.0%}'.format}))
@@ -0,0 +1,321 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import urllib.request
+
+import numpy as np
+import pandas as pd
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+from tornado.httpclient import HTTPRequest
+from tornado.websocket import websocket_connect
+
+APP_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')
+
+# Premier port des répliques lancées localement (une réplique = un serveur Streamlit)
+BASE_PORT = int(os.environ.get('GREENAI_LOADTEST_PORT', 8601))
+
+# Temps de réflexion moyen d'un utilisateur entre deux interactions (loi exponentielle)
+THINK_SECONDS = float(os.environ.get('GREENAI_LOADTEST_THINK', 2.0))
+
+# Répartition des interactions rejouées ; un changement d'onglet est géré par le navigateur
+# (aucune réexécution) et ne compte que comme temps de réflexion
+ACTIONS = {'multiselect': 0.35, 'selectbox': 0.3, 'slider': 0.2, 'onglet': 0.15}
+
+SAMPLE_SECONDS = 0.5
+STARTUP_TIMEOUT = 120
+MAX_MESSAGE_BYTES = 256 << 20
+
+PERCENTILES = [50, 90, 95, 99]
+
+
+class Session:
+    """Un navigateur simulé : websocket Streamlit, état des widgets et mesures des réexécutions"""
+
+    def __init__(self, url, rng):
+        self.url = url
+        self.rng = rng
+        self.conn = None
+        self.widgets = {}
+        self.states = {}
+        self.latencies = []
+        self.errors = 0
+
+    async def connect(self):
+        ws_url = self.url.replace('http', 'ws', 1).rstrip('/') + '/_stcore/stream'
+        request = HTTPRequest(ws_url, connect_timeout=STARTUP_TIMEOUT)
+        self.conn = await websocket_connect(request, subprotocols=['streamlit'],
+                                            max_message_size=MAX_MESSAGE_BYTES)
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+
+    async def rerun(self, action):
+        """Envoie l'état des widgets comme le navigateur et attend la fin de la réexécution"""
+        msg = BackMsg()
+        msg.rerun_script.query_string = ''
+        msg.rerun_script.page_script_hash = ''
+        msg.rerun_script.widget_states.widgets.extend(self.states.values())
+        start = time.perf_counter()
+        await self.conn.write_message(msg.SerializeToString(), binary=True)
+
+        widgets = {}
+        while True:
+            data = await self.conn.read_message()
+            if data is None:
+                raise ConnectionError("Connexion fermée par le serveur")
+            fwd = ForwardMsg()
+            fwd.ParseFromString(data)
+            kind = fwd.WhichOneof('type')
+            if kind == 'delta' and fwd.delta.WhichOneof('type') == 'new_element':
+                element = fwd.delta.new_element
+                el_type = element.WhichOneof('type')
+                if el_type == 'exception':
+                    self.errors += 1
+                elif el_type in ('multiselect', 'selectbox', 'slider'):
+                    widget = getattr(element, el_type)
+                    if not widget.disabled:
+                        widgets[widget.id] = (el_type, widget)
+            elif kind == 'script_finished':
+                if fwd.script_finished == ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                    continue
+                break
+        self.latencies.append((action, time.perf_counter() - start))
+
+        # Les identifiants des widgets sans clé changent avec leurs options : on suit la dernière exécution
+        self.widgets = widgets
+        self.states = {wid: state for wid, state in self.states.items() if wid in widgets}
+
+    def _choose(self, kind):
+        candidates = [(wid, w) for wid, (t, w) in self.widgets.items() if t == kind]
+        if kind == 'slider':
+            # Curseurs numériques uniquement (pas de select_slider ni de dates)
+            candidates = [(wid, w) for wid, w in candidates if not w.options and w.data_type in (0, 1)]
+        if kind in ('multiselect', 'selectbox'):
+            candidates = [(wid, w) for wid, w in candidates if len(w.options) > 1]
+        return self.rng.choice(candidates) if candidates else (None, None)
+
+    def interact(self, kind):
+        """Modifie un widget au hasard ; retourne False si l'interaction ne provoque pas de réexécution"""
+        wid, widget = self._choose(kind) if kind != 'onglet' else (None, None)
+        if widget is None:
+            return False
+        state = self.states.setdefault(wid, WidgetState(id=wid))
+        if kind == 'multiselect':
+            # Sous-ensemble non vide des options, comme un utilisateur qui coche ou décoche
+            k = self.rng.randint(1, len(widget.options))
+            state.string_array_value.data[:] = self.rng.sample(list(widget.options), k)
+        elif kind == 'selectbox':
+            state.string_value = self.rng.choice(list(widget.options))
+        else:
+            steps = int(round((widget.max - widget.min) / widget.step)) if widget.step else 0
+            state.double_array_value.data[:] = [widget.min + self.rng.randint(0, steps) * widget.step]
+        return True
+
+
+async def run_session(url, duration, seed, start_delay):
+    """Chargement initial puis interactions jusqu'à la fin du test"""
+    rng = random.Random(seed)
+    session = Session(url, rng)
+    await asyncio.sleep(start_delay)
+    deadline = time.perf_counter() + duration
+    try:
+        await session.connect()
+        await session.rerun('chargement')
+        actions, weights = zip(*ACTIONS.items())
+        while time.perf_counter() < deadline:
+            await asyncio.sleep(rng.expovariate(1 / THINK_SECONDS))
+            kind = rng.choices(actions, weights)[0]
+            if session.interact(kind):
+                await session.rerun(kind)
+    finally:
+        session.close()
+    return session
+
+
+def _process_tree(pid):
+    """pid et ses descendants (processus de calcul lancés par l'application)"""
+    children = {}
+    for entry in os.listdir('/proc'):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+            children.setdefault(ppid, []).append(int(entry))
+    tree, stack = [], [pid]
+    while stack:
+        p = stack.pop()
+        tree.append(p)
+        stack.extend(children.get(p, []))
+    return tree
+
+
+def _cpu_and_rss(pid):
+    """(secondes CPU cumulées, mémoire résidente en octets) d'un processus et de ses descendants"""
+    ticks = os.sysconf('SC_CLK_TCK')
+    page = os.sysconf('SC_PAGE_SIZE')
+    cpu = rss = 0
+    for p in _process_tree(pid):
+        try:
+            with open(f"/proc/{p}/stat") as f:
+                fields = f.read().rsplit(')', 1)[1].split()
+            cpu += (int(fields[11]) + int(fields[12])) / ticks
+            with open(f"/proc/{p}/statm") as f:
+                rss += int(f.read().split()[1]) * page
+        except (OSError, IndexError, ValueError):
+            continue
+    return cpu, rss
+
+
+async def sample_replicas(pids, samples, stop):
+    """Relevés périodiques de CPU (%) et mémoire de chaque réplique (Linux, /proc)"""
+    previous = {pid: (time.perf_counter(), _cpu_and_rss(pid)[0]) for pid in pids}
+    while not stop.is_set():
+        await asyncio.sleep(SAMPLE_SECONDS)
+        now = time.perf_counter()
+        for replica, pid in enumerate(pids):
+            cpu, rss = _cpu_and_rss(pid)
+            t0, cpu0 = previous[pid]
+            samples.append({'réplique': replica, 'cpu %': 100 * (cpu - cpu0) / (now - t0), 'rss (Mo)': rss / 2**20})
+            previous[pid] = (now, cpu)
+
+
+def start_replicas(n, base_port=BASE_PORT):
+    """Lance `n` serveurs Streamlit locaux et attend qu'ils répondent"""
+    replicas = []
+    for i in range(n):
+        port = base_port + i
+        proc = subprocess.Popen(
+            [sys.executable, '-m', 'streamlit', 'run', APP_FILE, '--server.headless=true',
+             f'--server.port={port}', '--server.fileWatcherType=none', '--browser.gatherUsageStats=false'],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        replicas.append((f"http://localhost:{port}", proc))
+    deadline = time.time() + STARTUP_TIMEOUT
+    for url, proc in replicas:
+        while True:
+            try:
+                urllib.request.urlopen(f"{url}/_stcore/health", timeout=2)
+                break
+            except OSError:
+                if proc.poll() is not None or time.time() > deadline:
+                    stop_replicas(replicas)
+                    raise RuntimeError(f"La réplique {url} n'a pas démarré")
+                time.sleep(0.5)
+    return replicas
+
+
+def stop_replicas(replicas):
+    for _, proc in replicas:
+        proc.terminate()
+    for _, proc in replicas:
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+async def run_load(urls, sessions, duration, ramp=10.0, pids=(), seed=0):
+    """`sessions` navigateurs répartis en tourniquet sur `urls` ; retourne (sessions, relevés)"""
+    samples = []
+    stop = asyncio.Event()
+    sampler = asyncio.ensure_future(sample_replicas(list(pids), samples, stop)) if pids else None
+    tasks = [run_session(urls[i % len(urls)], duration, seed + i, ramp * i / max(sessions, 1))
+             for i in range(sessions)]
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    stop.set()
+    if sampler is not None:
+        await sampler
+    return results, samples
+
+
+def report(results, samples, elapsed):
+    """Percentiles de latence par interaction, débit et ressources par réplique"""
+    failed = [r for r in results if isinstance(r, Exception)]
+    done = [r for r in results if not isinstance(r, Exception)]
+    latencies = pd.DataFrame([(a, s) for r in done for a, s in r.latencies], columns=['interaction', 'secondes'])
+
+    def summarize(values):
+        row = {'réexécutions': len(values)}
+        row.update({f"p{p}": np.percentile(values, p) for p in PERCENTILES})
+        row['max'] = values.max()
+        return pd.Series(row)
+
+    table = latencies.groupby('interaction')['secondes'].apply(summarize).unstack() if len(latencies) else pd.DataFrame()
+    if len(latencies):
+        interactions = latencies[latencies['interaction'] != 'chargement']['secondes']
+        if len(interactions):
+            table.loc['toutes (hors chargement)'] = summarize(interactions)
+    resources = pd.DataFrame(samples)
+    if len(resources):
+        resources = resources.groupby('réplique').agg(**{
+            'cpu moyen %': ('cpu %', 'mean'), 'cpu max %': ('cpu %', 'max'),
+            'rss max (Mo)': ('rss (Mo)', 'max'),
+        })
+    summary = {
+        'sessions': len(results),
+        'sessions en échec': len(failed),
+        'exceptions affichées': sum(r.errors for r in done),
+        'réexécutions/s': round(len(latencies) / elapsed, 2) if elapsed else None,
+    }
+    return table, resources, summary, failed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Test de charge : sessions simultanées rejouant des interactions")
+    parser.add_argument('--sessions', type=int, default=10, help="navigateurs simulés")
+    parser.add_argument('--duration', type=float, default=60, help="durée des interactions par session (s)")
+    parser.add_argument('--ramp', type=float, default=10, help="étalement des connexions (s)")
+    parser.add_argument('--replicas', type=int, default=1, help="répliques lancées localement")
+    parser.add_argument('--url', action='append', help="réplique déjà démarrée (répétable, sans lancement local)")
+    parser.add_argument('--pid', type=int, action='append', default=[], help="processus d'une réplique --url à mesurer")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help="écrit le rapport dans ce fichier")
+    parser.add_argument('--max-p95', type=float, help="échec (code 1) si le p95 des interactions dépasse ce seuil (s)")
+    args = parser.parse_args()
+
+    replicas = [] if args.url else start_replicas(args.replicas)
+    urls = args.url or [url for url, _ in replicas]
+    pids = args.pid if args.url else [proc.pid for _, proc in replicas]
+    if not os.path.isdir('/proc'):
+        pids = []
+    try:
+        start = time.perf_counter()
+        results, samples = asyncio.run(run_load(urls, args.sessions, args.duration, args.ramp, pids, args.seed))
+        elapsed = time.perf_counter() - start
+    finally:
+        stop_replicas(replicas)
+
+    latency_table, resource_table, summary, failed = report(results, samples, elapsed)
+    pd.set_option('display.width', 200)
+    print(f"{len(urls)} réplique(s), {args.sessions} session(s), {elapsed:.0f} s")
+    print(json.dumps(summary, ensure_ascii=False))
+    for error in failed[:5]:
+        print(f"Session en échec : {error!r}")
+    print("\nLatence des réexécutions (s)")
+    print(latency_table.round(3).to_string())
+    if len(resource_table):
+        print("\nRessources par réplique")
+        print(resource_table.round(1).to_string())
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({
+                'summary': summary,
+                'latency': json.loads(latency_table.to_json(orient='index')),
+                'resources': json.loads(resource_table.to_json(orient='index')) if len(resource_table) else {},
+            }, f, ensure_ascii=False, indent=2)
+
+    p95 = latency_table['p95'].get('toutes (hors chargement)') if len(latency_table) else None
+    if args.max_p95 is not None and (failed or p95 is None or p95 > args.max_p95):
+        print(f"\nÉchec : p95 = {p95} s (seuil {args.max_p95} s)")
+        sys.exit(1)
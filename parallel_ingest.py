@@ -0,0 +1,76 @@
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+import pyarrow as pa
+
+import data_pipeline
+import result_cache
+
+# Nombre de processus d'ingestion (1 : traitement séquentiel)
+INGEST_WORKERS = int(os.environ.get('GREENAI_INGEST_WORKERS', os.cpu_count() or 1))
+
+def _ingest_file(path):
+    """Lecture, mise au format long, contrôles et nettoyage d'un fichier
+
+    Retourne (lots Arrow, tables de qualité).
+    """
+    df, quality = data_pipeline.process_checked(path)
+    return pa.Table.from_pandas(df, preserve_index=False).to_batches(), quality
+
+
+def ingest(paths, workers=None):
+    """Traite les fichiers en parallèle (un fichier par tâche) ; résultats dans l'ordre de `paths`"""
+    workers = min(workers or INGEST_WORKERS, len(paths))
+    if workers <= 1:
+        return [_ingest_file(path) for path in paths]
+    # 'spawn' : pas de fork d'un processus qui porte des threads (watchdog, ingestion du journal)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        return list(pool.map(_ingest_file, paths))
+
+
+def to_frame(batches):
+    """Lots d'un fichier en DataFrame au format du cache"""
+    return pa.Table.from_batches(batches).to_pandas()
+
+
+def warm_cache(sources, cache_dir=None, workers=None):
+    """Construit en parallèle les entrées de cache manquantes ; retourne le nombre de fichiers traités"""
+    cache_dir = cache_dir or result_cache.CACHE_DIR
+    missing = [source for source in sources if not result_cache.is_cached(source, cache_dir)]
+    if len(missing) < 2:
+        # Un seul fichier : load_or_build le traitera sans coût de démarrage des processus
+        return 0
+    for source, (batches, quality) in zip(missing, ingest(missing, workers)):
+        df = to_frame(batches)
+        result_cache.store(source, df, {**data_pipeline.compute_aggregates(df), **quality}, cache_dir)
+    return len(missing)
+
+
+def speedup_report(paths, worker_counts=None):
+    """Temps d'ingestion de `paths` selon le nombre de processus (sans cache)"""
+    cores = os.cpu_count() or 1
+    if worker_counts is None:
+        worker_counts = sorted({1, 2, 4, 8, cores} & set(range(1, cores + 1)))
+    rows = []
+    for workers in worker_counts:
+        start = time.perf_counter()
+        frames = [to_frame(batches) for batches, _ in ingest(paths, workers)]
+        rows.append({'processus': workers, 'secondes': time.perf_counter() - start,
+                     'lignes': sum(len(frame) for frame in frames)})
+    report = pd.DataFrame(rows).set_index('processus')
+    report['accélération'] = report['secondes'].iloc[0] / report['secondes']
+    report['efficacité'] = report['accélération'] / report.index
+    return report
+
+
+if __name__ == '__main__':
+    # python parallel_ingest.py [catalog.json] : rapport d'accélération selon le nombre de cœurs
+    import dataset_catalog
+
+    files = dataset_catalog.list_sources(sys.argv[1] if len(sys.argv) > 1 else None)
+    print(f"{len(files)} fichier(s), {os.cpu_count()} cœur(s)")
+    print(speedup_report(files).round(3).to_string())
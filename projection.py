@@ -0,0 +1,171 @@
+import os
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+
+import numpy as np
+import pandas as pd
+
+import data_pipeline
+
+# Métriques par requête projetées à l'échelle de la flotte
+PROJECTED_METRICS = ['electricity (wh)', 'co2 (g)', 'cost (€)', 'time (sec)']
+
+# En dessous de ce nombre de simulations, le calcul reste dans le processus courant
+POOL_MIN_SIMULATIONS = int(os.environ.get('GREENAI_PROJECTION_POOL_MIN', 20_000))
+POOL_WORKERS = int(os.environ.get('GREENAI_PROJECTION_WORKERS', os.cpu_count() or 1))
+
+# Nombre de requêtes tirées par simulation pour les percentiles de latence
+LATENCY_SAMPLE = 1000
+
+# Taille maximale (simulations x observations) d'un lot de tirages bootstrap : borne la mémoire
+BOOTSTRAP_CELLS = int(os.environ.get('GREENAI_PROJECTION_BOOTSTRAP_CELLS', 2_000_000))
+
+PERCENTILES = [5, 50, 95]
+
+# Paramètres d'un scénario (hashable : sert de clé de cache)
+Scenario = namedtuple('Scenario', [
+    'model',              # modèle servant toutes les requêtes
+    'requests_per_day',   # volume quotidien
+    'mix',                # ((question_categorie, poids), ...)
+    'days',               # durée projetée
+    'price_per_1k_tokens',  # prix (€) utilisé quand le coût mesuré est absent
+    'n_simulations',
+    'seed',
+])
+
+_pool = None
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        # 'spawn' : pas de fork d'un processus qui porte des threads (watchdog, ingestion)
+        _pool = ProcessPoolExecutor(max_workers=POOL_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+    return _pool
+
+
+def _simulate_chunk(groups, n_simulations, seed):
+    """Simule `n_simulations` années de flotte ; retourne un tableau [simulation, indicateur]
+
+    `groups` : liste de (nombre de requêtes, poids dans le mix, matrice [observation, métrique]).
+    Les moyennes par requête sont rééchantillonnées (bootstrap) pour chaque simulation : la
+    bande reflète l'incertitude due au nombre limité de mesures du benchmark.
+    """
+    rng = np.random.default_rng(seed)
+    totals = np.zeros((n_simulations, 3))
+    for n_requests, _, values in groups:
+        # Électricité, CO₂ et coût : somme annuelle = volume x moyenne bootstrap. Tirages par
+        # lots de BOOTSTRAP_CELLS indices au plus, rassemblés une colonne à la fois
+        n = len(values)
+        batch = max(1, BOOTSTRAP_CELLS // n)
+        for start in range(0, n_simulations, batch):
+            stop = min(start + batch, n_simulations)
+            idx = rng.integers(0, n, size=(stop - start, n))
+            for metric in range(3):
+                totals[start:stop, metric] += n_requests * values[:, metric][idx].mean(axis=1)
+
+    # Latence : requêtes individuelles tirées dans le mélange des catégories
+    weights = np.array([w for _, w, _ in groups])
+    sizes = np.array([len(values) for _, _, values in groups])
+    offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    latencies = np.concatenate([values[:, 3] for _, _, values in groups])
+    quantiles = np.empty((n_simulations, 2))
+    batch = max(1, BOOTSTRAP_CELLS // LATENCY_SAMPLE)
+    for start in range(0, n_simulations, batch):
+        stop = min(start + batch, n_simulations)
+        picked = rng.choice(len(groups), size=(stop - start, LATENCY_SAMPLE), p=weights / weights.sum())
+        draws = latencies[offsets[picked] + (rng.random(picked.shape) * sizes[picked]).astype(np.int64)]
+        quantiles[start:stop] = np.percentile(draws, [50, 95], axis=1).T
+    return np.column_stack([totals, quantiles])
+
+
+class ProjectionEngine:
+    """Projection Monte-Carlo de l'empreinte annuelle d'une flotte à partir des mesures par requête
+
+    Les mesures d'un modèle sont lues à sa première projection, par une requête limitée à ses
+    partitions et aux colonnes projetées : les autres modèles ne sont jamais chargés.
+    """
+
+    def __init__(self, backend, cache_size=64):
+        self.backend = backend
+        self.models = sorted(backend.distinct('model'))
+        self.groups = {}
+        self._loaded = set()
+        self._cache = OrderedDict()
+        self._cache_size = cache_size
+
+    def _load(self, model):
+        if model in self._loaded:
+            return
+        df = self.backend.rows({'model': [model]}, columns=['question_categorie', 'tokens'] + PROJECTED_METRICS)
+        df = df.assign(**{'cost (€)': data_pipeline.numeric_cost(df)})
+        for category, group in df.groupby('question_categorie'):
+            self.groups[(model, category)] = group[PROJECTED_METRICS + ['tokens']].to_numpy(dtype=float)
+        self._loaded.add(model)
+
+    def categories(self, model):
+        self._load(model)
+        return sorted(category for m, category in self.groups if m == model)
+
+    def default_mix(self, model):
+        """Mix de questions du benchmark pour ce modèle"""
+        return tuple((category, float(len(self.groups[(model, category)]))) for category in self.categories(model))
+
+    def _prepare(self, scenario):
+        self._load(scenario.model)
+        total_weight = sum(w for _, w in scenario.mix if w > 0)
+        groups = []
+        missing = []
+        for category, weight in scenario.mix:
+            if weight <= 0:
+                continue
+            values = self.groups.get((scenario.model, category))
+            if values is None:
+                missing.append(category)
+                continue
+            values = values.copy()
+            # Coût absent : prix au millier de tokens
+            no_cost = np.isnan(values[:, 2])
+            values[no_cost, 2] = values[no_cost, 4] / 1000 * scenario.price_per_1k_tokens
+            values = values[~np.isnan(values[:, :4]).any(axis=1), :4]
+            if len(values) == 0:
+                missing.append(category)
+                continue
+            n_requests = scenario.requests_per_day * scenario.days * weight / total_weight
+            groups.append((n_requests, weight, values))
+        return groups, missing
+
+    def project(self, scenario):
+        """Bandes de percentiles (p5, p50, p95) de l'empreinte annuelle ; résultat mis en cache"""
+        if scenario in self._cache:
+            self._cache.move_to_end(scenario)
+            return self._cache[scenario]
+
+        groups, missing = self._prepare(scenario)
+        if not groups:
+            raise ValueError(f"Aucune mesure pour le modèle {scenario.model} sur les questions choisies")
+
+        seeds = np.random.SeedSequence(scenario.seed)
+        if scenario.n_simulations >= POOL_MIN_SIMULATIONS and POOL_WORKERS > 1:
+            chunks = np.array_split(np.arange(scenario.n_simulations), POOL_WORKERS)
+            futures = [_get_pool().submit(_simulate_chunk, groups, len(chunk), child)
+                       for chunk, child in zip(chunks, seeds.spawn(len(chunks))) if len(chunk)]
+            results = np.concatenate([f.result() for f in futures])
+        else:
+            results = _simulate_chunk(groups, scenario.n_simulations, seeds)
+
+        samples = pd.DataFrame(results, columns=[
+            'Énergie (MWh/an)', 'CO₂ (t/an)', 'Coût (€/an)', 'Latence p50 (s)', 'Latence p95 (s)'])
+        # Wh -> MWh, g -> t
+        samples['Énergie (MWh/an)'] /= 1e6
+        samples['CO₂ (t/an)'] /= 1e6
+
+        bands = samples.quantile([p / 100 for p in PERCENTILES]).T
+        bands.columns = [f"p{p}" for p in PERCENTILES]
+        projection = {'bands': bands, 'samples': samples, 'missing': missing}
+
+        self._cache[scenario] = projection
+        if len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+        return projection
@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+
+# Métriques dont on garde la distribution (percentiles de queue)
+SKETCH_METRICS = ['time (sec)', 'co2 (g)', 'electricity (wh)']
+
+# Dimensions du cube de sketches (mêmes filtres que la barre latérale)
+SKETCH_DIMENSIONS = ['question_categorie', 'categorie_model', 'model', 'score_bucket']
+
+# Erreur relative garantie sur chaque percentile
+RELATIVE_ACCURACY = 0.01
+GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+
+# Valeurs inférieures (zéro, négatives) regroupées dans un même seau, estimé à 0
+MIN_VALUE = 1e-6
+ZERO_BUCKET = int(np.floor(np.log(MIN_VALUE) / np.log(GAMMA)))
+
+
+def bucket_index(values):
+    """Seau logarithmique de chaque valeur : la mémoire dépend de l'étendue, pas du volume"""
+    values = np.asarray(values, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        index = np.ceil(np.log(values) / np.log(GAMMA))
+    return np.where(values > MIN_VALUE, index, ZERO_BUCKET).astype(np.int64)
+
+
+def bucket_value(index):
+    """Valeur représentative d'un seau (erreur relative <= RELATIVE_ACCURACY)"""
+    index = np.asarray(index)
+    return np.where(index > ZERO_BUCKET, 2 * GAMMA ** index / (GAMMA + 1), 0.0)
+
+
+def sketch_table(df, dimensions=SKETCH_DIMENSIONS):
+    """Effectifs par seau pour chaque groupe de `dimensions` et chaque métrique
+
+    Deux tables construites sur des morceaux différents se fusionnent par `merge`
+    (somme des effectifs) : le résultat est identique à celui du jeu complet.
+    """
+    if 'score_bucket' in dimensions and 'score_bucket' not in df.columns:
+        df = df.assign(score_bucket=df['score'])
+    tables = []
+    for metric in SKETCH_METRICS:
+        part = df[dimensions + [metric]].dropna()
+        counts = part.groupby(dimensions + [bucket_index(part[metric])]).size()
+        counts.index = counts.index.set_names(dimensions + ['bucket'])
+        tables.append(counts.rename('count').reset_index().assign(metric=metric))
+    return pd.concat(tables, ignore_index=True)
+
+
+def merge(tables, dimensions=SKETCH_DIMENSIONS):
+    """Fusionne des tables de sketches (par exemple une par fichier ou par morceau)"""
+    merged = pd.concat(tables, ignore_index=True)
+    return merged.groupby(dimensions + ['metric', 'bucket'], as_index=False)['count'].sum()
+
+
+class QuantileIndex:
+    """Percentiles approchés sous n'importe quelle combinaison de filtres, par fusion des sketches"""
+
+    def __init__(self, table):
+        self._codes = {}
+        self._values = {}
+        for col in ['question_categorie', 'categorie_model', 'model', 'metric']:
+            codes, values = pd.factorize(table[col])
+            self._codes[col] = codes
+            self._values[col] = np.asarray(values, dtype=object)
+        self._score = table['score_bucket'].to_numpy(dtype=float)
+        self._counts = table['count'].to_numpy(dtype=np.int64)
+        bucket = table['bucket'].to_numpy(dtype=np.int64)
+        self._offset = bucket.min() if len(bucket) else 0
+        self._bucket = bucket - self._offset
+        self._n_buckets = int(self._bucket.max()) + 1 if len(bucket) else 0
+
+    def _mask(self, filters, metric):
+        mask = self._score >= filters.get('min_score', 0)
+        mask &= self._codes['metric'] == np.flatnonzero(self._values['metric'] == metric)[0]
+        for col in ['question_categorie', 'categorie_model', 'model']:
+            if col in filters:
+                wanted = np.flatnonzero(np.isin(self._values[col], list(filters[col])))
+                mask &= np.isin(self._codes[col], wanted)
+        return mask
+
+    def histogram(self, filters, metric, by='model'):
+        """Sketches fusionnés : matrice [groupe, seau] des effectifs et libellés des groupes"""
+        mask = self._mask(filters, metric)
+        groups = self._codes[by][mask]
+        flat = groups * self._n_buckets + self._bucket[mask]
+        counts = np.bincount(flat, weights=self._counts[mask],
+                             minlength=len(self._values[by]) * self._n_buckets)
+        counts = counts.reshape(len(self._values[by]), self._n_buckets)
+        present = counts.sum(axis=1) > 0
+        return counts[present], self._values[by][present]
+
+    def quantiles(self, filters, metric, qs=(0.5, 0.95, 0.99), by='model'):
+        """Percentiles de `metric` par `by` (p50, p95, p99 par défaut)"""
+        counts, labels = self.histogram(filters, metric, by)
+        cumulative = np.cumsum(counts, axis=1)
+        total = cumulative[:, -1:] if len(cumulative) else np.zeros((0, 1))
+        values = bucket_value(np.arange(self._n_buckets) + self._offset)
+
+        result = {}
+        for q in qs:
+            # Premier seau dont l'effectif cumulé dépasse le rang q x (n - 1)
+            rank = q * (total - 1)
+            index = (cumulative <= rank).sum(axis=1)
+            result[f"p{q * 100:g}"] = values[np.minimum(index, self._n_buckets - 1)]
+        table = pd.DataFrame(result, index=pd.Index(labels, name=by))
+        table.insert(0, 'n', total.ravel().astype(np.int64))
+        return table.sort_index()
@@ -0,0 +1,385 @@
+import os
+
+import pandas as pd
+
+import data_pipeline
+import dataset_catalog
+import emissions
+import quantile_sketch
+import token_regression
+import topk_index
+
+try:
+    import duckdb
+except ImportError:  # DuckDB est optionnel : le moteur pandas reste disponible
+    duckdb = None
+
+# 'pandas', 'duckdb' ou 'auto' (DuckDB au-delà de DUCKDB_MIN_ROWS lignes)
+QUERY_BACKEND = os.environ.get('GREENAI_QUERY_BACKEND', 'auto')
+DUCKDB_MIN_ROWS = int(os.environ.get('GREENAI_DUCKDB_MIN_ROWS', 1_000_000))
+
+# Points au plus par nuage de points (échantillon reproductible au-delà)
+SAMPLE_ROWS = int(os.environ.get('GREENAI_SAMPLE_ROWS', 5000))
+
+# Lignes affichées dans la vue des données brutes
+RAW_ROWS = int(os.environ.get('GREENAI_RAW_ROWS', 1000))
+
+
+class PandasBackend:
+    """Agrégations pandas en mémoire sur les partitions du catalogue (moteur par défaut)"""
+
+    name = 'pandas'
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self.aggregates = catalog.aggregates
+        self.topk = topk_index.TopKIndex(catalog.aggregates['metric_cube'])
+        self.quantiles = quantile_sketch.QuantileIndex(catalog.aggregates['quantile_sketch'])
+
+    def distinct(self, column):
+        return self.catalog.distinct(column)
+
+    def rows(self, filters, columns=None, limit=None, order_by=None):
+        df = data_pipeline.apply_filters(self.catalog.read(filters), filters)
+        if columns is not None:
+            df = df[columns]
+        if order_by is not None:
+            df = df.sort_values(order_by, kind='stable').reset_index(drop=True)
+        return df if limit is None else df.head(limit)
+
+    def sample(self, filters, columns, n=SAMPLE_ROWS):
+        df = self.rows(filters, columns)
+        return df if len(df) <= n else df.sample(n, random_state=0)
+
+    def group_stats(self, filters, by=None):
+        return data_pipeline.group_stats(self.rows(filters), by)
+
+    def score_counts(self, filters, by):
+        return data_pipeline.score_counts(self.rows(filters), by)
+
+    def score_box(self, filters, by):
+        return data_pipeline.score_box(self.rows(filters, [by, 'score']), by)
+
+    def score_outliers(self, filters, by):
+        return data_pipeline.score_outliers(self.rows(filters, [by, 'score']), by)
+
+    def score_level_counts(self, filters, by, levels):
+        return data_pipeline.score_level_counts(self.rows(filters, list(by) + ['score']), by, levels)
+
+    def implied_intensity(self, filters, by='model'):
+        df = self.rows(filters)
+        return emissions.implied_intensity(df).groupby(df[by]).describe()[['count', 'min', '50%', 'max']]
+
+    def regression_moments(self, filters, by, x, ys, log=False):
+        return token_regression.moments(self.rows(filters, [by, x] + ys), by, x, ys, log)
+
+    def summary_table(self, filters, key):
+        return data_pipeline.summary_table(self.rows(filters), key)
+
+    def category_metrics(self, filters):
+        return data_pipeline.category_metrics(self.rows(filters))
+
+    def radar(self, filters):
+        return data_pipeline.normalize_radar(self.category_metrics(filters))
+
+    def model_ranking(self, filters):
+        return data_pipeline.model_ranking(data_pipeline.add_efficiency(self.rows(filters)))
+
+    def question_comparison(self, filters):
+        return data_pipeline.question_comparison(self.rows(filters))
+
+    def question_detail(self, filters):
+        return data_pipeline.question_detail(self.rows(filters))
+
+
+def _quote(column):
+    return '"' + column.replace('"', '""') + '"'
+
+
+def _sql_string(value):
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _token_averages(digits=None):
+    """Moyennes SQL des métriques par token (arrondies si `digits`)"""
+    averages = []
+    for col in data_pipeline.TOKEN_METRICS:
+        expr = f"avg({_quote(col)})"
+        if digits is not None:
+            expr = f"round({expr}, {digits})"
+        averages.append(f"{expr} AS {_quote(col)}")
+    return ', '.join(averages)
+
+
+class DuckDBBackend:
+    """Mêmes agrégations exprimées en SQL sur les partitions Parquet (filtres poussés dans le scan)"""
+
+    name = 'duckdb'
+
+    def __init__(self, catalog):
+        if duckdb is None:
+            raise ImportError("Le moteur 'duckdb' nécessite le paquet duckdb (pip install duckdb)")
+        self.catalog = catalog
+        self.aggregates = catalog.aggregates
+        self.topk = topk_index.TopKIndex(catalog.aggregates['metric_cube'])
+        self.quantiles = quantile_sketch.QuantileIndex(catalog.aggregates['quantile_sketch'])
+        self.con = duckdb.connect()
+
+    def _query(self, sql, params=()):
+        # Un curseur par requête : la connexion est partagée entre les sessions Streamlit
+        return self.con.cursor().execute(sql, list(params)).df()
+
+    def _from(self, filters):
+        """Source SQL limitée aux fichiers des partitions retenues"""
+        files = self.catalog.files(filters)
+        if not files:
+            # Aucune partition : relation vide avec le bon schéma
+            return f"(SELECT * FROM read_parquet({_sql_string(self.catalog.all_files()[0])}) LIMIT 0)"
+        # union_by_name : schéma unifié sur tous les fichiers (et non celui du premier), pour qu'une
+        # colonne entière dans un fichier ne tronque pas les décimales des suivants
+        return f"read_parquet([{', '.join(_sql_string(f) for f in files)}], union_by_name = true)"
+
+    def _where(self, filters):
+        clauses = [f"{_quote('score')} >= ?"]
+        params = [filters.get('min_score', 0)]
+        for col in data_pipeline.FILTER_COLUMNS:
+            if col in filters:
+                values = list(filters[col])
+                if not values:
+                    clauses.append('FALSE')
+                    continue
+                clauses.append(f"{_quote(col)} IN ({', '.join('?' * len(values))})")
+                params.extend(values)
+        return ' AND '.join(clauses), params
+
+    def distinct(self, column):
+        return self.catalog.distinct(column)
+
+    def rows(self, filters, columns=None, limit=None, order_by=None):
+        where, params = self._where(filters)
+        select = '*' if columns is None else ', '.join(_quote(c) for c in columns)
+        sql = f"SELECT {select} FROM {self._from(filters)} WHERE {where}"
+        if order_by is not None:
+            sql += f" ORDER BY {', '.join(_quote(c) for c in order_by)}"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        return self._query(sql, params)
+
+    def sample(self, filters, columns, n=SAMPLE_ROWS):
+        # L'échantillon se tire après le WHERE : requête filtrée en sous-requête
+        where, params = self._where(filters)
+        return self._query(f"""
+            SELECT * FROM (
+                SELECT {', '.join(_quote(c) for c in columns)} FROM {self._from(filters)} WHERE {where}
+            ) USING SAMPLE reservoir({int(n)} ROWS) REPEATABLE (0)
+        """, params)
+
+    def group_stats(self, filters, by=None):
+        where, params = self._where(filters)
+        key = f"{_quote(by)}, " if by else "'Total' AS key, "
+        stats = self._query(f"""
+            SELECT {key}
+                   count(*) AS "réponses", count(DISTINCT model) AS "modèles",
+                   count(DISTINCT question_id) AS questions,
+                   avg(score) AS score, avg("co2 (g)") AS "co2 (g)",
+                   avg("electricity (wh)") AS "electricity (wh)", avg("time (sec)") AS "time (sec)",
+                   coalesce(sum("co2 (g)"), 0) AS "co2 total (g)",
+                   coalesce(sum("electricity (wh)"), 0) AS "electricity total (wh)"
+            FROM {self._from(filters)} WHERE {where}
+            {'GROUP BY ALL ORDER BY 1' if by else ''}
+        """, params)
+        stats = stats.set_index(by or 'key')
+        stats.index.name = by
+        return stats
+
+    def score_counts(self, filters, by):
+        where, params = self._where(filters)
+        return self._query(f"""
+            SELECT {_quote(by)}, score, count(*) AS "réponses"
+            FROM {self._from(filters)} WHERE {where}
+            GROUP BY ALL ORDER BY 1, 2
+        """, params)
+
+    def _tukey(self, filters, by):
+        """Scores avec les quartiles de leur groupe et l'indicateur `inside` (entre les clôtures de Tukey)"""
+        where, params = self._where(filters)
+        key = _quote(by)
+        return f"""
+            WITH s AS (
+                SELECT {key}, score FROM {self._from(filters)} WHERE {where} AND score IS NOT NULL
+            ), q AS (
+                SELECT {key}, quantile_cont(score, 0.25) AS q1, median(score) AS "médiane",
+                       quantile_cont(score, 0.75) AS q3
+                FROM s GROUP BY ALL
+            ), t AS (
+                SELECT s.*, q1, "médiane", q3,
+                       score BETWEEN q1 - 1.5 * (q3 - q1) AND q3 + 1.5 * (q3 - q1) AS inside
+                FROM s JOIN q USING ({key})
+            )
+        """, params
+
+    def score_box(self, filters, by):
+        tukey, params = self._tukey(filters, by)
+        return self._query(f"""
+            {tukey}
+            SELECT {_quote(by)}, min(score) FILTER (WHERE inside) AS "moustache basse",
+                   any_value(q1) AS q1, any_value("médiane") AS "médiane", any_value(q3) AS q3,
+                   max(score) FILTER (WHERE inside) AS "moustache haute"
+            FROM t GROUP BY ALL ORDER BY 1
+        """, params).set_index(by)
+
+    def score_outliers(self, filters, by):
+        tukey, params = self._tukey(filters, by)
+        return self._query(f"""
+            {tukey}
+            SELECT {_quote(by)}, score, count(*) AS "réponses"
+            FROM t WHERE NOT inside GROUP BY ALL ORDER BY 1, 2
+        """, params)
+
+    def score_level_counts(self, filters, by, levels):
+        where, params = self._where(filters)
+        keys = ', '.join(_quote(c) for c in by)
+        return self._query(f"""
+            SELECT {keys}, CAST(floor(least(score, {int(levels) - 1})) AS INTEGER) AS score_level,
+                   count(*) AS "réponses"
+            FROM {self._from(filters)} WHERE {where}
+            GROUP BY ALL ORDER BY ALL
+        """, params)
+
+    def implied_intensity(self, filters, by='model'):
+        where, params = self._where(filters)
+        return self._query(f"""
+            SELECT {_quote(by)}, count(ratio) AS count, min(ratio) AS min,
+                   quantile_cont(ratio, 0.5) AS "50%", max(ratio) AS max
+            FROM (
+                SELECT {_quote(by)}, "co2 (g)" / ("electricity (wh)" / 1000) AS ratio
+                FROM {self._from(filters)} WHERE {where}
+            )
+            GROUP BY ALL ORDER BY 1
+        """, params).set_index(by)
+
+    def regression_moments(self, filters, by, x, ys, log=False):
+        # Une seule lecture : agrégats regr_* (sommes centrées, numériquement stables) par grandeur
+        where, params = self._where(filters)
+
+        def term(col):
+            return f"ln(CASE WHEN {_quote(col)} > 0 THEN {_quote(col)} END)" if log else _quote(col)
+
+        columns = []
+        for i, y in enumerate(ys):
+            args = f"{term(y)}, {term(x)}"
+            columns += [f"regr_count({args}) AS n_{i}", f"regr_avgx({args}) AS mean_x_{i}",
+                        f"regr_avgy({args}) AS mean_y_{i}", f"regr_sxx({args}) AS sxx_{i}",
+                        f"regr_syy({args}) AS syy_{i}", f"regr_sxy({args}) AS sxy_{i}"]
+        wide = self._query(f"""
+            SELECT {_quote(by)}, min({_quote(x)}) AS x_min, max({_quote(x)}) AS x_max, {', '.join(columns)}
+            FROM {self._from(filters)} WHERE {where}
+            GROUP BY ALL ORDER BY 1
+        """, params)
+        stats = ['n', 'mean_x', 'mean_y', 'sxx', 'syy', 'sxy']
+        return pd.concat([
+            wide[[by, 'x_min', 'x_max']].assign(target=y, **{s: wide[f"{s}_{i}"] for s in stats})
+            for i, y in enumerate(ys)
+        ], ignore_index=True)
+
+    def summary_table(self, filters, key):
+        where, params = self._where(filters)
+        summary = self._query(f"""
+            SELECT {_quote(key)},
+                   avg(score), stddev_samp(score),
+                   avg("co2 (g)"), coalesce(sum("co2 (g)"), 0),
+                   avg("electricity (wh)"), coalesce(sum("electricity (wh)"), 0),
+                   avg("time (sec)"), stddev_samp("time (sec)"),
+                   avg(tokens), {_token_averages()}
+            FROM {self._from(filters)} WHERE {where}
+            GROUP BY ALL ORDER BY 1
+        """, params).set_index(key).astype(float).round(2)
+        summary.columns = data_pipeline.SUMMARY_LABELS
+        return summary
+
+    def category_metrics(self, filters):
+        where, params = self._where(filters)
+        return self._query(f"""
+            SELECT categorie_model,
+                   avg(score) AS score, avg("co2 (g)") AS "co2 (g)",
+                   avg("electricity (wh)") AS "electricity (wh)", avg("time (sec)") AS "time (sec)"
+            FROM {self._from(filters)} WHERE {where}
+            GROUP BY ALL ORDER BY 1
+        """, params).set_index('categorie_model')
+
+    def radar(self, filters):
+        where, params = self._where(filters)
+        return self._query(f"""
+            WITH m AS (
+                SELECT categorie_model,
+                       avg(score) AS score, avg("co2 (g)") AS co2,
+                       avg("electricity (wh)") AS elec, avg("time (sec)") AS time
+                FROM {self._from(filters)} WHERE {where}
+                GROUP BY ALL
+            )
+            SELECT categorie_model,
+                   score / max(score) OVER () AS score,
+                   co2 AS "co2 (g)", elec AS "electricity (wh)", time AS "time (sec)",
+                   1 - co2 / max(co2) OVER () AS co2_inv,
+                   1 - elec / max(elec) OVER () AS elec_inv,
+                   1 - time / max(time) OVER () AS time_inv
+            FROM m ORDER BY 1
+        """, params).set_index('categorie_model')
+
+    def model_ranking(self, filters):
+        where, params = self._where(filters)
+        ranking = self._query(f"""
+            WITH m AS (
+                SELECT model,
+                       round(avg(score), 2) AS score,
+                       round(avg("co2 (g)"), 2) AS co2,
+                       round(avg("electricity (wh)"), 2) AS elec,
+                       round(avg("time (sec)"), 2) AS time,
+                       round(avg(score / ("co2 (g)" + 0.01)), 2) AS eff_co2,
+                       round(avg(tokens), 2) AS tokens,
+                       {_token_averages(2)}
+                FROM {self._from(filters)} WHERE {where}
+                GROUP BY ALL
+            )
+            SELECT *,
+                   round(score / max(score) OVER () * 0.4
+                         + eff_co2 / max(eff_co2) OVER () * 0.4
+                         + (1 - time / max(time) OVER ()) * 0.2, 3) AS score_global
+            FROM m ORDER BY score_global DESC
+        """, params).set_index('model')
+        ranking.columns = data_pipeline.RANKING_LABELS
+        return ranking
+
+    def question_comparison(self, filters):
+        where, params = self._where(filters)
+        return self._query(f"""
+            SELECT question_categorie,
+                   avg(score) AS score, avg("co2 (g)") AS "co2 (g)",
+                   avg("electricity (wh)") AS "electricity (wh)",
+                   avg("time (sec)") AS "time (sec)", avg(tokens) AS tokens,
+                   {_token_averages()}
+            FROM {self._from(filters)} WHERE {where}
+            GROUP BY ALL ORDER BY 1
+        """, params).set_index('question_categorie').round(2)
+
+    def question_detail(self, filters):
+        where, params = self._where(filters)
+        detail = self._query(f"""
+            SELECT model, categorie_model,
+                   avg(score), count(score),
+                   avg("co2 (g)"), avg("electricity (wh)"), avg("time (sec)"),
+                   {_token_averages()}
+            FROM {self._from(filters)} WHERE {where}
+            GROUP BY ALL ORDER BY 1, 2
+        """, params).set_index(['model', 'categorie_model']).round(2)
+        detail.columns = data_pipeline.DETAIL_LABELS
+        return detail
+
+
+def open_backend(catalog_file=None, mode=None, keep=()):
+    """Ouvre le moteur de requêtes : pandas pour les petits volumes, DuckDB au-delà du seuil"""
+    mode = mode or QUERY_BACKEND
+    catalog = dataset_catalog.open_catalog(catalog_file, keep=keep)
+    if mode == 'pandas' or (mode == 'auto' and (duckdb is None or catalog.num_rows < DUCKDB_MIN_ROWS)):
+        return PandasBackend(catalog)
+    return DuckDBBackend(catalog)
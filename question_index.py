@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+
+# Critères de classement des questions (moyenne sur les réponses des modèles)
+RANK_METRICS = {
+    'electricity (wh)': 'Électricité moyenne (Wh)',
+    'time (sec)': 'Temps moyen (sec)',
+    'co2 (g)': 'CO₂ moyen (g)',
+    'tokens': 'Tokens moyens',
+}
+
+# Métriques comparées entre les modèles A et B d'une même question
+PAIR_METRICS = {
+    'score': 'Score',
+    'tokens': 'Tokens',
+    'time (sec)': 'Temps (sec)',
+    'electricity (wh)': 'Élec. (Wh)',
+    'co2 (g)': 'CO₂ (g)',
+}
+
+ANSWER_COLUMNS = ['categorie_model', 'model_position', 'model', 'score', 'tokens', 'time (sec)',
+                  'electricity (wh)', 'co2 (g)', 'electricity (mwh/token)', 'time (ms/token)', 'cost (€)']
+
+# Seules colonnes lues par l'index (réponses affichées et classements)
+INDEX_COLUMNS = ['question_id', 'question_categorie'] + ANSWER_COLUMNS
+
+
+class QuestionIndex:
+    """Réponses triées par question : chaque question_id pointe vers sa plage de lignes
+
+    Les lignes sont lues une fois au chargement, limitées à INDEX_COLUMNS et déjà triées par
+    le moteur de requêtes (seule copie conservée) ; les réponses d'une question s'obtiennent
+    ensuite par une recherche dans un dictionnaire et une tranche, sans filtrer tout le tableau.
+    Les classements des questions les plus coûteuses sont précalculés.
+    """
+
+    def __init__(self, backend):
+        order = ['question_id', 'categorie_model', 'model_position']
+        self.frame = backend.rows({}, columns=INDEX_COLUMNS, order_by=order)
+        ids = self.frame['question_id'].to_numpy()
+        starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]]) if len(ids) else np.array([], dtype=int)
+        stops = np.r_[starts[1:], len(ids)].astype(int)
+        self._ranges = dict(zip(ids[starts].tolist(), zip(starts.tolist(), stops.tolist())))
+
+        # Une ligne par question, dans l'ordre des plages
+        grouped = self.frame.groupby('question_id', sort=True)
+        self.questions = grouped[list(RANK_METRICS)].mean()
+        self.questions.insert(0, 'question_categorie', grouped['question_categorie'].first())
+        self.questions.insert(1, 'réponses', grouped.size())
+        self.questions['score'] = grouped['score'].mean()
+
+        # Classements décroissants (valeurs manquantes en dernier)
+        self._rankings = {
+            metric: np.argsort(-self.questions[metric].fillna(-np.inf).to_numpy(), kind='stable')
+            for metric in RANK_METRICS
+        }
+        self._categories = self.questions['question_categorie'].to_numpy(dtype=object)
+
+    def __contains__(self, question_id):
+        return question_id in self._ranges
+
+    def __len__(self):
+        return len(self._ranges)
+
+    def answers(self, question_id, filters=None):
+        """Réponses de tous les modèles à une question (filtres de la barre latérale optionnels)"""
+        start, stop = self._ranges[question_id]
+        rows = self.frame.iloc[start:stop]
+        if filters:
+            mask = (rows['score'] >= filters.get('min_score', 0)).to_numpy(copy=True)
+            for col in ['categorie_model', 'model']:
+                if col in filters:
+                    mask &= rows[col].isin(filters[col]).to_numpy()
+            rows = rows[mask]
+        return rows[[c for c in ANSWER_COLUMNS if c in rows.columns]]
+
+    def pairs(self, question_id, filters=None):
+        """Duels A/B d'une question (un par catégorie de modèle) avec les écarts B - A"""
+        rows = self.answers(question_id, filters)
+        a = rows[rows['model_position'] == 'A'].drop_duplicates('categorie_model').set_index('categorie_model')
+        b = rows[rows['model_position'] == 'B'].drop_duplicates('categorie_model').set_index('categorie_model')
+        a, b = a.align(b, join='inner', axis=0)
+        table = pd.DataFrame({'Modèle A': a['model'], 'Modèle B': b['model']}, index=a.index)
+        for col, label in PAIR_METRICS.items():
+            table[f"{label} A"] = a[col]
+            table[f"{label} B"] = b[col]
+            table[f"Δ {label}"] = b[col] - a[col]
+        return table
+
+    def top(self, metric, n=10, categories=None):
+        """Les `n` questions les plus coûteuses selon `metric`, parmi les types de question retenus"""
+        order = self._rankings[metric]
+        if categories is not None:
+            order = order[np.isin(self._categories[order], list(categories))]
+        return self.questions.iloc[order[:n]]
+
+    def ranked_ids(self, metric, categories=None):
+        """Identifiants des questions, de la plus coûteuse à la moins coûteuse"""
+        return self.top(metric, len(self), categories).index.tolist()
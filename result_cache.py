@@ -0,0 +1,164 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import pandas as pd
+
+import data_pipeline
+
+# Répertoire du cache persistant (monté en volume dans docker-compose.yml)
+CACHE_DIR = os.environ.get('GREENAI_CACHE_DIR', '.cache')
+
+MANIFEST = 'manifest.json'
+
+
+def file_sha256(path):
+    """Hash SHA-256 d'un fichier, lu par blocs"""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def source_key(path):
+    """Clé de cache : hash du contenu du CSV source + version du traitement"""
+    h = hashlib.sha256()
+    h.update(file_sha256(path).encode())
+    h.update(f"v{data_pipeline.PROCESSING_VERSION}".encode())
+    return h.hexdigest()[:32]
+
+
+def read_manifest(entry_dir):
+    """Lit le manifest d'une entrée (None s'il est absent ou illisible)"""
+    try:
+        with open(os.path.join(entry_dir, MANIFEST), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def is_valid(entry_dir, manifest):
+    """Vérifie la version et l'intégrité (hash) de chaque fichier de l'entrée"""
+    if manifest is None or manifest.get('version') != data_pipeline.PROCESSING_VERSION:
+        return False
+    for name, digest in manifest.get('files', {}).items():
+        path = os.path.join(entry_dir, name)
+        if not os.path.isfile(path) or file_sha256(path) != digest:
+            return False
+    return True
+
+
+def evict(source, keep_key=None, cache_dir=None, keep=()):
+    """Supprime les entrées corrompues, d'une autre version ou périmées pour `source`
+
+    `source` est l'identité écrite dans les manifests, comparée telle quelle : chemin absolu
+    d'un fichier source, ou 'catalog:<chemin>' pour un catalogue.
+    `keep` liste des clés à conserver en plus de `keep_key` (version encore servie).
+    """
+    cache_dir = cache_dir or CACHE_DIR
+    if not os.path.isdir(cache_dir):
+        return []
+
+    evicted = []
+    for name in os.listdir(cache_dir):
+        entry_dir = os.path.join(cache_dir, name)
+        # Les répertoires .tmp-* sont des écritures en cours
+        if not os.path.isdir(entry_dir) or name == keep_key or name in keep or name.startswith('.tmp-'):
+            continue
+        manifest = read_manifest(entry_dir)
+        stale = manifest is not None and manifest.get('source') == source
+        if manifest is None or manifest.get('version') != data_pipeline.PROCESSING_VERSION or stale:
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            evicted.append(name)
+    return evicted
+
+
+def _write_entry(entry_dir, source, key, df, aggregates):
+    """Écrit l'entrée dans un répertoire temporaire puis la renomme (écriture atomique)"""
+    cache_dir = os.path.dirname(entry_dir)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix='.tmp-', dir=cache_dir)
+    try:
+        files = {}
+        df.to_parquet(os.path.join(tmp_dir, 'data.parquet'))
+        files['data.parquet'] = file_sha256(os.path.join(tmp_dir, 'data.parquet'))
+        for name, table in aggregates.items():
+            filename = f"agg_{name}.parquet"
+            table.to_parquet(os.path.join(tmp_dir, filename))
+            files[filename] = file_sha256(os.path.join(tmp_dir, filename))
+
+        manifest = {
+            'version': data_pipeline.PROCESSING_VERSION,
+            'source': source,
+            'key': key,
+            'files': files,
+        }
+        with open(os.path.join(tmp_dir, MANIFEST), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        os.replace(tmp_dir, entry_dir)
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+
+def read_aggregates(entry_dir, manifest):
+    """Lit les agrégats (fichiers agg_*.parquet) listés dans le manifest"""
+    aggregates = {}
+    for filename in manifest['files']:
+        if filename.startswith('agg_'):
+            aggregates[filename[len('agg_'):-len('.parquet')]] = pd.read_parquet(os.path.join(entry_dir, filename))
+    return aggregates
+
+
+def _read_entry(entry_dir, manifest):
+    df = pd.read_parquet(os.path.join(entry_dir, 'data.parquet'))
+    return df, read_aggregates(entry_dir, manifest)
+
+
+def load_or_build(source=data_pipeline.DATA_FILE, cache_dir=None):
+    """Retourne (données nettoyées, agrégats) depuis le cache disque, ou les reconstruit"""
+    cache_dir = cache_dir or CACHE_DIR
+    source = os.path.abspath(source)
+    key = source_key(source)
+    entry_dir = os.path.join(cache_dir, key)
+
+    # Nettoyage des entrées obsolètes au démarrage
+    evict(source, keep_key=key, cache_dir=cache_dir)
+
+    manifest = read_manifest(entry_dir)
+    if is_valid(entry_dir, manifest):
+        try:
+            return _read_entry(entry_dir, manifest)
+        except Exception:
+            # Entrée illisible : on l'évince et on reconstruit
+            shutil.rmtree(entry_dir, ignore_errors=True)
+    elif os.path.isdir(entry_dir):
+        shutil.rmtree(entry_dir, ignore_errors=True)
+
+    df, quality = data_pipeline.process_checked(source)
+    aggregates = {**data_pipeline.compute_aggregates(df), **quality}
+    store(source, df, aggregates, cache_dir)
+    return df, aggregates
+
+
+def is_cached(source, cache_dir=None):
+    """Vrai si `source` a une entrée valide pour son contenu actuel"""
+    entry_dir = os.path.join(cache_dir or CACHE_DIR, source_key(source))
+    return is_valid(entry_dir, read_manifest(entry_dir))
+
+
+def store(source, df, aggregates, cache_dir=None):
+    """Enregistre les données traitées ailleurs (ex. ingestion parallèle) pour `source`"""
+    source = os.path.abspath(source)
+    key = source_key(source)
+    try:
+        _write_entry(os.path.join(cache_dir or CACHE_DIR, key), source, key, df, aggregates)
+    except OSError:
+        # Volume en lecture seule ou plein : on sert quand même les données
+        pass
+
@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+
+# Objectifs minimisables (moyenne par requête) et leur libellé
+OBJECTIVES = {
+    'co2 (g)': 'CO₂ (g)',
+    'electricity (wh)': 'Électricité (Wh)',
+    'time (sec)': 'Temps (sec)',
+    'cost (€)': 'Coût (€)',
+}
+
+# Tolérance sur la contrainte de score (moyennes en virgule flottante)
+EPSILON = 1e-9
+
+
+def candidates(table, filters, price_per_1k_tokens=0.0):
+    """Options (type de question, modèle) retenues par les filtres ; coût estimé si non mesuré"""
+    mask = np.ones(len(table), dtype=bool)
+    for col in ['question_categorie', 'categorie_model', 'model']:
+        if col in filters:
+            mask &= table[col].isin(filters[col]).to_numpy()
+    options = table[mask].dropna(subset=['score']).copy()
+    options['cost (€)'] = options['cost (€)'].fillna(options['tokens'] / 1000 * price_per_1k_tokens)
+    return options.reset_index(drop=True)
+
+
+def category_weights(options):
+    """Part de chaque type de question dans le trafic (proportion des réponses du benchmark)"""
+    counts = options.groupby('question_categorie')['n'].sum()
+    return counts / counts.sum()
+
+
+def _pareto(objective, score):
+    """Indices des états non dominés (objectif plus bas, score plus haut)"""
+    order = np.lexsort((-score, objective))
+    best_before = np.maximum.accumulate(np.concatenate([[-np.inf], score[order][:-1]]))
+    return order[score[order] > best_before + EPSILON]
+
+
+def solve(options, objective, min_score, weights=None, max_latency=None, per_category=False):
+    """Affecte un modèle à chaque type de question en minimisant `objective` (moyenne par requête)
+
+    Contraintes : score moyen pondéré >= `min_score` (ou dans chaque type de question si
+    `per_category`) et temps moyen <= `max_latency` dans chaque type de question. Sac à dos à
+    choix multiples résolu exactement par programmation dynamique sur le front de Pareto
+    (objectif, score) : les états dominés ou qui ne peuvent plus atteindre le score sont écartés.
+    """
+    weights = category_weights(options) if weights is None else weights
+    allowed = options
+    if max_latency is not None:
+        allowed = allowed[allowed['time (sec)'] <= max_latency]
+    if per_category:
+        allowed = allowed[allowed['score'] >= min_score - EPSILON]
+
+    groups = {c: allowed[allowed['question_categorie'] == c] for c in weights.index}
+    uncovered = [c for c, g in groups.items() if g.empty]
+    if uncovered:
+        return {'feasible': False, 'uncovered': uncovered}
+
+    # Score maximal encore atteignable avec les types de question restants
+    best_scores = np.array([weights[c] * groups[c]['score'].max() for c in weights.index])
+    remaining = np.concatenate([np.cumsum(best_scores[::-1])[::-1][1:], [0.0]])
+
+    obj = np.zeros(1)
+    score = np.zeros(1)
+    choice = np.empty((1, 0), dtype=np.int64)
+    for i, c in enumerate(weights.index):
+        g = groups[c]
+        w = weights[c]
+        obj = (obj[:, None] + w * g[objective].to_numpy()[None, :]).ravel()
+        score = (score[:, None] + w * g['score'].to_numpy()[None, :]).ravel()
+        choice = np.column_stack([np.repeat(choice, len(g), axis=0), np.tile(g.index.to_numpy(), len(choice))])
+
+        reachable = score + remaining[i] >= min_score - EPSILON
+        keep = np.flatnonzero(reachable)[_pareto(obj[reachable], score[reachable])]
+        obj, score, choice = obj[keep], score[keep], choice[keep]
+
+    if not len(obj):
+        return {'feasible': False, 'uncovered': []}
+
+    # Au dernier type de question, tous les états restants atteignent le score minimum
+    best = np.argmin(obj)
+    columns = ['question_categorie', 'categorie_model', 'model', 'score', 'time (sec)', objective]
+    assignment = options.loc[choice[best], list(dict.fromkeys(columns))]
+    assignment = assignment.set_index('question_categorie')
+    assignment.insert(0, 'part du trafic', weights)
+    return {'feasible': True, 'assignment': assignment, 'objective': obj[best], 'score': score[best]}
+
+
+def single_model_baselines(options, objective, weights=None):
+    """Objectif et score moyens si un seul modèle répond à tous les types de question"""
+    weights = category_weights(options) if weights is None else weights
+    values = list(dict.fromkeys(['score', objective, 'time (sec)']))
+    pivot = options.pivot_table(index='model', columns='question_categorie', values=values)
+    baselines = pd.DataFrame({
+        'score': pivot['score'][weights.index] @ weights,
+        objective: pivot[objective][weights.index] @ weights,
+        'temps max (sec)': pivot['time (sec)'][weights.index].max(axis=1),
+    })
+    # Un modèle qui n'a pas de mesure pour un type de question ne peut pas servir de référence
+    return baselines.dropna().sort_values('score', ascending=False)
@@ -0,0 +1,201 @@
+import json
+import os
+import resource
+import threading
+import time
+import tracemalloc
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+# Modèle de puissance du serveur : watts par cœur pleinement occupé et par Go de mémoire résidente
+CPU_WATTS = float(os.environ.get('GREENAI_CPU_WATTS', 12.0))
+MEMORY_WATTS_PER_GB = float(os.environ.get('GREENAI_MEMORY_WATTS_PER_GB', 0.375))
+
+# Efficacité énergétique du centre de données (1 : pas de surcoût de refroidissement)
+PUE = float(os.environ.get('GREENAI_PUE', 1.0))
+
+# Intensité carbone de l'électricité du serveur (gCO₂eq/kWh, moyenne mondiale par défaut)
+SELF_INTENSITY = float(os.environ.get('GREENAI_SELF_INTENSITY', 475.0))
+
+# Pic d'allocations Python par section (tracemalloc ralentit les allocations : désactivé par défaut)
+TRACE_MEMORY = os.environ.get('GREENAI_SELF_TRACE_MEMORY', '0') == '1'
+
+# Journal JSONL d'une ligne par réexécution, pour comparer deux versions de l'application
+SELF_LOG = os.environ.get('GREENAI_SELF_LOG', '')
+
+STATE_KEY = 'self_footprint'
+
+_STARTED = time.time()
+_log_lock = threading.Lock()
+
+if TRACE_MEMORY:
+    tracemalloc.start()
+
+
+def energy_wh(cpu_seconds, wall_seconds, memory_bytes):
+    """Énergie estimée : CPU consommé et mémoire résidente maintenue pendant la durée"""
+    watt_seconds = cpu_seconds * CPU_WATTS + wall_seconds * memory_bytes / 1e9 * MEMORY_WATTS_PER_GB
+    return watt_seconds * PUE / 3600
+
+
+def co2_g(wh):
+    return wh / 1000 * SELF_INTENSITY
+
+
+def resident_memory():
+    """Mémoire résidente actuelle du processus (octets) ; pic depuis le démarrage hors Linux"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def peak_memory():
+    """Pic de mémoire résidente du processus depuis son démarrage (octets)"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def process_cpu():
+    """Temps CPU du processus depuis son démarrage, processus de calcul terminés compris"""
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+
+def process_footprint():
+    """Empreinte cumulée du serveur (toutes sessions) depuis son démarrage"""
+    cpu = process_cpu()
+    wall = time.time() - _STARTED
+    wh = energy_wh(cpu, wall, resident_memory())
+    return {'cpu (s)': cpu, 'durée (s)': wall, 'wh': wh, 'co2 (g)': co2_g(wh)}
+
+
+class RerunMeter:
+    """Mesure d'une réexécution, section par section
+
+    Le CPU est celui du thread de la session (time.thread_time) : les autres sessions servies
+    en parallèle ne sont pas comptées. Les octets sont ceux des messages envoyés au navigateur
+    entre le début de la mesure et `finish()` ; ils restent à 0 si la version de Streamlit
+    n'expose pas la file d'envoi du contexte (attribut privé).
+    """
+
+    def __init__(self, first_section='Chargement'):
+        self.sections = []
+        self.bytes_sent = 0
+        self._current = None
+        self._counter = None
+        self._hook_messages()
+        self.mark(first_section)
+
+    def _hook_messages(self):
+        ctx = get_script_run_ctx()
+        # File d'envoi privée de Streamlit : absente ou renommée, on renonce à compter les octets
+        send = getattr(ctx, '_enqueue', None)
+        if not callable(send):
+            return
+        # Contexte réutilisé d'une réexécution à l'autre : on redirige vers le compteur courant
+        if not hasattr(send, 'meter_target'):
+            def counted(msg, send=send):
+                meter = counted.meter_target
+                if meter is not None:
+                    meter.bytes_sent += msg.ByteSize()
+                    if meter._current is not None:
+                        meter._current['octets'] += msg.ByteSize()
+                send(msg)
+            try:
+                ctx._enqueue = counted
+            except AttributeError:
+                return
+            send = counted
+        send.meter_target = self
+        self._counter = send
+
+    def mark(self, name):
+        """Clôt la section en cours et en ouvre une nouvelle"""
+        self._close()
+        if TRACE_MEMORY:
+            tracemalloc.reset_peak()
+        self._current = {'section': name, 'octets': 0, '_cpu': time.thread_time(), '_wall': time.perf_counter()}
+
+    def _close(self):
+        section = self._current
+        if section is None:
+            return
+        section['cpu (s)'] = time.thread_time() - section.pop('_cpu')
+        section['durée (s)'] = time.perf_counter() - section.pop('_wall')
+        if TRACE_MEMORY:
+            section['pic python (Mo)'] = tracemalloc.get_traced_memory()[1] / 2**20
+        self.sections.append(section)
+        self._current = None
+
+    def finish(self):
+        """Clôt la réexécution ; retourne son bilan et met à jour le cumul de la session"""
+        self._close()
+        # Plus de compteur actif : les réexécutions de fragments qui suivent ne sont pas comptées
+        if self._counter is not None and self._counter.meter_target is self:
+            self._counter.meter_target = None
+        memory = resident_memory()
+        cpu = sum(s['cpu (s)'] for s in self.sections)
+        wall = sum(s['durée (s)'] for s in self.sections)
+        for section in self.sections:
+            section['wh'] = energy_wh(section['cpu (s)'], section['durée (s)'], memory)
+            section['co2 (mg)'] = co2_g(section['wh']) * 1000
+        wh = energy_wh(cpu, wall, memory)
+        rerun = {
+            'ts': time.time(), 'cpu (s)': cpu, 'durée (s)': wall, 'octets': self.bytes_sent,
+            'rss (Mo)': memory / 2**20, 'pic rss (Mo)': peak_memory() / 2**20,
+            'wh': wh, 'co2 (g)': co2_g(wh), 'sections': self.sections,
+        }
+
+        session = st.session_state.setdefault(STATE_KEY, {'réexécutions': 0, 'cpu (s)': 0.0, 'wh': 0.0,
+                                                         'co2 (g)': 0.0, 'octets': 0})
+        session['réexécutions'] += 1
+        for key in ['cpu (s)', 'wh', 'co2 (g)', 'octets']:
+            session[key] += rerun[key]
+        session['dernière'] = rerun
+
+        if SELF_LOG:
+            with _log_lock, open(SELF_LOG, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(rerun, ensure_ascii=False) + '\n')
+        return rerun
+
+
+def start():
+    """Début d'une réexécution complète"""
+    return RerunMeter()
+
+
+def render_sidebar(meter):
+    """Clôt la mesure et affiche l'empreinte du tableau de bord dans la barre latérale"""
+    rerun = meter.finish()
+    session = st.session_state[STATE_KEY]
+    server = process_footprint()
+
+    st.sidebar.header("🌱 Empreinte du tableau de bord")
+    st.sidebar.caption(
+        f"Cette réexécution : {rerun['cpu (s)']:.2f} s CPU, {rerun['durée (s)']:.2f} s, "
+        f"{rerun['octets'] / 1024:,.0f} ko envoyés, {rerun['wh'] * 1000:.2f} mWh, "
+        f"{rerun['co2 (g)'] * 1000:.2f} mgCO₂"
+    )
+    st.sidebar.caption(
+        f"Cette session ({session['réexécutions']} réexécution(s)) : {session['cpu (s)']:.1f} s CPU, "
+        f"{session['wh'] * 1000:.1f} mWh, {session['co2 (g)'] * 1000:.1f} mgCO₂"
+    )
+    st.sidebar.caption(
+        f"Serveur depuis {server['durée (s)'] / 3600:.1f} h (toutes sessions) : {server['cpu (s)']:.0f} s CPU, "
+        f"{server['wh']:.2f} Wh, {server['co2 (g)']:.2f} gCO₂ - mémoire {rerun['rss (Mo)']:.0f} Mo "
+        f"(pic {rerun['pic rss (Mo)']:.0f} Mo)"
+    )
+    with st.sidebar.expander("Détail par section"):
+        rows = []
+        for section in rerun['sections']:
+            row = {'section': section['section'], 'cpu (s)': round(section['cpu (s)'], 3),
+                   'durée (s)': round(section['durée (s)'], 3), 'ko': round(section['octets'] / 1024, 1),
+                   'mWh': round(section['wh'] * 1000, 3), 'mgCO₂': round(section['co2 (mg)'], 3)}
+            if 'pic python (Mo)' in section:
+                row['pic python (Mo)'] = round(section['pic python (Mo)'], 1)
+            rows.append(row)
+        st.dataframe(rows, hide_index=True, use_container_width=True)
+        st.caption(f"Modèle : {CPU_WATTS:g} W par cœur, {MEMORY_WATTS_PER_GB:g} W/Go, PUE {PUE:g}, "
+                   f"{SELF_INTENSITY:g} gCO₂/kWh.")
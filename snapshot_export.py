@@ -0,0 +1,216 @@
+import argparse
+import html
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime
+
+import plotly.offline
+from streamlit.testing.v1 import AppTest
+
+# Application rendue et répertoire du bundle statique
+APP_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')
+SNAPSHOT_DIR = os.environ.get('GREENAI_SNAPSHOT_DIR', 'snapshot')
+
+# Préréglages de filtres : {"nom": {"model": [...], "min_score": 3, ...}} (clés du dictionnaire `filters`)
+PRESETS_FILE = os.environ.get('GREENAI_SNAPSHOT_PRESETS', 'snapshot_presets.json')
+
+RUN_TIMEOUT = 300
+
+WIDGETS = {'selectbox', 'slider', 'select_slider', 'radio', 'checkbox', 'number_input', 'multiselect',
+           'text_input', 'toggle'}
+
+PAGE_STYLE = """
+body { font-family: sans-serif; margin: 0 auto; max-width: 1400px; padding: 1rem 2rem; color: #262730; }
+.row { display: flex; gap: 1rem; }
+.row > .column { flex: 1; min-width: 0; }
+.metric { padding: 0.5rem 0; }
+.metric .label { font-size: 0.85rem; color: #6b6f76; }
+.metric .value { font-size: 1.8rem; }
+.metric .delta { font-size: 0.85rem; color: #2e7d32; }
+.widget { font-size: 0.85rem; color: #6b6f76; margin: 0.25rem 0; }
+.caption { font-size: 0.8rem; color: #6b6f76; }
+.alert { padding: 0.75rem 1rem; border-radius: 5px; background: #fff3cd; margin: 0.5rem 0; }
+.table { overflow-x: auto; margin: 0.5rem 0; }
+.table table { border-collapse: collapse; font-size: 0.85rem; }
+.table th, .table td { border: 1px solid #e6e6e6; padding: 0.25rem 0.5rem; text-align: right; }
+.tabs button { border: none; background: none; padding: 0.5rem 1rem; cursor: pointer; font-size: 1rem; }
+.tabs button.active { border-bottom: 3px solid #2E8B57; }
+.tab { display: none; }
+.tab.active { display: block; }
+.snapshot-bar { font-size: 0.85rem; background: #f0f2f6; padding: 0.5rem 1rem; border-radius: 5px; }
+"""
+
+TABS_SCRIPT = """
+function showTab(group, index) {
+  document.querySelectorAll('[data-tabs="' + group + '"] > .tabs button').forEach(function (b, i) {
+    b.classList.toggle('active', i === index);
+  });
+  document.querySelectorAll('[data-tabs="' + group + '"] > .tab').forEach(function (t, i) {
+    t.classList.toggle('active', i === index);
+  });
+  window.dispatchEvent(new Event('resize'));
+}
+"""
+
+
+def load_presets(path=None):
+    """Préréglages de filtres à exporter en plus de la vue par défaut"""
+    path = path or PRESETS_FILE
+    if not os.path.isfile(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def run_app(filters=None):
+    """Exécute l'application sans navigateur, dans l'état par défaut ou avec `filters` appliqués"""
+    at = AppTest.from_file(APP_FILE, default_timeout=RUN_TIMEOUT)
+    at.run()
+    if filters:
+        for col, value in filters.items():
+            if col == 'min_score':
+                at.slider(key='filter_min_score').set_value(value)
+            else:
+                at.multiselect(key=f"filter_{col}").set_value(list(value))
+        at.run()
+    if at.exception:
+        raise RuntimeError(f"Erreur de l'application : {at.exception[0].value}")
+    return at
+
+
+class _Renderer:
+    """Transforme l'arbre des éléments Streamlit en HTML statique"""
+
+    def __init__(self):
+        self.n_ids = 0
+
+    def _id(self, prefix):
+        self.n_ids += 1
+        return f"{prefix}-{self.n_ids}"
+
+    def render(self, node):
+        children = getattr(node, 'children', None)
+        if isinstance(children, dict):
+            return ''.join(self.element(child) for child in children.values())
+        return ''
+
+    def element(self, el):
+        t = el.type
+        if t == 'markdown':
+            text = el.value
+            if text.lstrip().startswith('<'):
+                # HTML produit par l'application elle-même (styles, titres)
+                return text
+            if text.startswith('### '):
+                return f"<h3>{html.escape(text[4:])}</h3>"
+            return f"<p>{html.escape(text)}</p>"
+        if t in ('title', 'header', 'subheader'):
+            level = {'title': 1, 'header': 2, 'subheader': 3}[t]
+            return f"<h{level}>{html.escape(el.value)}</h{level}>"
+        if t == 'caption':
+            return f"<p class=\"caption\">{html.escape(el.value)}</p>"
+        if t in ('info', 'warning', 'error', 'success'):
+            return f"<div class=\"alert\">{html.escape(el.value)}</div>"
+        if t == 'metric':
+            delta = f"<div class=\"delta\">{html.escape(el.delta)}</div>" if el.delta else ''
+            return (f"<div class=\"metric\"><div class=\"label\">{html.escape(el.label)}</div>"
+                    f"<div class=\"value\">{html.escape(el.value)}</div>{delta}</div>")
+        if t == 'plotly_chart':
+            chart_id = self._id('chart')
+            return (f"<div id=\"{chart_id}\"></div><script>(function () {{"
+                    f"var fig = {el.proto.spec};"
+                    f"Plotly.newPlot('{chart_id}', fig.data, fig.layout, {{responsive: true}});"
+                    f"}})();</script>")
+        if t == 'dataframe':
+            return f"<div class=\"table\">{el.value.to_html(na_rep='', float_format=lambda v: f'{v:,.3f}')}</div>"
+        if t in WIDGETS:
+            # État des widgets au moment de l'export (pas d'interaction dans l'instantané)
+            return f"<p class=\"widget\">{html.escape(el.label)} <b>{html.escape(str(el.value))}</b></p>"
+        if t == 'tab_container':
+            return self.tabs(el)
+        if t == 'flex_container' and any(c.type == 'column' for c in el.children.values()):
+            return f"<div class=\"row\">{self.render(el)}</div>"
+        if t == 'column':
+            return f"<div class=\"column\">{self.render(el)}</div>"
+        if t == 'expander':
+            return f"<details><summary>{html.escape(el.label)}</summary>{self.render(el)}</details>"
+        return self.render(el)
+
+    def tabs(self, container):
+        group = self._id('tabs')
+        tabs = list(container.children.values())
+        buttons = ''.join(
+            f"<button class=\"{'active' if i == 0 else ''}\" onclick=\"showTab('{group}', {i})\">"
+            f"{html.escape(tab.label)}</button>"
+            for i, tab in enumerate(tabs)
+        )
+        panes = ''.join(
+            f"<div class=\"tab{' active' if i == 0 else ''}\">{self.render(tab)}</div>"
+            for i, tab in enumerate(tabs)
+        )
+        return f"<div data-tabs=\"{group}\"><div class=\"tabs\">{buttons}</div>{panes}</div>"
+
+
+def render_page(at, title, pages):
+    """Page HTML d'un état de l'application, avec les liens vers les autres pages du bundle"""
+    renderer = _Renderer()
+    sidebar = renderer.render(at.sidebar)
+    body = renderer.render(at.main)
+    nav = ' · '.join(f"<a href=\"{html.escape(file)}\">{html.escape(name)}</a>" for name, file in pages)
+    return f"""<!DOCTYPE html>
+<html lang="fr">
+<head>
+<meta charset="utf-8">
+<title>{html.escape(title)} - Green AI Data Story</title>
+<script src="plotly.min.js"></script>
+<style>{PAGE_STYLE}</style>
+<script>{TABS_SCRIPT}</script>
+</head>
+<body>
+<div class="snapshot-bar">Instantané statique « {html.escape(title)} » du {datetime.now():%d/%m/%Y à %H:%M} · {nav}
+<details><summary>Filtres</summary>{sidebar}</details></div>
+{body}
+</body>
+</html>
+"""
+
+
+def export(out_dir=None, presets=None):
+    """Écrit le bundle statique : vue par défaut (index.html) et une page par préréglage"""
+    out_dir = out_dir or SNAPSHOT_DIR
+    presets = load_presets() if presets is None else presets
+    states = [('Vue par défaut', 'index.html', None)]
+    states += [(name, f"preset-{i}.html", filters) for i, (name, filters) in enumerate(presets.items(), start=1)]
+    pages = [(name, file) for name, file, _ in states]
+
+    parent = os.path.dirname(os.path.abspath(out_dir))
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix='.tmp-snapshot-', dir=parent)
+    try:
+        # mkdtemp crée un répertoire privé : le bundle doit rester lisible par le serveur web
+        os.chmod(tmp_dir, 0o755)
+        # plotly.js une seule fois pour toutes les pages du bundle
+        with open(os.path.join(tmp_dir, 'plotly.min.js'), 'w', encoding='utf-8') as f:
+            f.write(plotly.offline.get_plotlyjs())
+        for name, file, filters in states:
+            page = render_page(run_app(filters), name, pages)
+            with open(os.path.join(tmp_dir, file), 'w', encoding='utf-8') as f:
+                f.write(page)
+        # Remplacement d'un bloc : le serveur web ne voit jamais un bundle incomplet
+        shutil.rmtree(out_dir, ignore_errors=True)
+        os.replace(tmp_dir, out_dir)
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    return [os.path.join(out_dir, file) for _, file in pages]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Exporte le tableau de bord en HTML statique")
+    parser.add_argument('--out', default=SNAPSHOT_DIR, help="répertoire du bundle")
+    parser.add_argument('--presets', default=PRESETS_FILE, help="fichier JSON des préréglages de filtres")
+    args = parser.parse_args()
+    for path in export(args.out, load_presets(args.presets)):
+        print(path)
@@ -0,0 +1,285 @@
+import json
+import math
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+# Journal JSONL des requêtes LLM, une requête par ligne :
+# {"ts": 1760000000.0, "model": "llama", "categorie_model": "small", "question_categorie": "easy factual",
+#  "tokens": 250, "time": 1.2, "electricity": 0.9, "co2": 0.5, "score": 4}
+REQUEST_LOG = os.environ.get('GREENAI_REQUEST_LOG', 'request_log.jsonl')
+
+WINDOW_SECONDS = int(os.environ.get('GREENAI_STREAM_WINDOW', 300))
+BUCKET_SECONDS = int(os.environ.get('GREENAI_STREAM_BUCKET', 10))
+HALF_LIFE_SECONDS = float(os.environ.get('GREENAI_STREAM_HALF_LIFE', 60))
+
+# Période de rafraîchissement de l'onglet de suivi en direct
+LIVE_REFRESH_SECONDS = float(os.environ.get('GREENAI_LIVE_REFRESH', 5))
+
+STREAM_METRICS = ['tokens', 'time (sec)', 'electricity (wh)', 'co2 (g)', 'score']
+STREAM_DIMENSIONS = ['model', 'categorie_model', 'question_categorie']
+
+# Noms courts acceptés dans le journal
+ALIASES = {
+    'token': 'tokens',
+    'time': 'time (sec)',
+    'electricity': 'electricity (wh)',
+    'co2': 'co2 (g)',
+}
+
+# Lecture bornée à chaque passage (le reste est lu au passage suivant)
+MAX_READ_BYTES = 4 << 20
+MAX_LINE_BYTES = 1 << 20
+
+# Horodatages acceptés (secondes) : au-delà, les numéros de seau débordent des entiers 64 bits
+MAX_TS = 1e12
+
+
+def parse_record(line):
+    """Décode une ligne du journal ; retourne None si elle est invalide"""
+    try:
+        raw = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(raw, dict) or not raw.get('model'):
+        return None
+
+    record = {ALIASES.get(k, k): v for k, v in raw.items()}
+    for col in STREAM_METRICS:
+        value = record.get(col)
+        if isinstance(value, str):
+            value = value.replace(',', '.')
+        try:
+            record[col] = float(value)
+        except (TypeError, ValueError):
+            record[col] = math.nan
+
+    ts = record.get('ts')
+    try:
+        record['ts'] = float(ts)
+    except (TypeError, ValueError):
+        try:
+            record['ts'] = pd.Timestamp(ts).timestamp()
+        except (TypeError, ValueError):
+            record['ts'] = time.time()
+    # NaN et Infinity passent float() : ils arrêteraient le fil d'ingestion au calcul du seau
+    if not math.isfinite(record['ts']) or abs(record['ts']) >= MAX_TS:
+        return None
+    return record
+
+
+def append_record(record, path=None):
+    """Ajoute une requête au journal (utilisé par les bancs de test qui produisent les mesures)"""
+    record = {'ts': time.time(), **record}
+    with open(path or REQUEST_LOG, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+
+class LogTailer:
+    """Lit les lignes ajoutées à un fichier depuis le dernier passage (gère troncature et rotation)"""
+
+    def __init__(self, path):
+        self.path = path
+        self._offset = 0
+        self._inode = None
+        self._buffer = b''
+
+    def read_new(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return []
+
+        if stat.st_ino != self._inode or stat.st_size < self._offset:
+            # Nouveau fichier ou fichier tronqué : on repart du début
+            self._inode = stat.st_ino
+            self._offset = 0
+            self._buffer = b''
+        if stat.st_size == self._offset:
+            return []
+
+        with open(self.path, 'rb') as f:
+            f.seek(self._offset)
+            chunk = f.read(MAX_READ_BYTES)
+        self._offset += len(chunk)
+
+        lines = (self._buffer + chunk).split(b'\n')
+        # La dernière ligne peut être incomplète : elle attend le passage suivant
+        self._buffer = lines.pop()
+        if len(self._buffer) > MAX_LINE_BYTES:
+            self._buffer = b''
+        return [line.decode('utf-8', 'replace') for line in lines if line.strip()]
+
+    @property
+    def pending(self):
+        """Vrai s'il reste des octets à lire (lecture bornée)"""
+        try:
+            return os.stat(self.path).st_size > self._offset
+        except FileNotFoundError:
+            return False
+
+
+class _RollingStat:
+    """Agrégats glissants d'une clé : fenêtre en seaux de temps + moyennes à décroissance exponentielle"""
+
+    __slots__ = ('bucket_ids', 'hits', 'sums', 'counts', 'ewm_sum', 'ewm_weight', 'last_ts', 'total', 'seq')
+
+    def __init__(self, n_buckets):
+        n_metrics = len(STREAM_METRICS)
+        self.bucket_ids = np.full(n_buckets, -1, dtype=np.int64)
+        self.hits = np.zeros(n_buckets, dtype=np.int64)
+        self.sums = np.zeros((n_buckets, n_metrics))
+        self.counts = np.zeros((n_buckets, n_metrics))
+        self.ewm_sum = np.zeros(n_metrics)
+        self.ewm_weight = np.zeros(n_metrics)
+        self.last_ts = None
+        self.total = 0
+        self.seq = 0
+
+    def add(self, ts, values, bucket_seconds, half_life):
+        # Fenêtre glissante : anneau de seaux, un seau recyclé quand son intervalle est dépassé
+        bucket = int(ts // bucket_seconds)
+        slot = bucket % len(self.bucket_ids)
+        if self.bucket_ids[slot] != bucket:
+            if self.bucket_ids[slot] > bucket:
+                bucket = None  # plus ancien que la fenêtre : ignoré pour la fenêtre
+            else:
+                self.bucket_ids[slot] = bucket
+                self.hits[slot] = 0
+                self.sums[slot] = 0
+                self.counts[slot] = 0
+        present = ~np.isnan(values)
+        if bucket is not None:
+            self.hits[slot] += 1
+            self.sums[slot, present] += values[present]
+            self.counts[slot, present] += 1
+
+        # Moyenne à décroissance exponentielle (demi-vie en secondes)
+        if self.last_ts is None or ts >= self.last_ts:
+            decay = 0.5 ** ((ts - self.last_ts) / half_life) if self.last_ts is not None else 1.0
+            self.ewm_sum *= decay
+            self.ewm_weight *= decay
+            weight = 1.0
+            self.last_ts = ts
+        else:
+            # Événement en retard : pondéré par son âge
+            weight = 0.5 ** ((self.last_ts - ts) / half_life)
+        self.ewm_sum[present] += weight * values[present]
+        self.ewm_weight[present] += weight
+        self.total += 1
+
+    def window(self, now_bucket):
+        live = self.bucket_ids > now_bucket - len(self.bucket_ids)
+        return int(self.hits[live].sum()), self.sums[live].sum(axis=0), self.counts[live].sum(axis=0)
+
+    def expired_between(self, since_bucket, now_bucket):
+        """Vrai si un seau non vide est sorti de la fenêtre entre deux instants"""
+        n = len(self.bucket_ids)
+        return bool(((self.bucket_ids > since_bucket - n) & (self.bucket_ids <= now_bucket - n)).any())
+
+
+class RollingAggregates:
+    """Agrégats glissants par modèle et par catégorie, mis à jour incrémentalement"""
+
+    def __init__(self, window_seconds=WINDOW_SECONDS, bucket_seconds=BUCKET_SECONDS,
+                 half_life=HALF_LIFE_SECONDS):
+        self.bucket_seconds = bucket_seconds
+        self.n_buckets = max(1, window_seconds // bucket_seconds)
+        self.half_life = half_life
+        self.seq = 0
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def update(self, record):
+        values = np.array([record[m] for m in STREAM_METRICS], dtype=float)
+        with self._lock:
+            self.seq += 1
+            for dim in STREAM_DIMENSIONS:
+                key = record.get(dim)
+                if key is None:
+                    continue
+                key = str(key)
+                stat = self._stats.get((dim, key))
+                if stat is None:
+                    stat = self._stats[(dim, key)] = _RollingStat(self.n_buckets)
+                stat.add(record['ts'], values, self.bucket_seconds, self.half_life)
+                stat.seq = self.seq
+
+    def changes(self, dimension, since_seq=0, since_ts=None, now=None):
+        """Lignes des clés modifiées depuis `since_seq` ou dont la fenêtre a expiré depuis `since_ts`"""
+        now = time.time() if now is None else now
+        now_bucket = int(now // self.bucket_seconds)
+        since_bucket = int(since_ts // self.bucket_seconds) if since_ts is not None else None
+
+        rows = {}
+        with self._lock:
+            for (dim, key), stat in self._stats.items():
+                if dim != dimension:
+                    continue
+                changed = stat.seq > since_seq
+                if not changed and since_bucket is not None:
+                    changed = stat.expired_between(since_bucket, now_bucket)
+                if not changed:
+                    continue
+                hits, sums, counts = stat.window(now_bucket)
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    window_means = np.where(counts > 0, sums / counts, np.nan)
+                    ewm = np.where(stat.ewm_weight > 0, stat.ewm_sum / stat.ewm_weight, np.nan)
+                row = {'requêtes (fenêtre)': hits, 'requêtes (total)': stat.total}
+                row.update({f"{m} (fenêtre)": v for m, v in zip(STREAM_METRICS, window_means)})
+                row.update({f"{m} (ewm)": v for m, v in zip(STREAM_METRICS, ewm)})
+                row['co2 (g) (somme fenêtre)'] = sums[STREAM_METRICS.index('co2 (g)')]
+                rows[key] = row
+        table = pd.DataFrame.from_dict(rows, orient='index')
+        table.index.name = dimension
+        return table
+
+
+class StreamIngestor:
+    """Suit le journal des requêtes en arrière-plan et alimente les agrégats glissants"""
+
+    def __init__(self, path=None, poll_seconds=1.0, aggregates=None):
+        self.path = path or REQUEST_LOG
+        self.poll_seconds = poll_seconds
+        self.tailer = LogTailer(self.path)
+        self.aggregates = aggregates or RollingAggregates()
+        self.ingested = 0
+        self.rejected = 0
+        self.last_event_ts = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    def poll_once(self):
+        """Ingère les lignes disponibles ; retourne le nombre de lignes lues"""
+        lines = self.tailer.read_new()
+        for line in lines:
+            record = parse_record(line)
+            if record is None:
+                self.rejected += 1
+                continue
+            self.aggregates.update(record)
+            self.ingested += 1
+            self.last_event_ts = record['ts']
+        return len(lines)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.poll_once()
+            except OSError:
+                pass
+            if not self.tailer.pending:
+                self._stop.wait(self.poll_seconds)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='greenai-stream', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
@@ -0,0 +1,26 @@
+import pandas as pd
+
+import data_pipeline
+
+
+def test_measures_are_float64_with_or_without_missing_values(tmp_path):
+    raw = pd.read_csv(data_pipeline.DATA_FILE)
+    complete, holed = tmp_path / 'complet.csv', tmp_path / 'lacunaire.csv'
+    raw.head(20).to_csv(complete, index=False)
+    raw = raw.iloc[20:40].copy()
+    raw.loc[raw.index[0], 'time A (sec)'] = None
+    raw.to_csv(holed, index=False)
+
+    frames = [data_pipeline.process_checked(str(path))[0] for path in (complete, holed)]
+    for df in frames:
+        assert (df[data_pipeline.NUMERIC_COLUMNS].dtypes == 'float64').all()
+    assert frames[1]['time (sec)'].isna().sum() == 1
+
+
+def test_score_box_uses_tukey_whiskers_and_outliers():
+    df = pd.DataFrame({'categorie_model': ['small'] * 10, 'score': [0, 3, 4, 4, 4, 5, 5, 5, 5, 5]})
+    box = data_pipeline.score_box(df, 'categorie_model').loc['small']
+    # q1 = 4, q3 = 5 : clôtures à 2.5 et 6.5, la moustache basse s'arrête au score 3
+    assert (box['moustache basse'], box['q1'], box['q3'], box['moustache haute']) == (3, 4, 5, 5)
+    outliers = data_pipeline.score_outliers(df, 'categorie_model')
+    assert outliers.to_dict('records') == [{'categorie_model': 'small', 'score': 0, 'réponses': 1}]
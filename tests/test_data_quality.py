@@ -0,0 +1,79 @@
+import pandas as pd
+import pytest
+
+import data_pipeline
+import data_quality
+
+ROWS = 10
+
+
+def _write(path, edit=None):
+    # Lu en texte : les valeurs modifiées sont écrites telles quelles, comme dans un CSV saisi à la main
+    raw = pd.read_csv(data_pipeline.DATA_FILE, dtype=str).head(ROWS)
+    if edit is not None:
+        raw = edit(raw)
+    raw.to_csv(path, index=False)
+    return str(path)
+
+
+def _defects(raw):
+    raw.loc[0, 'score A'] = '7'
+    raw.loc[1, 'time B (sec)'] = 'abc'
+    raw.loc[3, 'co2 A (g)'] = None
+    raw[['cost A (€)', 'cost B (€)']] = None
+    # Question 3 répétée, avec en plus un score hors plage pour le modèle A
+    duplicate = raw.iloc[[2]].assign(**{'score A': '9'})
+    return pd.concat([raw, duplicate], ignore_index=True)
+
+
+@pytest.fixture
+def checked(tmp_path):
+    return data_pipeline.process_checked(_write(tmp_path / 'campagne.csv', _defects))
+
+
+def _reasons(quarantine):
+    return {(row.question_id, row.model_position): row.motif for row in quarantine.itertuples()}
+
+
+def test_valid_file_has_no_error(tmp_path):
+    df, quality = data_pipeline.process_checked(_write(tmp_path / 'campagne.csv'))
+    assert len(df) == 2 * ROWS
+    assert quality['quarantine'].empty
+    assert not (quality['quality_issues']['gravité'] == data_quality.ERROR).any()
+
+
+def test_errors_send_rows_to_quarantine(checked):
+    df, quality = checked
+    assert _reasons(quality['quarantine']) == {
+        (1, 'A'): 'hors plage',
+        (2, 'B'): 'valeur illisible',
+        (3, 'A'): 'doublon, hors plage',
+        (3, 'B'): 'doublon',
+    }
+    # Les lignes en quarantaine sont retirées, toutes les autres sont gardées
+    assert df.index.intersection(quality['quarantine'].index).empty
+    assert len(df) + len(quality['quarantine']) == 2 * (ROWS + 1)
+
+
+def test_first_occurrence_of_a_duplicate_is_kept(checked):
+    df, _ = checked
+    kept = df[df['question_id'] == 3]
+    assert sorted(kept['model_position']) == ['A', 'B']
+    assert (kept['score'] <= 5).all()
+
+
+def test_warnings_keep_rows(checked):
+    df, quality = checked
+    issues = quality['quality_issues']
+    missing = issues[issues['contrôle'] == 'valeur manquante']
+    assert missing[['colonne', 'gravité']].values.tolist() == [['co2 (g)', data_quality.WARNING]]
+    assert missing['ligne'].iloc[0] in df.index
+
+
+def test_empty_column_is_one_column_issue(checked):
+    _, quality = checked
+    issues = quality['quality_issues']
+    empty = issues[issues['contrôle'] == 'colonne vide']
+    assert empty[['ligne', 'colonne', 'gravité', 'lignes']].values.tolist() == [
+        [-1, 'cost (€)', data_quality.WARNING, 2 * (ROWS + 1)]
+    ]
@@ -0,0 +1,41 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import data_pipeline
+import dataset_catalog
+import facet_index
+import query_backend
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    pd.read_csv(data_pipeline.DATA_FILE).to_csv(tmp_path / 'campagne.csv', index=False)
+    catalog_file = tmp_path / 'catalog.json'
+    catalog_file.write_text(json.dumps({'sources': ['campagne.csv']}), encoding='utf-8')
+    return dataset_catalog.open_catalog(str(catalog_file), cache_dir=str(tmp_path / 'cache'))
+
+
+def test_cube_counts_match_rows(catalog):
+    backend = query_backend.PandasBackend(catalog)
+    facets = facet_index.FacetIndex(backend)
+    rows = backend.rows({})
+    assert facets.total == len(rows)
+
+    model = facets.options['model'][0]
+    counts, selected = facets.counts({'model': [model]}, min_score=4)
+    assert selected == ((rows['model'] == model) & (rows['score'] >= 4)).sum()
+    assert counts['categorie_model'] == {
+        c: ((rows['categorie_model'] == c) & (rows['model'] == model) & (rows['score'] >= 4)).sum()
+        for c in facets.options['categorie_model']
+    }
+
+
+@pytest.mark.skipif(query_backend.duckdb is None, reason='duckdb absent')
+def test_backends_build_the_same_cube(catalog):
+    pandas_facets = facet_index.FacetIndex(query_backend.PandasBackend(catalog))
+    duckdb_facets = facet_index.FacetIndex(query_backend.DuckDBBackend(catalog))
+    assert pandas_facets.options == duckdb_facets.options
+    assert np.array_equal(pandas_facets.cube, duckdb_facets.cube)
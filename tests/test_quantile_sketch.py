@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+
+import quantile_sketch
+
+
+def _frame(n=20_000, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'question_categorie': rng.choice(['code', 'maths', 'texte'], n),
+        'categorie_model': rng.choice(['petit', 'grand'], n),
+        'model': rng.choice(['a', 'b', 'c'], n),
+        'score_bucket': rng.integers(0, 6, n).astype(float),
+    })
+    for metric in quantile_sketch.SKETCH_METRICS:
+        df[metric] = rng.lognormal(0, 2, n)
+    return df
+
+
+def _chunk_sketches(df, parts=4):
+    return [quantile_sketch.sketch_table(df.iloc[idx]) for idx in np.array_split(np.arange(len(df)), parts)]
+
+
+def test_merged_chunks_equal_full_sketch():
+    df = _frame()
+    merged = quantile_sketch.merge(_chunk_sketches(df))
+    full = quantile_sketch.merge([quantile_sketch.sketch_table(df)])
+    pd.testing.assert_frame_equal(merged, full)
+
+
+def test_merged_quantiles_within_relative_accuracy():
+    df = _frame()
+    index = quantile_sketch.QuantileIndex(quantile_sketch.merge(_chunk_sketches(df)))
+    qs = (0.5, 0.95, 0.99)
+    for metric in quantile_sketch.SKETCH_METRICS:
+        estimates = index.quantiles({'min_score': 0}, metric, qs=qs)
+        for model, row in estimates.iterrows():
+            values = np.sort(df.loc[df['model'] == model, metric].to_numpy())
+            assert row['n'] == len(values)
+            for q in qs:
+                # Même rang que QuantileIndex.quantiles : q x (n - 1)
+                exact = values[int(np.floor(q * (len(values) - 1)))]
+                assert abs(row[f"p{q * 100:g}"] - exact) <= quantile_sketch.RELATIVE_ACCURACY * exact
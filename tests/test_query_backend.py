@@ -0,0 +1,42 @@
+import json
+
+import pandas as pd
+import pytest
+
+import data_pipeline
+import dataset_catalog
+import query_backend
+
+pytestmark = pytest.mark.skipif(query_backend.duckdb is None, reason='duckdb absent')
+
+
+def _write_sources(tmp_path):
+    raw = pd.read_csv(data_pipeline.DATA_FILE)
+    # Mêmes partitions dans les deux fichiers : temps entiers dans le premier, une durée décimale
+    # dans le second
+    raw.iloc[::2].to_csv(tmp_path / 'a.csv', index=False)
+    second = raw.iloc[1::2].astype({'time A (sec)': float})
+    second.loc[second.index[0], 'time A (sec)'] = 2.75
+    second.to_csv(tmp_path / 'b.csv', index=False)
+
+
+def _open(tmp_path, sources):
+    catalog_file = tmp_path / 'catalog.json'
+    catalog_file.write_text(json.dumps({'sources': sources}), encoding='utf-8')
+    return dataset_catalog.open_catalog(str(catalog_file), cache_dir=str(tmp_path / 'cache'))
+
+
+@pytest.mark.parametrize('sequential', [False, True])
+def test_backends_agree_across_files_with_different_dtypes(tmp_path, sequential):
+    _write_sources(tmp_path)
+    if sequential:
+        # a.csv en cache d'abord : b.csv est ensuite traité seul, sans ingestion parallèle
+        _open(tmp_path, ['a.csv'])
+    catalog = _open(tmp_path, ['a.csv', 'b.csv'])
+
+    pandas_backend = query_backend.PandasBackend(catalog)
+    duckdb_backend = query_backend.DuckDBBackend(catalog)
+    assert 2.75 in duckdb_backend.rows({}, columns=['time (sec)'])['time (sec)'].tolist()
+    for by in (None, 'model'):
+        pd.testing.assert_frame_equal(pandas_backend.group_stats({}, by), duckdb_backend.group_stats({}, by),
+                                      check_dtype=False, check_index_type=False)
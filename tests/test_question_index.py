@@ -0,0 +1,34 @@
+import json
+
+import pandas as pd
+
+import data_pipeline
+import dataset_catalog
+import query_backend
+import question_index
+
+
+def _index(tmp_path):
+    pd.read_csv(data_pipeline.DATA_FILE).to_csv(tmp_path / 'campagne.csv', index=False)
+    catalog_file = tmp_path / 'catalog.json'
+    catalog_file.write_text(json.dumps({'sources': ['campagne.csv']}), encoding='utf-8')
+    catalog = dataset_catalog.open_catalog(str(catalog_file), cache_dir=str(tmp_path / 'cache'))
+    backend = query_backend.PandasBackend(catalog)
+    return question_index.QuestionIndex(backend), backend.rows({})
+
+
+def test_answers_apply_every_sidebar_filter(tmp_path):
+    index, rows = _index(tmp_path)
+    # Une question avec des réponses de part et d'autre du score minimum
+    scores = rows.groupby('question_id')['score']
+    question = ((scores.min() < 4) & (scores.max() >= 4)).idxmax()
+    models = sorted(rows.loc[rows['question_id'] == question, 'model'].unique())
+    filters = {'model': models, 'min_score': 4}
+
+    answers = index.answers(question, filters)
+    expected = rows[(rows['question_id'] == question) & (rows['score'] >= 4) & rows['model'].isin(models)]
+    assert len(answers) == len(expected) > 0
+    assert (answers['score'] >= 4).all()
+    # Un duel dont une réponse est filtrée disparaît
+    pairs = index.pairs(question, filters)
+    assert (pairs[['Score A', 'Score B']] >= 4).all().all()
@@ -0,0 +1,41 @@
+import json
+import os
+
+import pandas as pd
+
+import data_pipeline
+import dataset_catalog
+
+
+def _write_source(path, rows):
+    pd.read_csv(data_pipeline.DATA_FILE).head(rows).to_csv(path, index=False)
+
+
+def test_source_edit_leaves_one_catalog_entry(tmp_path):
+    source = tmp_path / 'campagne.csv'
+    catalog_file = tmp_path / 'catalog.json'
+    cache_dir = tmp_path / 'cache'
+    catalog_file.write_text(json.dumps({'sources': ['campagne.csv']}), encoding='utf-8')
+
+    for rows in (20, 30, 40):
+        _write_source(source, rows)
+        catalog = dataset_catalog.open_catalog(str(catalog_file), cache_dir=str(cache_dir))
+        assert catalog.num_rows > 0
+
+    entries = [name for name in os.listdir(cache_dir) if name.startswith('catalog-')]
+    assert entries == [catalog.key]
+
+
+def test_keep_protects_a_served_version(tmp_path):
+    source = tmp_path / 'campagne.csv'
+    catalog_file = tmp_path / 'catalog.json'
+    cache_dir = tmp_path / 'cache'
+    catalog_file.write_text(json.dumps({'sources': ['campagne.csv']}), encoding='utf-8')
+
+    _write_source(source, 20)
+    served = dataset_catalog.open_catalog(str(catalog_file), cache_dir=str(cache_dir))
+    _write_source(source, 30)
+    latest = dataset_catalog.open_catalog(str(catalog_file), cache_dir=str(cache_dir), keep=(served.key,))
+
+    entries = sorted(name for name in os.listdir(cache_dir) if name.startswith('catalog-'))
+    assert entries == sorted([served.key, latest.key])
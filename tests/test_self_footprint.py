@@ -0,0 +1,36 @@
+import types
+
+import self_footprint
+
+
+class _Message:
+    def ByteSize(self):
+        return 10
+
+
+def _meter(monkeypatch, ctx):
+    monkeypatch.setattr(self_footprint, 'get_script_run_ctx', lambda: ctx)
+    return self_footprint.RerunMeter()
+
+
+def test_bytes_counted_only_while_meter_is_active(monkeypatch):
+    sent = []
+    ctx = types.SimpleNamespace(_enqueue=sent.append)
+
+    meter = _meter(monkeypatch, ctx)
+    ctx._enqueue(_Message())
+    meter.finish()
+    # Réexécution d'un fragment après la fin de la mesure : pas comptée
+    ctx._enqueue(_Message())
+    assert meter.bytes_sent == 10
+
+    hook = ctx._enqueue
+    following = _meter(monkeypatch, ctx)
+    ctx._enqueue(_Message())
+    assert ctx._enqueue is hook
+    assert (meter.bytes_sent, following.bytes_sent, len(sent)) == (10, 10, 3)
+
+
+def test_missing_private_queue_disables_counting(monkeypatch):
+    meter = _meter(monkeypatch, types.SimpleNamespace())
+    assert meter.finish()['octets'] == 0
@@ -0,0 +1,22 @@
+import json
+
+import stream_ingest
+
+
+def test_non_finite_timestamps_are_rejected():
+    for ts in ['NaN', 'Infinity', '-Infinity', '1e300']:
+        assert stream_ingest.parse_record(f'{{"ts": {ts}, "model": "llama", "co2": 0.5}}') is None
+    assert stream_ingest.parse_record(json.dumps({'ts': 'nan', 'model': 'llama'})) is None
+
+
+def test_bad_timestamp_is_counted_and_ingestion_continues(tmp_path):
+    log = tmp_path / 'requests.jsonl'
+    log.write_text(
+        '{"ts": NaN, "model": "llama", "co2": 0.5}\n'
+        '{"ts": Infinity, "model": "llama", "co2": 0.5}\n'
+        '{"ts": 1760000000, "model": "llama", "co2": 0.5}\n',
+        encoding='utf-8'
+    )
+    ingestor = stream_ingest.StreamIngestor(str(log))
+    ingestor.poll_once()
+    assert (ingestor.ingested, ingestor.rejected) == (1, 2)
@@ -0,0 +1,77 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import data_pipeline
+import dataset_catalog
+import query_backend
+import token_regression
+
+
+def test_moments_give_least_squares_fit():
+    rng = np.random.default_rng(0)
+    x = rng.uniform(1, 500, 400)
+    df = pd.DataFrame({'model': rng.choice(['a', 'b'], 400), 'tokens': x, 'y': 0.3 + 0.02 * x + rng.normal(0, 1, 400)})
+    df.loc[::17, 'y'] = np.nan
+    stats = token_regression.moments(df, 'model', 'tokens', ['y']).set_index('model')
+    for model, group in df.dropna().groupby('model'):
+        s = stats.loc[model]
+        slope, intercept = np.polyfit(group['tokens'], group['y'], 1)
+        rss = ((group['y'] - intercept - slope * group['tokens']) ** 2).sum()
+        assert s['n'] == len(group)
+        assert s['sxy'] / s['sxx'] == pytest.approx(slope)
+        assert s['syy'] - s['sxy'] ** 2 / s['sxx'] == pytest.approx(rss)
+
+
+# Quantiles de Student de référence (tables usuelles)
+STUDENT = {
+    0.975: {1: 12.7062, 2: 4.3027, 3: 3.1824, 4: 2.7764, 5: 2.5706, 10: 2.2281, 30: 2.0423},
+    0.995: {1: 63.6567, 2: 9.9248, 3: 5.8409, 4: 4.6041, 5: 4.0321, 10: 3.1693, 30: 2.7500},
+}
+
+
+def test_t_quantile_within_one_percent_from_one_degree_of_freedom():
+    for p, table in STUDENT.items():
+        for dof, expected in table.items():
+            assert float(token_regression.t_quantile(p, dof)) == pytest.approx(expected, rel=0.01)
+
+
+class _FrameBackend:
+    def __init__(self, df):
+        self.df = df
+
+    def regression_moments(self, filters, by, x, ys, log=False):
+        return token_regression.moments(self.df, by, x, ys, log)
+
+
+def test_confidence_band_of_a_three_point_fit():
+    # Trois réponses : un seul degré de liberté, la borne suit le quantile exact 12.71
+    df = pd.DataFrame({'model': ['a'] * 3, 'tokens': [10.0, 20.0, 30.0],
+                       'electricity (wh)': [1.0, 3.0, 2.0], 'co2 (g)': [1.0, 2.0, 3.5], 'time (sec)': [2.0, 1.0, 4.0]})
+    regression = token_regression.TokenRegression(_FrameBackend(df))
+    fit = regression.predict('linear', 'electricity (wh)', ['a'], [20.0]).iloc[0]
+
+    slope, intercept = np.polyfit(df['tokens'], df['electricity (wh)'], 1)
+    s2 = ((df['electricity (wh)'] - intercept - slope * df['tokens']) ** 2).sum() / 1
+    # Au point moyen des tokens, l'écart-type de la moyenne ajustée vaut sqrt(s2 / n)
+    assert fit['ajusté'] == pytest.approx(intercept + slope * 20)
+    assert fit['borne haute'] - fit['ajusté'] == pytest.approx(12.706205 * np.sqrt(s2 / 3))
+
+
+@pytest.mark.skipif(query_backend.duckdb is None, reason='duckdb absent')
+def test_backends_agree_on_moments(tmp_path):
+    source = tmp_path / 'campagne.csv'
+    pd.read_csv(data_pipeline.DATA_FILE).to_csv(source, index=False)
+    catalog_file = tmp_path / 'catalog.json'
+    catalog_file.write_text(json.dumps({'sources': ['campagne.csv']}), encoding='utf-8')
+    catalog = dataset_catalog.open_catalog(str(catalog_file), cache_dir=str(tmp_path / 'cache'))
+
+    for log in (False, True):
+        frames = [
+            backend.regression_moments({}, 'model', 'tokens', list(token_regression.TARGETS), log)
+            .set_index(['target', 'model']).sort_index()
+            for backend in (query_backend.PandasBackend(catalog), query_backend.DuckDBBackend(catalog))
+        ]
+        pd.testing.assert_frame_equal(frames[0], frames[1], check_dtype=False, check_like=True, rtol=1e-9)
@@ -0,0 +1,182 @@
+import numpy as np
+import pandas as pd
+
+# Grandeurs modélisées en fonction du nombre de tokens de la réponse
+TARGETS = {
+    'electricity (wh)': 'Électricité (Wh)',
+    'co2 (g)': 'CO₂ (g)',
+    'time (sec)': 'Temps (sec)',
+}
+
+# Formes de modèle : linéaire, ou loi de puissance ajustée en log-log
+FORMS = {
+    'linear': 'Linéaire : y = a + b·tokens',
+    'power': 'Puissance : y = a·tokens^b',
+}
+
+# Niveau des bandes de confiance et des intervalles de prédiction
+CONFIDENCE = 0.95
+
+CURVE_POINTS = 60
+
+
+# Quantiles exacts de la loi de Student pour 1 à 4 degrés de liberté, où le développement de
+# Cornish-Fisher sous-estime les bornes de plus de 1 % (de 24 % à 1 degré pour p = 0.975)
+SMALL_DOF_QUANTILES = {
+    0.9: [3.077684, 1.885618, 1.637744, 1.533206],
+    0.95: [6.313752, 2.919986, 2.353363, 2.131847],
+    0.975: [12.706205, 4.302653, 3.182446, 2.776445],
+    0.995: [63.656741, 9.924843, 5.840909, 4.604095],
+}
+
+
+def t_quantile(p, dof):
+    """Quantile de la loi de Student (table exacte jusqu'à 4 degrés de liberté, Cornish-Fisher au-delà : erreur < 1 %)"""
+    dof = np.asarray(dof, dtype=float)
+    small = np.asarray(SMALL_DOF_QUANTILES[p])
+    exact = small[np.clip(np.nan_to_num(dof).astype(int), 1, len(small)) - 1]
+    # Quantiles de la loi normale aux niveaux usuels
+    z = {0.9: 1.2815515655, 0.95: 1.6448536270, 0.975: 1.9599639845, 0.995: 2.5758293035}[p]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = (z + (z ** 3 + z) / (4 * dof)
+             + (5 * z ** 5 + 16 * z ** 3 + 3 * z) / (96 * dof ** 2)
+             + (3 * z ** 7 + 19 * z ** 5 + 17 * z ** 3 - 15 * z) / (384 * dof ** 3))
+    return np.where(dof > 0, np.where(dof <= len(small), exact, t), np.nan)
+
+
+def moments(df, by, x, ys, log=False):
+    """Moments par (groupe, grandeur) : effectif, moyennes et sommes centrées des couples valides
+
+    Mêmes colonnes que les agrégats regr_* de DuckDB ; `log` passe x et y en logarithme
+    (valeurs <= 0 écartées). `x_min` et `x_max` bornent x (non transformé) sur tout le groupe.
+    """
+    xs = df[x].astype(float)
+    x_range = xs.groupby(df[by], sort=True).agg(['min', 'max']).rename(columns={'min': 'x_min', 'max': 'x_max'})
+    frames = []
+    for y in ys:
+        pair = pd.DataFrame({'x': xs, 'y': df[y].astype(float)})
+        if log:
+            pair = np.log(pair.where(pair > 0))
+        valid = pair.notna().all(axis=1)
+        pair, groups = pair[valid], df.loc[valid, by]
+        grouped = pair.groupby(groups, sort=True)
+        centered = pair - grouped.transform('mean')
+        stats = pd.DataFrame({
+            'n': grouped.size(),
+            'mean_x': grouped['x'].mean(),
+            'mean_y': grouped['y'].mean(),
+            'sxx': (centered['x'] ** 2).groupby(groups).sum(),
+            'syy': (centered['y'] ** 2).groupby(groups).sum(),
+            'sxy': (centered['x'] * centered['y']).groupby(groups).sum(),
+        }).reindex(x_range.index)
+        stats['n'] = stats['n'].fillna(0)
+        frames.append(stats.join(x_range).rename_axis(by).reset_index().assign(target=y))
+    return pd.concat(frames, ignore_index=True)
+
+
+class TokenRegression:
+    """Régressions par modèle de l'électricité, du CO₂ et du temps selon les tokens
+
+    Le moteur de requêtes renvoie, par (grandeur, modèle), l'effectif, les moyennes et les
+    sommes centrées (GROUP BY, sans relire les lignes ici) ; les droites, les résidus et les
+    bandes de confiance s'en déduisent pour tous les modèles à la fois.
+    """
+
+    def __init__(self, backend, by='model'):
+        self.by = by
+        self.fits = {}
+        for form in FORMS:
+            stats = backend.regression_moments({}, by, 'tokens', list(TARGETS), log=form == 'power')
+            if not self.fits:
+                self.groups = pd.Index(sorted(stats[by].unique()), name=by)
+                self._tokens_range = (
+                    stats.drop_duplicates(by).set_index(by)[['x_min', 'x_max']]
+                    .reindex(self.groups).set_axis(['min', 'max'], axis=1)
+                )
+            self.fits[form] = self._fit(stats)
+
+    def _fit(self, stats):
+        n_groups, n_targets = len(self.groups), len(TARGETS)
+        table = stats.set_index(['target', self.by]).reindex(pd.MultiIndex.from_product([list(TARGETS), self.groups]))
+        n, mx, my, sxx, syy, sxy = (
+            table[col].to_numpy(dtype=float).reshape(n_targets, n_groups)
+            for col in ('n', 'mean_x', 'mean_y', 'sxx', 'syy', 'sxy')
+        )
+        n = np.nan_to_num(n)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # Moins de deux points distincts : système singulier, pas d'ajustement
+            solvable = (n >= 3) & (sxx > 1e-9 * np.maximum(sxx + n * mx * mx, 1 / np.maximum(n, 1)))
+            b = sxy / sxx
+            coef = np.stack([my - b * mx, b], -1)
+            coef[~solvable] = np.nan
+            # Inverse de la matrice normale [[n, Σx], [Σx, Σx²]], écrite avec les sommes centrées
+            inverse = np.stack([np.stack([1 / n + mx * mx / sxx, -mx / sxx], -1),
+                                np.stack([-mx / sxx, 1 / sxx], -1)], -2)
+            inverse = np.where(solvable[..., None, None], inverse, np.eye(2))
+            # Somme des carrés des résidus de la droite des moindres carrés
+            rss = np.where(solvable, np.maximum(syy - sxy * b, 0), np.nan)
+
+            dof = n - 2
+            s2 = np.where(dof > 0, rss / dof, np.nan)
+            r2 = np.where(syy > 0, 1 - rss / syy, np.nan)
+        return {'coef': coef, 'inverse': inverse, 's2': s2, 'dof': dof, 'r2': r2, 'n': n}
+
+    def coefficients(self, form, target):
+        """Paramètres ajustés par modèle (a et b dans l'échelle d'origine de la forme choisie)"""
+        fit = self.fits[form]
+        t = list(TARGETS).index(target)
+        a, b = fit['coef'][t, :, 0], fit['coef'][t, :, 1]
+        table = pd.DataFrame({
+            'a': np.exp(a) if form == 'power' else a,
+            'b': b,
+            'R²': fit['r2'][t],
+            'n': fit['n'][t].astype(int),
+            'tokens min': self._tokens_range['min'].to_numpy(),
+            'tokens max': self._tokens_range['max'].to_numpy(),
+        }, index=self.groups)
+        return table.sort_index()
+
+    def predict(self, form, target, groups, tokens, interval='confidence'):
+        """Valeur ajustée et bornes à CONFIDENCE pour chaque (groupe, tokens)
+
+        `interval` : 'confidence' (moyenne des réponses) ou 'prediction' (une réponse isolée).
+        """
+        fit = self.fits[form]
+        t = list(TARGETS).index(target)
+        g = self.groups.get_indexer(groups)
+        x0 = np.asarray(tokens, dtype=float)
+        x = np.log(x0) if form == 'power' else x0
+        known = g >= 0
+        g = np.where(known, g, 0)
+
+        coef = fit['coef'][t, g]
+        inverse = fit['inverse'][t, g]
+        s2 = fit['s2'][t, g]
+        mean = coef[:, 0] + coef[:, 1] * x
+        variance = s2 * (inverse[:, 0, 0] + 2 * x * inverse[:, 0, 1] + x * x * inverse[:, 1, 1])
+        if interval == 'prediction':
+            variance = variance + s2
+        half = t_quantile(0.5 + CONFIDENCE / 2, fit['dof'][t, g]) * np.sqrt(np.maximum(variance, 0))
+        low, high = mean - half, mean + half
+        if form == 'power':
+            mean, low, high = np.exp(mean), np.exp(low), np.exp(high)
+
+        result = pd.DataFrame({self.by: np.asarray(groups, dtype=object), 'tokens': x0,
+                               'ajusté': mean, 'borne basse': low, 'borne haute': high})
+        result.loc[~known, ['ajusté', 'borne basse', 'borne haute']] = np.nan
+        return result
+
+    def curves(self, form, target, groups, points=CURVE_POINTS):
+        """Courbes ajustées et bandes de confiance sur la plage de tokens observée de chaque groupe"""
+        frames = []
+        for group in groups:
+            i = self.groups.get_loc(group) if group in self.groups else None
+            if i is None or not np.isfinite(self._tokens_range.iloc[i]).all():
+                continue
+            low, high = self._tokens_range.iloc[i]
+            grid = np.geomspace(max(low, 1), max(high, 1), points) if form == 'power' else np.linspace(low, high, points)
+            frames.append(self.predict(form, target, [group] * points, grid))
+        if not frames:
+            return pd.DataFrame(columns=[self.by, 'tokens', 'ajusté', 'borne basse', 'borne haute'])
+        return pd.concat(frames, ignore_index=True)
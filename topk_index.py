@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+
+from data_pipeline import TOPK_METRICS
+
+# Libellé et sens du classement (True : plus bas = mieux) de chaque métrique
+METRICS = {
+    'score': ('Score moyen', False),
+    'efficacite_co2': ('Efficacité CO₂ (Score/g)', False),
+    'efficacite_elec': ('Efficacité électrique (Score/Wh)', False),
+    'time (sec)': ('Temps moyen (sec)', True),
+    'co2 (g)': ('CO₂ moyen (g)', True),
+    'electricity (mwh/token)': ('Électricité par token (mWh)', True),
+    'co2 (mg/token)': ('CO₂ par token (mg)', True),
+    'tokens/sec': ('Débit (tokens/s)', False),
+    'time (ms/token)': ('Latence par token (ms)', True),
+}
+
+
+class TopKIndex:
+    """Classements top-k par modèle calculés sur le cube des sommes, sans relire les lignes"""
+
+    def __init__(self, cube):
+        self._codes = {}
+        self._values = {}
+        for col in ['question_categorie', 'categorie_model', 'model']:
+            codes, values = pd.factorize(cube[col])
+            self._codes[col] = codes
+            self._values[col] = np.asarray(values, dtype=object)
+        self.models = self._values['model']
+        self._score = cube['score_bucket'].to_numpy(dtype=float)
+        self._sums = cube[TOPK_METRICS].to_numpy(dtype=float)
+        self._counts = cube[[f"{m} n" for m in TOPK_METRICS]].to_numpy(dtype=float)
+
+    def _mask(self, filters):
+        mask = self._score >= filters.get('min_score', 0)
+        for col, codes in self._codes.items():
+            if col in filters:
+                wanted = np.flatnonzero(np.isin(self._values[col], list(filters[col])))
+                mask &= np.isin(codes, wanted)
+        return mask
+
+    def means(self, filters, metric):
+        """Moyenne de `metric` par modèle (NaN pour les modèles absents du filtre)"""
+        j = TOPK_METRICS.index(metric)
+        mask = self._mask(filters)
+        model_codes = self._codes['model'][mask]
+        sums = np.bincount(model_codes, weights=self._sums[mask, j], minlength=len(self.models))
+        counts = np.bincount(model_codes, weights=self._counts[mask, j], minlength=len(self.models))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(counts > 0, sums / counts, np.nan)
+
+    def top_k(self, filters, metric, k=10, ascending=None):
+        """Les `k` meilleurs modèles pour `metric`, triés (sélection partielle par argpartition)"""
+        if ascending is None:
+            ascending = METRICS[metric][1]
+        means = self.means(filters, metric)
+        valid = np.flatnonzero(~np.isnan(means))
+        keys = means[valid] if ascending else -means[valid]
+
+        k = max(0, min(k, len(valid)))
+        if k < len(valid):
+            selected = np.argpartition(keys, k - 1)[:k] if k else np.array([], dtype=int)
+        else:
+            selected = np.arange(len(valid))
+        # Seuls les k éléments retenus sont triés (égalités départagées par nom de modèle)
+        order = valid[selected[np.lexsort((self.models[valid[selected]].astype(str), keys[selected]))]]
+        return pd.Series(means[order], index=pd.Index(self.models[order], name='model'), name=metric)